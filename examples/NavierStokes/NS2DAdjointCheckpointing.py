@@ -0,0 +1,55 @@
+import time
+import tracemalloc
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import NSReward
+
+# THIS EXAMPLE REPORTS THE MEMORY AND TIME OF THE ADJOINT GRADIENT OF NavierStokes2D.
+# The gradient of the total reward with respect to all boundary actions of an episode
+# is computed with the default O(log nt) checkpoints and with every state stored.
+
+n = 64
+dx = 1 / (n - 1)
+dt = 5e-4
+
+boundary_condition = {
+    "upper": ["Controllable", "Dirchilet"],
+    "lower": ["Dirchilet", "Dirchilet"],
+    "left": ["Dirchilet", "Dirchilet"],
+    "right": ["Dirchilet", "Dirchilet"],
+}
+
+def getInitialCondition(X):
+    return np.zeros_like(X), np.zeros_like(X), np.zeros_like(X)
+
+def makeEnv(T):
+    nt = int(round(T / dt))
+    return gym.make(
+        "PDEControlGym-NavierStokes2D", T=T, dt=dt, X=1, dx=dx, Y=1, dy=dx, action_dim=1,
+        reward_class=NSReward(0.1), normalize=False, reset_init_condition_func=getInitialCondition,
+        boundary_condition=boundary_condition, U_ref=np.zeros((nt, n, n, 2)), action_ref=2.0 * np.ones(nt),
+        pressure_solver="dct", history="none",
+    ).unwrapped
+
+def measure(env, actions, checkpoints):
+    env.reset()
+    tracemalloc.start()
+    start = time.perf_counter()
+    _, gradient = env.action_gradient(actions, checkpoints)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return gradient, peak / 2**20, elapsed
+
+print(f"{n}x{n} grid, dct pressure solver")
+print(f"{'nt':>6} {'checkpoints':>12} {'peak [MB]':>10} {'time [s]':>9}")
+for T in [0.05, 0.2, 0.8]:
+    env = makeEnv(T)
+    actions = 2 + np.sin(np.linspace(0, np.pi, env.nt - 1))[:, None]
+    default, peak, elapsed = measure(env, actions, None)
+    checkpoints = int(np.ceil(np.log2(len(actions))))
+    print(f"{env.nt:>6} {checkpoints:>12} {peak:>10.1f} {elapsed:>9.2f}")
+    stored, peak, elapsed = measure(env, actions, len(actions))
+    print(f"{env.nt:>6} {len(actions):>12} {peak:>10.1f} {elapsed:>9.2f}")
+    assert np.array_equal(default, stored)
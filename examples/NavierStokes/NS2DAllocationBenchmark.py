@@ -0,0 +1,78 @@
+import time
+import tracemalloc
+import numpy as np
+from pde_control_gym.src import NavierStokes2D, NSReward
+from pde_control_gym.src.environments2d.navier_stokes2D import central_difference, laplace
+
+# THIS EXAMPLE BENCHMARKS THE MEMORY TRAFFIC OF A NavierStokes STEP.
+# The environment reuses the buffers of its workspace on every step. For comparison
+# the same step is computed with the allocating form of the stencil operators, which
+# creates a new grid sized array for every intermediate result. The peak of the
+# memory allocated during a step, in KiB and in units of one grid sized array, and
+# the steps per second are printed. With the workspace the peak stays at the few
+# fixed size iteration buffers of NumPy for the Jacobi solver, while the transform
+# and multigrid solvers still allocate their own intermediate arrays.
+
+def getInitialCondition(X):
+    return 2 * np.ones_like(X), -np.ones_like(X), np.zeros_like(X)
+
+boundary_condition = {
+    "upper": ["Controllable", "Dirchilet"],
+    "lower": ["Dirchilet", "Dirchilet"],
+    "left": ["Dirchilet", "Dirchilet"],
+    "right": ["Dirchilet", "Dirchilet"],
+}
+
+def makeEnv(n, pressure_solver):
+    dx = 1 / (n - 1)
+    dt = 2 * dx**2
+    nt = 100
+    return NavierStokes2D(T=nt * dt, dt=dt, X=1, dx=dx, Y=1, dy=dx, action_dim=1, reward_class=NSReward(0.1),
+                          reset_init_condition_func=getInitialCondition, boundary_condition=boundary_condition,
+                          U_ref=np.zeros((nt + 1, n, n, 2)), action_ref=2.0 * np.ones(nt + 1),
+                          pressure_solver=pressure_solver)
+
+def allocatingStep(env, action):
+    # The step of the environment written with a new array for every intermediate result
+    dx, dy, dt = env.dx, env.dy, env.dt
+    u_prev, v_prev, p_prev = env.u.copy(), env.v.copy(), env.p.copy()
+    dudx, dudy = central_difference(u_prev, "x", dx), central_difference(u_prev, "y", dy)
+    dvdx, dvdy = central_difference(v_prev, "x", dx), central_difference(v_prev, "y", dy)
+    u_pred = u_prev + dt * (- u_prev * dudx - v_prev * dudy + env.KINEMATIC_VISCOSITY * laplace(u_prev, dx, dy))
+    v_pred = v_prev + dt * (- u_prev * dvdx - v_prev * dvdy + env.KINEMATIC_VISCOSITY * laplace(v_prev, dx, dy))
+    u_pred, v_pred = env.apply_boundary(u_pred, v_pred, action)
+    rhs = env.DENSITY / dt * (central_difference(u_pred, "x", dx) + central_difference(v_pred, "y", dy))
+    pressure = env.pressure_solver.solve(rhs, p_prev, dx, dy)
+    u_next = u_pred - dt / env.DENSITY * central_difference(pressure, "x", dx)
+    v_next = v_pred - dt / env.DENSITY * central_difference(pressure, "y", dy)
+    env.u[...], env.v[...] = env.apply_boundary(u_next, v_next, action)
+    env.p[...] = pressure
+
+def measure(env, step, n_steps):
+    env.reset()
+    step(3.0)
+    grid_bytes = env.u.nbytes
+    tracemalloc.start()
+    peak = 0
+    for _ in range(n_steps):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        step(3.0)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    env.reset()
+    step(3.0)
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        step(3.0)
+    return peak / 1024, peak / grid_bytes, n_steps / (time.perf_counter() - start)
+
+print(f"{'grid':>8} {'solver':>10} {'step':>11} {'peak [KiB]':>11} {'peak [grids]':>13} {'steps/s':>9}")
+for n in [64, 128, 256, 512]:
+    for solver in ["jacobi", "dct", "multigrid"]:
+        n_steps = 2 if solver == "jacobi" else 10
+        env = makeEnv(n, solver)
+        cases = [("workspace", lambda action: env.step(action)), ("allocating", lambda action: allocatingStep(env, action))]
+        for name, step in cases:
+            peak, grids, steps = measure(env, step, n_steps)
+            print(f"{n:>5}^2 {solver:>10} {name:>11} {peak:>11.0f} {grids:>13.2f} {steps:>9.1f}")
@@ -0,0 +1,48 @@
+import time
+import numpy as np
+from pde_control_gym.src import NavierStokes2D, NSReward
+
+# THIS EXAMPLE REPORTS THE MEMORY OF A NavierStokes ENVIRONMENT FOR THE HISTORY
+# POLICIES AND DATA TYPES. The memory of the stored solution and of the step
+# workspace and the steps per second are printed for a 256x256 grid with 1000
+# timesteps per episode. The reference trajectory is a broadcast view so that it
+# does not take memory itself.
+
+n = 256
+nt = 1000
+dx = 1 / (n - 1)
+dt = 2 * dx**2
+
+def getInitialCondition(X):
+    return 2 * np.ones_like(X), -np.ones_like(X), np.zeros_like(X)
+
+boundary_condition = {
+    "upper": ["Controllable", "Dirchilet"],
+    "lower": ["Dirchilet", "Dirchilet"],
+    "left": ["Dirchilet", "Dirchilet"],
+    "right": ["Dirchilet", "Dirchilet"],
+}
+
+def makeEnv(**kwargs):
+    return NavierStokes2D(T=nt * dt, dt=dt, X=1, dx=dx, Y=1, dy=dx, action_dim=1, reward_class=NSReward(0.1),
+                          reset_init_condition_func=getInitialCondition, boundary_condition=boundary_condition,
+                          U_ref=np.broadcast_to(np.zeros(2), (nt + 1, n, n, 2)), action_ref=2.0 * np.ones(nt + 1),
+                          pressure_solver="dct", **kwargs)
+
+cases = [
+    ("full", dict()),
+    ("decimated", dict(history="decimated", history_stride=50)),
+    ("rolling", dict(history="rolling", history_window=10)),
+    ("none", dict(history="none")),
+]
+n_steps = 20
+print(f"{'history':>10} {'dtype':>8} {'history [MB]':>13} {'workspace [MB]':>15} {'steps/s':>8}")
+for dtype in ["float64", "float32"]:
+    for name, history in cases:
+        env = makeEnv(dtype=dtype, **history)
+        env.reset()
+        start = time.perf_counter()
+        for _ in range(n_steps):
+            env.step(3.0)
+        steps = n_steps / (time.perf_counter() - start)
+        print(f"{name:>10} {dtype:>8} {env.U.nbytes / 1e6:>13.1f} {env.workspace.nbytes / 1e6:>15.1f} {steps:>8.1f}")
@@ -0,0 +1,44 @@
+import time
+import numpy as np
+from pde_control_gym.src import NavierStokes2D, NSReward
+
+# THIS EXAMPLE BENCHMARKS THE PRESSURE SOLVERS OF THE NavierStokes ENVIRONMENT.
+# Steps per second, pressure iterations per step and the relative residual of the
+# pressure equation are printed for several grid sizes with the reference Jacobi
+# solver (2000 sweeps), the direct cosine transform solver and the multigrid solver.
+# At large grids the 2000 Jacobi sweeps no longer converge, which shows in the residual.
+
+def getInitialCondition(X):
+    return 2 * np.ones_like(X), -np.ones_like(X), np.zeros_like(X)
+
+boundary_condition = {
+    "upper": ["Controllable", "Dirchilet"],
+    "lower": ["Dirchilet", "Dirchilet"],
+    "left": ["Dirchilet", "Dirchilet"],
+    "right": ["Dirchilet", "Dirchilet"],
+}
+
+def makeEnv(n, pressure_solver):
+    dx = 1 / (n - 1)
+    dt = 2 * dx**2
+    nt = 20
+    return NavierStokes2D(T=nt * dt, dt=dt, X=1, dx=dx, Y=1, dy=dx, action_dim=1, reward_class=NSReward(0.1),
+                          reset_init_condition_func=getInitialCondition, boundary_condition=boundary_condition,
+                          U_ref=np.zeros((nt + 1, n, n, 2)), action_ref=2.0 * np.ones(nt + 1),
+                          pressure_solver=pressure_solver)
+
+def run(env, n_steps):
+    env.reset()
+    iterations = []
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        _, _, _, _, info = env.step(3.0)
+        iterations.append(info["pressure_iterations"])
+    return n_steps / (time.perf_counter() - start), np.mean(iterations), info["pressure_residual"]
+
+print(f"{'grid':>8} {'solver':>10} {'steps/s':>9} {'iterations/step':>16} {'residual':>9}")
+for n in [21, 64, 128, 256, 512]:
+    for solver in ["jacobi", "dct", "multigrid"]:
+        n_steps = 2 if solver == "jacobi" and n > 128 else 10
+        steps, iterations, residual = run(makeEnv(n, solver), n_steps)
+        print(f"{n:>5}^2 {solver:>10} {steps:>9.2f} {iterations:>16.1f} {residual:>9.1e}")
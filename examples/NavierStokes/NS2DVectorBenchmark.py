@@ -0,0 +1,68 @@
+import time
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import NSReward
+
+# THIS EXAMPLE BENCHMARKS THE BATCHED NavierStokes ENVIRONMENT.
+# B independent environments are stepped either as B separate NavierStokes2D
+# instances or as one NavierStokes2DVector holding (B, ny, nx) fields. The total
+# environment steps per second are printed for the grid of the RL examples.
+
+def getInitialCondition(X):
+    u = np.random.uniform(-5, 5) * np.ones_like(X)
+    v = np.random.uniform(-5, 5) * np.ones_like(X)
+    p = np.random.uniform(-5, 5) * np.ones_like(X)
+    return u, v, p
+
+boundary_condition = {
+    "upper": ["Controllable", "Dirchilet"],
+    "lower": ["Dirchilet", "Dirchilet"],
+    "left": ["Dirchilet", "Dirchilet"],
+    "right": ["Dirchilet", "Dirchilet"],
+}
+
+T = 0.2
+dt = 1e-3
+dx, dy = 0.05, 0.05
+NS2DParameters = {
+        "T": T,
+        "dt": dt,
+        "X": 1,
+        "dx": dx,
+        "Y": 1,
+        "dy": dy,
+        "action_dim": 1,
+        "reward_class": NSReward(0.1),
+        "normalize": False,
+        "reset_init_condition_func": getInitialCondition,
+        "boundary_condition": boundary_condition,
+        "U_ref": np.zeros((int(round(T / dt)) + 1, 21, 21, 2)),
+        "action_ref": 2.0 * np.ones(1000),
+}
+
+def runSeparate(num_envs, n_steps, pressure_solver):
+    envs = [gym.make("PDEControlGym-NavierStokes2D", pressure_solver=pressure_solver, **NS2DParameters) for _ in range(num_envs)]
+    for env in envs:
+        env.reset(seed=0)
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        for env in envs:
+            env.step(np.random.uniform(2, 4, size=1))
+    return num_envs * n_steps / (time.perf_counter() - start)
+
+def runBatched(num_envs, n_steps, pressure_solver):
+    envs = gym.make_vec("PDEControlGym-NavierStokes2D", num_envs=num_envs, pressure_solver=pressure_solver, **NS2DParameters)
+    envs.reset(seed=0)
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        envs.step(np.random.uniform(2, 4, size=(num_envs, 1)))
+    return num_envs * n_steps / (time.perf_counter() - start)
+
+print(f"{'solver':>10} {'envs':>5} {'separate steps/s':>17} {'batched steps/s':>16} {'speedup':>8}")
+for pressure_solver in ["jacobi", "dct"]:
+    n_steps = 10 if pressure_solver == "jacobi" else 100
+    for num_envs in [1, 8, 32]:
+        separate = runSeparate(num_envs, n_steps, pressure_solver)
+        batched = runBatched(num_envs, n_steps, pressure_solver)
+        print(f"{pressure_solver:>10} {num_envs:>5} {separate:>17.1f} {batched:>16.1f} {batched / separate:>8.1f}")
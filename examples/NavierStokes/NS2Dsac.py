@@ -4,7 +4,7 @@ import math
 import matplotlib.pyplot as plt
 import time 
 from tqdm import tqdm
-from pde_control_gym.src import NSReward
+from pde_control_gym.src import NSReward, ReferenceTrajectory
 from stable_baselines3.common.callbacks import CheckpointCallback
 from stable_baselines3 import SAC
 
@@ -30,9 +30,8 @@ T = 0.2
 dt = 1e-3
 dx, dy = 0.05, 0.05
 X, Y = 1, 1
-u_target = np.load('target.npz')['u']
-v_target = np.load('target.npz')['v']
-desire_states = np.stack([u_target, v_target], axis=-1) # (NT, Nx, Ny, 2)
+# The target is converted once to an uncompressed target.npy which is memory mapped
+desire_states = ReferenceTrajectory.from_npz('target.npz') # (NT, Nx, Ny, 2)
 NS2DParameters = {
         "T": T, 
         "dt": dt, 
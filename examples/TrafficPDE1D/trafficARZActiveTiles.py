@@ -0,0 +1,58 @@
+import io
+import time
+import contextlib
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import TrafficARZReward
+
+# THIS EXAMPLE BENCHMARKS ACTIVE-REGION TRACKING OF THE TRAFFIC ARZ PDE ON LONG CORRIDORS.
+# The corridor starts at the steady state except for a density bump of a given width in
+# its middle, and the inlet and outlet fluxes stay at the steady flux. Every episode runs
+# 300 control periods of 0.5 seconds with dx=5 and dt=0.1. The time per step is printed
+# for updating every cell and for tiles of 64 cells, together with the mean number of
+# updated cells and the largest difference of the final observations.
+
+n_periods = 300
+
+def makeEnv(X, **kwargs):
+    P = {
+        "T": 1e9, "dt": 0.1, "X": X, "dx": 5,
+        "reward_class": TrafficARZReward(),
+        "simulation_type": "both",
+        "v_steady": 10, "ro_steady": 0.12,
+        "v_max": 40, "ro_max": 0.16, "tau": 60,
+        "control_freq": 5,
+    }
+    P.update(kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return gym.make("PDEControlGym-TrafficPDE1D", **P).unwrapped
+
+def runEpisode(X, width, **kwargs):
+    env = makeEnv(X, **kwargs)
+    env.reset()
+    # Steady corridor with a cos^2 density bump of the given width
+    state = env.get_state()
+    x = np.arange(env.M) * env.dx
+    distance = x - X / 2
+    state["r"] = np.where(np.abs(distance) < width / 2, env.rs * (1 + 0.1 * np.cos(np.pi * distance / width)**2), env.rs)
+    state["y"] = np.zeros(env.M)
+    env.set_state(state)
+    action = np.array([env.qs, env.qs])
+    active_cells = 0
+    start = time.perf_counter()
+    for _ in range(n_periods):
+        obs, reward, terminate, truncate, info = env.step(action)
+        active_cells += info.get("active_cells", env.M)
+    return obs, (time.perf_counter() - start) / n_periods * 1e3, active_cells / n_periods
+
+print(f"{'backend':>8} {'X [km]':>7} {'cells':>6} {'bump [m]':>9} {'full [ms]':>10} {'tiles [ms]':>11} {'active cells':>13} {'max |diff|':>11}")
+for backend in ["numpy", "numba"]:
+    # Compiles the numba kernels before timing
+    runEpisode(2000, 200, backend=backend, active_tiles=64)
+    for X in [10000, 20000, 50000]:
+        for width in [200, 1000, 5000]:
+            reference, full, _ = runEpisode(X, width, backend=backend)
+            obs, tiles, active_cells = runEpisode(X, width, backend=backend, active_tiles=64)
+            cells = int(round(X / 5)) + 1
+            print(f"{backend:>8} {X / 1000:>7.0f} {cells:>6} {width:>9} {full:>10.3f} {tiles:>11.3f} {active_cells:>13.0f} {np.abs(obs - reference).max():>11.1e}")
@@ -0,0 +1,49 @@
+import io
+import time
+import contextlib
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import TrafficARZReward
+
+# THIS EXAMPLE COMPARES FIXED AND CFL ADAPTIVE SUBSTEPS OF THE TRAFFIC ARZ PDE.
+# Every episode applies the same random inlet and outlet fluxes, within 10% of the
+# steady flux, for 400 control periods of 0.5 seconds. The fixed timestep is chosen
+# small enough for congested traffic, while the adaptive mode picks the largest stable
+# timestep of every substep.
+# The final states are compared against a fixed timestep of 0.005 seconds.
+
+period = 0.5
+n_periods = 400
+
+def parameters(ro_steady, **kwargs):
+    v_steady = 40 * (1 - ro_steady / 0.16)
+    P = {
+        "T": 1e9, "dt": 0.1, "X": 500, "dx": 10,
+        "reward_class": TrafficARZReward(),
+        "simulation_type": "both",
+        "v_steady": v_steady, "ro_steady": ro_steady,
+        "v_max": 40, "ro_max": 0.16, "tau": 60,
+        "control_freq": 5,
+    }
+    P.update(kwargs)
+    return P
+
+def runEpisode(P):
+    with contextlib.redirect_stdout(io.StringIO()):
+        env = gym.make("PDEControlGym-TrafficPDE1D", **P).unwrapped
+    rng = np.random.default_rng(0)
+    env.reset(seed=0)
+    substeps = 0
+    start = time.perf_counter()
+    for _ in range(n_periods):
+        obs, reward, terminate, truncate, info = env.step(env.qs * rng.uniform(0.9, 1.1, size=2))
+        substeps += info["substeps"]
+    return obs, substeps, time.perf_counter() - start
+
+print(f"{'traffic':>10} {'mode':>14} {'substeps':>9} {'time [s]':>9} {'max error':>10}")
+for name, ro_steady in [("light", 0.1), ("congested", 0.13)]:
+    reference, _, _ = runEpisode(parameters(ro_steady, dt=0.005, control_freq=100))
+    for mode, kwargs in [("fixed dt=0.1", {}), ("cfl=0.9", {"cfl": 0.9}), ("cfl=0.5", {"cfl": 0.5})]:
+        obs, substeps, elapsed = runEpisode(parameters(ro_steady, **kwargs))
+        print(f"{name:>10} {mode:>14} {substeps:>9} {elapsed:>9.3f} {np.abs(obs - reference).max():>10.2e}")
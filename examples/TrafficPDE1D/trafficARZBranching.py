@@ -0,0 +1,75 @@
+import io
+import copy
+import time
+import contextlib
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import TrafficARZReward
+
+# THIS EXAMPLE BENCHMARKS FORKING THE TRAFFIC ARZ PDE FOR ROLLOUT BASED CONTROLLERS.
+# At every decision a controller scores candidate action sequences of 20 control periods
+# from the current state. The candidates are simulated by deep copies of the environment,
+# by restoring a snapshot of get_state with set_state before each candidate, and by a
+# single call of branch which advances all candidates in one batched array pass.
+
+horizon = 20
+
+P = {
+    "T": 1e9, "dt": 0.25, "X": 500, "dx": 10,
+    "reward_class": TrafficARZReward(),
+    "simulation_type": "both",
+    "v_steady": 10, "ro_steady": 0.12,
+    "v_max": 40, "ro_max": 0.16, "tau": 60,
+    "control_freq": 2,
+}
+with contextlib.redirect_stdout(io.StringIO()):
+    env = gym.make("PDEControlGym-TrafficPDE1D", **P).unwrapped
+env.reset(seed=0)
+
+def rollout(env, actions):
+    rewards = np.zeros(len(actions))
+    for k, action in enumerate(actions):
+        obs, rewards[k], terminate, truncate, info = env.step(action)
+        if terminate or truncate:
+            break
+    return rewards
+
+def withDeepcopy(candidates):
+    return np.array([rollout(copy.deepcopy(env), actions) for actions in candidates])
+
+def withSnapshot(candidates):
+    state = env.get_state()
+    rewards = []
+    for actions in candidates:
+        env.set_state(state)
+        rewards.append(rollout(env, actions))
+    env.set_state(state)
+    return np.array(rewards)
+
+def withBranch(candidates):
+    rewards, lengths = env.branch(env.get_state(), candidates)
+    return rewards
+
+start = time.perf_counter()
+n_forks = 1000
+for _ in range(n_forks):
+    copy.deepcopy(env)
+deepcopy_time = (time.perf_counter() - start) / n_forks * 1e6
+start = time.perf_counter()
+for _ in range(n_forks):
+    env.set_state(env.get_state())
+snapshot_time = (time.perf_counter() - start) / n_forks * 1e6
+print(f"fork with deepcopy {deepcopy_time:.1f} us, with get_state/set_state {snapshot_time:.1f} us")
+
+print(f"{'candidates':>10} {'deepcopy [ms]':>14} {'snapshot [ms]':>14} {'branch [ms]':>12} {'max |diff|':>11}")
+for B in [8, 64, 256]:
+    candidates = env.qs * np.random.default_rng(B).uniform(0.85, 1.15, size=(B, horizon, 2))
+    results = []
+    times = []
+    for method in [withDeepcopy, withSnapshot, withBranch]:
+        start = time.perf_counter()
+        results.append(method(candidates))
+        times.append((time.perf_counter() - start) * 1e3)
+    diff = max(np.abs(results[0] - results[1]).max(), np.abs(results[0] - results[2]).max())
+    print(f"{B:>10} {times[0]:>14.1f} {times[1]:>14.1f} {times[2]:>12.1f} {diff:>11.1e}")
@@ -0,0 +1,83 @@
+import io
+import time
+import contextlib
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import TrafficARZReward
+
+# THIS EXAMPLE SIMULATES A FREEWAY CORRIDOR WITH ON-RAMPS AND OFF-RAMPS AS A SINGLE NETWORK ENVIRONMENT.
+# Every interchange of the corridor is a diverge to an off-ramp followed by a merge with a
+# metered on-ramp, so a corridor of n interchanges has 4n + 1 links. The time per control
+# period of the network is compared with stepping one TrafficPDE1D freeway per link, which
+# does not even couple the links. Afterwards the on-ramps of a corridor with a surge of
+# on-ramp demand are admitted at the demand and metered with the ALINEA feedback law. The
+# vehicles held back by the meters wait outside of the network.
+
+def corridor(n_interchanges, mainline=1000, ramp=200, off_split=0.1, inflow=0.9, ramp_inflow=0.1):
+    # Link 0 is the first mainline segment, every interchange adds an off-ramp, a short mainline segment, an on-ramp and the next mainline segment
+    links, junctions, inflows, on_ramps = [mainline], [], {0: inflow}, []
+    for _ in range(n_interchanges):
+        upstream = len(links) - 1
+        off_ramp, weave, on_ramp, downstream = range(len(links), len(links) + 4)
+        links += [ramp, ramp, ramp, mainline]
+        junctions.append({"in": [upstream], "out": [weave, off_ramp], "split": [1 - off_split, off_split]})
+        junctions.append({"in": [weave, on_ramp], "out": [downstream]})
+        inflows[on_ramp] = ramp_inflow
+        on_ramps.append(on_ramp)
+    return {"links": links, "junctions": junctions, "inflows": inflows, "control_inflows": on_ramps}
+
+def makeNetwork(n_interchanges, **kwargs):
+    P = {
+        "T": 600, "dt": 0.2, "dx": 10,
+        "reward_class": TrafficARZReward(),
+        "v_max": 40, "ro_max": 0.16, "tau": 60,
+        "congested": False,
+        "control_freq": 5,
+    }
+    P.update(corridor(n_interchanges, **kwargs))
+    return gym.make("PDEControlGym-TrafficNetworkPDE1D", **P).unwrapped
+
+n_periods = 200
+print(f"{'interchanges':>12} {'links':>6} {'cells':>6} {'network [ms]':>13} {'env per link [ms]':>18}")
+for n_interchanges in [1, 5, 20, 50]:
+    env = makeNetwork(n_interchanges)
+    env.reset()
+    action = env.steady_action()
+    start = time.perf_counter()
+    for _ in range(n_periods):
+        env.step(action)
+    network = (time.perf_counter() - start) / n_periods * 1e3
+    # One freeway environment per link with the same grid and scheme
+    with contextlib.redirect_stdout(io.StringIO()):
+        freeways = [gym.make("PDEControlGym-TrafficPDE1D", T=1e9, dt=0.2, X=L, dx=10, reward_class=TrafficARZReward(), simulation_type="both", control_freq=5, scheme="ctm").unwrapped for L in env.network.cells * 10 + 10]
+    for freeway in freeways:
+        freeway.reset()
+    start = time.perf_counter()
+    for _ in range(n_periods):
+        for freeway in freeways:
+            freeway.step(np.array([freeway.qs, freeway.qs]))
+    per_link = (time.perf_counter() - start) / n_periods * 1e3
+    print(f"{n_interchanges:>12} {env.network.n_links:>6} {env.N:>6} {network:>13.3f} {per_link:>18.3f}")
+
+# Ramp metering of a corridor of 5 interchanges whose on-ramp demand doubles after 60 seconds
+env = makeNetwork(5, inflow=1.0)
+downstream_cells = [env.network.slices[link + 1] for link in env.control_inflows]
+for controller in ["demand", "ALINEA"]:
+    env.reset()
+    demand = env.steady_action()
+    rates = demand.copy()
+    total, held_back = 0, 0
+    terminate = truncate = False
+    while not terminate and not truncate:
+        surge = 2 * demand if env.time_index * env.dt > 60 else demand
+        if controller == "ALINEA":
+            # Integral feedback of the density of the mainline downstream of every merge towards its steady density
+            occupancy = np.array([env.r[cells].mean() for cells in downstream_cells])
+            rates = np.clip(rates + 20 * (env.rs[np.array(env.control_inflows) + 1] - occupancy), 0, surge)
+        else:
+            rates = surge
+        obs, reward, terminate, truncate, info = env.step(rates)
+        total += reward
+        held_back += np.sum(surge - rates) * env.dt * env.control_freq
+    print(f"{controller:>8}: total reward {total:9.2f}, vehicles held back by the meters {held_back:6.1f}")
@@ -0,0 +1,56 @@
+import io
+import time
+import warnings
+import contextlib
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import TrafficARZReward
+
+# THIS EXAMPLE COMPARES THE EXPLICIT AND THE EXPONENTIAL RELAXATION SOURCE OF THE
+# TRAFFIC ARZ PDE ACROSS RELAXATION TIMES tau.
+# Every episode applies the same random inlet fluxes, within 10% of the steady flux,
+# for 120 control periods of 0.5 seconds with CFL adaptive substeps. The explicit source
+# limits the substeps to tau, while the exponential source only depends on the
+# characteristic speeds. The final states are compared against the explicit source
+# with a fixed timestep of 0.005 seconds, and a fixed timestep of 0.25 seconds with the
+# explicit source shows where it becomes unstable.
+
+n_periods = 120
+
+def parameters(tau, **kwargs):
+    P = {
+        "T": 1e9, "dt": 0.25, "X": 500, "dx": 10,
+        "reward_class": TrafficARZReward(),
+        "simulation_type": "inlet",
+        "v_steady": 10, "ro_steady": 0.12,
+        "v_max": 40, "ro_max": 0.16, "tau": tau,
+        "control_freq": 2,
+    }
+    P.update(kwargs)
+    return P
+
+def runEpisode(P):
+    with contextlib.redirect_stdout(io.StringIO()):
+        env = gym.make("PDEControlGym-TrafficPDE1D", **P).unwrapped
+    rng = np.random.default_rng(0)
+    env.reset(seed=0)
+    substeps = 0
+    start = time.perf_counter()
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        warnings.simplefilter("ignore")
+        for _ in range(n_periods):
+            obs, reward, terminate, truncate, info = env.step(env.qs * rng.uniform(0.9, 1.1, size=1))
+            substeps += info.get("substeps", P["control_freq"])
+    return obs, substeps, time.perf_counter() - start
+
+print(f"{'tau [s]':>8} {'relaxation':>12} {'mode':>14} {'substeps':>9} {'time [s]':>9} {'max error':>10}")
+for tau in [60, 1, 0.1, 0.02]:
+    reference, _, _ = runEpisode(parameters(tau, dt=0.005, control_freq=100))
+    for relaxation, mode, kwargs in [
+        ("explicit", "fixed dt=0.25", {}),
+        ("explicit", "cfl=0.9", {"cfl": 0.9}),
+        ("exponential", "cfl=0.9", {"cfl": 0.9}),
+    ]:
+        obs, substeps, elapsed = runEpisode(parameters(tau, relaxation=relaxation, **kwargs))
+        print(f"{tau:>8} {relaxation:>12} {mode:>14} {substeps:>9} {elapsed:>9.3f} {np.abs(obs - reference).max():>10.2e}")
@@ -0,0 +1,51 @@
+import io
+import time
+import contextlib
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import TrafficARZReward
+from pde_control_gym.src.environments1d.numba_kernels import NUMBA_AVAILABLE
+
+# THIS EXAMPLE COMPARES THE THROUGHPUT OF THE TRAFFIC ARZ PDE SCHEMES.
+# The same random inlet and outlet fluxes are applied for 200 control periods with
+# every scheme and backend. The environment steps per second and the total reward
+# are printed. The cell transmission model is meant for pretraining on coarse grids,
+# where it does not oscillate, before fine-tuning on the Lax-Wendroff scheme, so its
+# reward should be close to the Lax-Wendroff reward. Its timesteps are only slightly
+# cheaper than Lax-Wendroff timesteps.
+
+n_steps = 200
+
+def parameters(dx, scheme, backend):
+    return {
+        "T": 1e9, "dt": 0.25 * dx / 10, "X": 500, "dx": dx,
+        "reward_class": TrafficARZReward(),
+        "simulation_type": "both",
+        "v_steady": 10, "ro_steady": 0.12,
+        "v_max": 40, "ro_max": 0.16, "tau": 60,
+        "control_freq": int(20 / dx), "scheme": scheme, "backend": backend,
+    }
+
+def runEpisode(P):
+    with contextlib.redirect_stdout(io.StringIO()):
+        env = gym.make("PDEControlGym-TrafficPDE1D", **P).unwrapped
+    rng = np.random.default_rng(0)
+    env.reset(seed=0)
+    # The first step compiles the numba kernels
+    env.step(np.array([env.qs, env.qs]))
+    env.reset(seed=0)
+    total = 0
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        obs, reward, terminate, truncate, info = env.step(env.qs * rng.uniform(0.9, 1.1, size=2))
+        total += reward
+    return n_steps / (time.perf_counter() - start), total
+
+backends = ["numpy", "numba"] if NUMBA_AVAILABLE else ["numpy"]
+print(f"{'dx [m]':>7} {'scheme':>13} {'backend':>8} {'steps/s':>9} {'total reward':>13}")
+for dx in [10, 2]:
+    for scheme in ["lax-wendroff", "ctm", "muscl"]:
+        for backend in backends:
+            throughput, total = runEpisode(parameters(dx, scheme, backend))
+            print(f"{dx:>7} {scheme:>13} {backend:>8} {throughput:>9.0f} {total:>13.3f}")
@@ -0,0 +1,72 @@
+import time
+import numpy as np
+from pde_control_gym.src import TrafficPDE1D
+from pde_control_gym.src.environments1d.traffic_arz_solver import ARZWorkspace, lax_wendroff_step
+
+# THIS EXAMPLE BENCHMARKS THE FUSED LAX-WENDROFF KERNEL OF THE TRAFFIC ARZ PDE
+# against the previous implementation which evaluates the flux helpers 12 times
+# per PDE timestep. PDE timesteps per second are printed for several grid sizes.
+
+vm, rm, tau = 40, 0.16, 60
+rs, vs = 0.12, 10
+qs = rs * vs
+dt, dx = 0.25, 10
+
+# Previous implementation of one PDE timestep on (M, 1) column vectors
+def reference_step(r, y, q_inlet, q_outlet):
+    M = r.shape[0]
+    r[0] = r[1]
+    y[0] = q_inlet - r[0] * TrafficPDE1D.Veq(vm, rm, r[0])
+    r[M-1] = r[M-2]
+    y[M-1] = q_outlet - r[M-1]* TrafficPDE1D.Veq(vm, rm, r[M-1])
+
+    r_jm1 = r[0:M-2]
+    r_j   = r[1:M-1]
+    r_jp1 = r[2:M]
+
+    y_jm1 = y[0:M-2]
+    y_j   = y[1:M-1]
+    y_jp1 = y[2:M]
+
+    r_pmid = 0.5 * (r_jp1 + r_j) - (dt / (2 * dx)) * (TrafficPDE1D.F_r(vm, rm, r_jp1, y_jp1) - TrafficPDE1D.F_r(vm, rm, r_j, y_j))
+    r_mmid = 0.5 * (r_jm1 + r_j) - (dt / (2 * dx)) * (TrafficPDE1D.F_r(vm, rm, r_j, y_j) - TrafficPDE1D.F_r(vm, rm, r_jm1, y_jm1))
+    y_pmid = (
+        0.5 * (y_jp1 + y_j)
+        - (dt / (2 * dx)) * (TrafficPDE1D.F_y(vm, rm, r_jp1, y_jp1) - TrafficPDE1D.F_y(vm, rm, r_j, y_j))
+        - 0.25 * dt / tau * (y_jp1 + y_j)
+    )
+    y_mmid = (
+        0.5 * (y_jm1 + y_j)
+        - (dt / (2 * dx)) * (TrafficPDE1D.F_y(vm, rm, r_j, y_j) - TrafficPDE1D.F_y(vm, rm, r_jm1, y_jm1))
+        - 0.25 * dt / tau * (y_jm1 + y_j)
+    )
+    r[1:M-1] -= (dt / dx) * (TrafficPDE1D.F_r(vm, rm, r_pmid, y_pmid) - TrafficPDE1D.F_r(vm, rm, r_mmid, y_mmid))
+    y[1:M-1] -= (
+        (dt / dx) * (TrafficPDE1D.F_y(vm, rm, r_pmid, y_pmid) - TrafficPDE1D.F_y(vm, rm, r_mmid, y_mmid))
+        + 0.5 * dt / tau * (y_pmid + y_mmid)
+    )
+
+def initial_condition(M):
+    x = np.linspace(0, 1, M)
+    r = rs * (np.sin(3 * x * np.pi) * 0.1 + 1)
+    y = qs - vm * r + vm / rm * r**2
+    return r, y
+
+def steps_per_second(step, n_steps):
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        step()
+    return n_steps / (time.perf_counter() - start)
+
+print(f"{'M':>6} {'reference steps/s':>18} {'fused steps/s':>14} {'speedup':>8} {'max |diff|':>11}")
+for M in [50, 500, 5000]:
+    n_steps = 20000 if M < 5000 else 4000
+    r, y = initial_condition(M)
+    r_ref, y_ref = r.reshape(-1, 1).copy(), y.reshape(-1, 1).copy()
+    r_new, y_new = r.copy(), y.copy()
+    ws = ARZWorkspace(r_new.shape)
+
+    before = steps_per_second(lambda: reference_step(r_ref, y_ref, qs, qs), n_steps)
+    after = steps_per_second(lambda: lax_wendroff_step(r_new, y_new, qs, qs, dt, dx, vm, rm, tau, ws), n_steps)
+    diff = max(np.abs(r_ref[:, 0] - r_new).max(), np.abs(y_ref[:, 0] - y_new).max())
+    print(f"{M:>6} {before:>18.0f} {after:>14.0f} {after/before:>7.2f}x {diff:>11.1e}")
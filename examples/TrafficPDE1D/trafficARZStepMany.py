@@ -0,0 +1,59 @@
+import io
+import time
+import contextlib
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import TrafficARZReward
+
+# THIS EXAMPLE BENCHMARKS THE OPEN-LOOP MULTI-STEP API OF THE TRAFFIC ARZ PDE.
+# A shooting method scores candidate action sequences of 100 control periods from the
+# same initial state, once with a loop over step and once with step_many. The time per
+# control period and the largest difference of the total rewards are printed.
+
+n_candidates = 50
+horizon = 100
+
+def makeEnv(**kwargs):
+    P = {
+        "T": 1e9, "dt": 0.25, "X": 500, "dx": 10,
+        "reward_class": TrafficARZReward(),
+        "simulation_type": "both",
+        "v_steady": 10, "ro_steady": 0.12,
+        "v_max": 40, "ro_max": 0.16, "tau": 60,
+        "control_freq": 2,
+    }
+    P.update(kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return gym.make("PDEControlGym-TrafficPDE1D", **P).unwrapped
+
+def scoreWithStep(env, actions):
+    env.reset(seed=0)
+    total = 0
+    for action in actions:
+        obs, reward, terminate, truncate, info = env.step(action)
+        total += reward
+        if terminate or truncate:
+            break
+    return total
+
+def scoreWithStepMany(env, actions):
+    env.reset(seed=0)
+    rewards, obs, terminate, truncate, states = env.step_many(actions)
+    return rewards.sum()
+
+print(f"{'backend':>8} {'scheme':>13} {'step [us]':>10} {'step_many [us]':>15} {'speedup':>8} {'max |diff|':>11}")
+for backend, scheme in [("numpy", "lax-wendroff"), ("numba", "lax-wendroff"), ("numba", "ctm")]:
+    env = makeEnv(backend=backend, scheme=scheme)
+    candidates = env.qs * np.random.default_rng(0).uniform(0.85, 1.15, size=(n_candidates, horizon, 2))
+    # Compiles the numba kernels before timing
+    scoreWithStep(env, candidates[0])
+    scoreWithStepMany(env, candidates[0])
+    totals = {}
+    elapsed = {}
+    for name, score in [("step", scoreWithStep), ("step_many", scoreWithStepMany)]:
+        start = time.perf_counter()
+        totals[name] = np.array([score(env, actions) for actions in candidates])
+        elapsed[name] = (time.perf_counter() - start) / (n_candidates * horizon) * 1e6
+    diff = np.abs(totals["step"] - totals["step_many"]).max()
+    print(f"{backend:>8} {scheme:>13} {elapsed['step']:>10.1f} {elapsed['step_many']:>15.1f} {elapsed['step']/elapsed['step_many']:>7.1f}x {diff:>11.1e}")
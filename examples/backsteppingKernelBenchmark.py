@@ -0,0 +1,55 @@
+import time
+import tempfile
+import numpy as np
+from pde_control_gym.src.controllers import BacksteppingController
+
+# THIS EXAMPLE BENCHMARKS THE BACKSTEPPING KERNEL LIBRARY AGAINST THE NESTED LOOP
+# KERNEL SOLVERS PREVIOUSLY USED IN THE EXAMPLES. Controllers are built for random
+# Chebyshev plants, first solving every kernel and then loading them from the disk cache.
+
+# Nested loop solvers as previously used in the examples
+def loopTransportKernel(theta, dx):
+    kappa = np.zeros(len(theta))
+    for i in range(0, len(theta)):
+        kernelIntegral = 0
+        for j in range(0, i):
+            kernelIntegral += (kappa[i-j]*theta[j])*dx
+        kappa[i] = kernelIntegral  - theta[i]
+    return np.flip(kappa)
+
+def loopReactionDiffusionKernel(beta, dx):
+    k = np.zeros((len(beta), len(beta)))
+    a = beta
+    k[1][1] = -(a[1] + a[0]) * dx / 4
+    for i in range(1, len(beta)-1):
+        k[i+1][0] = 0
+        k[i+1][i+1] = k[i][i]-dx/4.0*(a[i-1] + a[i])
+        k[i+1][i] = k[i][i] - dx/2 * a[i]
+        for j in range(1, i):
+                k[i+1][j] = -k[i-1][j] + k[i][j+1] + k[i][j-1] + a[j]*(dx**2)*(k[i][j+1]+k[i][j-1])/2
+    return k
+
+def randomBetas(n_plants, amplitude, x, rng):
+    gammas = rng.uniform(2, 10, size=n_plants)
+    return [amplitude * np.cos(gamma * np.arccos(x)) for gamma in gammas]
+
+rng = np.random.default_rng(0)
+cases = [
+    ("transport", 1e-2, randomBetas(1000, 5, np.linspace(1e-2, 1, 100), rng), loopTransportKernel, lambda k: k),
+    ("reaction-diffusion", 5e-3, randomBetas(1000, 50, np.linspace(0, 1, 201), rng), loopReactionDiffusionKernel, lambda k: k[-1]),
+]
+n_loop = 20
+for plant, dx, betas, loopKernel, gainOf in cases:
+    start = time.perf_counter()
+    loopGains = [gainOf(loopKernel(beta, dx)) * dx for beta in betas[:n_loop]]
+    loopTime = (time.perf_counter() - start) / n_loop * len(betas)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        controllers = [BacksteppingController(plant, beta, dx, cache_dir=cache_dir) for beta in betas]
+        solveTime = time.perf_counter() - start
+        start = time.perf_counter()
+        controllers = [BacksteppingController(plant, beta, dx, cache_dir=cache_dir) for beta in betas]
+        cachedTime = time.perf_counter() - start
+    error = max(np.abs(c.gain - g).max() / np.abs(g).max() for c, g in zip(controllers, loopGains))
+    print(f"{plant}: {len(betas)} plants, nested loops {loopTime:.2f}s (estimated from {n_loop}), "
+          f"vectorized {solveTime:.2f}s, cached {cachedTime:.2f}s, max relative gain difference {error:.1e}")
@@ -0,0 +1,105 @@
+import io
+import time
+import contextlib
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import TunedReward1D, TrafficARZReward
+
+# THIS EXAMPLE CHECKS THAT THE NUMBA BACKEND OF THE 1D ENVIRONMENTS REPRODUCES THE
+# NUMPY BACKEND. Each environment is run for one episode with the same actions on
+# both backends and the maximum trajectory difference and wall clock are printed.
+
+def getInitialCondition(nx):
+    return np.ones(nx) * 3.0
+
+def getBetaFunction(nx):
+    return 5 * np.cos(7.35 * np.arccos(np.linspace(0, 1, nx))).astype(np.float32)
+
+def getParabolicInitialCondition(nx):
+    return np.ones(nx + 1) * 3.0
+
+def getParabolicBetaFunction(nx):
+    return 50 * np.cos(8 * np.arccos(np.linspace(0, 1, nx + 1))).astype(np.float32)
+
+hyperbolicParameters = {
+        "T": 5,
+        "dt": 1e-4,
+        "X": 1,
+        "dx": 1e-2,
+        "reward_class": TunedReward1D(int(round(5/1e-4)), -1e3, 3e2),
+        "normalize": False,
+        "sensing_loc": "full",
+        "control_type": "Dirchilet",
+        "sensing_type": None,
+        "sensing_noise_func": lambda state: state,
+        "limit_pde_state_size": True,
+        "max_state_value": 1e10,
+        "max_control_value": 20,
+        "reset_init_condition_func": getInitialCondition,
+        "reset_recirculation_func": getBetaFunction,
+        "control_sample_rate": 0.1,
+}
+
+parabolicParameters = {
+        "T": 1,
+        "dt": 1e-5,
+        "X": 1,
+        "dx": 5e-3,
+        "reward_class": TunedReward1D(int(round(1/1e-5)), -1e3, 3e2),
+        "normalize": True,
+        "sensing_loc": "full",
+        "control_type": "Dirchilet",
+        "sensing_type": None,
+        "sensing_noise_func": lambda state: state,
+        "limit_pde_state_size": True,
+        "max_state_value": 1e10,
+        "max_control_value": 20,
+        "reset_init_condition_func": getParabolicInitialCondition,
+        "reset_recirculation_func": getParabolicBetaFunction,
+        "control_sample_rate": 0.001,
+}
+
+trafficParameters = {
+        "T": 240,
+        "dt": 0.25,
+        "X": 500,
+        "dx": 10,
+        "reward_class": TrafficARZReward(),
+        "simulation_type": "outlet",
+        "v_steady": 10,
+        "ro_steady": 0.12,
+        "v_max": 40,
+        "ro_max": 0.16,
+        "tau": 60,
+        "control_freq": 4,
+}
+
+def runEpisode(env_id, parameters, backend, actions):
+    with contextlib.redirect_stdout(io.StringIO()):
+        env = gym.make(env_id, backend=backend, **parameters)
+    obs, _ = env.reset(seed=0)
+    # Compile outside of the timed region
+    env.step(actions[0])
+    obs, _ = env.reset(seed=0)
+    trajectory = [obs]
+    start = time.perf_counter()
+    for action in actions:
+        obs, reward, terminate, truncate, info = env.step(action)
+        trajectory.append(obs)
+        if terminate or truncate:
+            break
+    return np.array(trajectory), time.perf_counter() - start
+
+rng = np.random.default_rng(0)
+cases = [
+    ("PDEControlGym-TransportPDE1D", hyperbolicParameters, rng.uniform(-1, 1, size=50)),
+    ("PDEControlGym-ReactionDiffusionPDE1D", parabolicParameters, rng.uniform(-0.1, 0.1, size=200)),
+    ("PDEControlGym-TrafficPDE1D", trafficParameters, 1.2 * rng.uniform(0.9, 1.1, size=(200, 1))),
+]
+for env_id, parameters, actions in cases:
+    u_numpy, t_numpy = runEpisode(env_id, parameters, "numpy", actions)
+    u_numba, t_numba = runEpisode(env_id, parameters, "numba", actions)
+    error = np.abs(u_numpy - u_numba).max() / max(np.abs(u_numpy).max(), 1e-12)
+    print(f"{env_id}: numpy {t_numpy:.3f}s, numba {t_numba:.3f}s, max relative difference {error:.2e}")
+    assert u_numpy.shape == u_numba.shape and error < 1e-4, "Backends disagree"
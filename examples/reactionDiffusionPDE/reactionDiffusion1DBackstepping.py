@@ -3,6 +3,7 @@ import numpy as np
 import math
 import matplotlib.pyplot as plt
 from pde_control_gym.src import TunedReward1D
+from pde_control_gym.src.controllers import BacksteppingController
 import pde_control_gym
 
 # THIS EXAMPLE SOLVES THE PARABOLIC PDE PROBLEM USING A BACKSTEPPING CONTROLLER
@@ -18,26 +19,6 @@ def solveBetaFunction(x, gamma):
         beta[idx] = 50*math.cos(gamma*math.acos(val))
     return beta
 
-# Kernel function solver for backstepping
-def solveKernelFunction(beta):
-    k = np.zeros((len(beta), len(beta)))
-    # First we calculate a at each timestep
-    a = beta
-
-    # FD LOOP
-    k[1][1] = -(a[1] + a[0]) * dx / 4
-    for i in range(1, len(beta)-1):
-        k[i+1][0] = 0
-        k[i+1][i+1] = k[i][i]-dx/4.0*(a[i-1] + a[i])
-        k[i+1][i] = k[i][i] - dx/2 * a[i]
-        for j in range(1, i):
-                k[i+1][j] = -k[i-1][j] + k[i][j+1] + k[i][j-1] + a[j]*(dx**2)*(k[i][j+1]+k[i][j-1])/2
-    return k
-
-# Control convolution solver
-def solveControl(kernel, u):
-    return sum(kernel[-1][0:len(u)-1]*u[0:len(u)-1])*dx
-
 # Set initial condition function here
 def getInitialCondition(nx):
     return np.ones(nx+1)*np.random.uniform(1, 10)
@@ -89,12 +70,12 @@ obs,__ = env.reset()
 uStorage.append(obs)
 
 spatial = np.linspace(dx, X, int(round(X/dx))+1)
-kernel = solveKernelFunction(solveBetaFunction(spatial, 8))
+controller = BacksteppingController("reaction-diffusion", solveBetaFunction(spatial, 8), dx)
 i = 0
 rew = 0
 while not truncate and not terminate:
     # use backstepping controller
-    action = solveControl(kernel, obs)
+    action = controller(obs)
     obs, rewards, terminate, truncate, info = env.step(action)
     uStorage.append(obs)
     rew += rewards 
@@ -0,0 +1,75 @@
+import io
+import time
+import contextlib
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import TunedReward1D
+from pde_control_gym.src.environments1d.numba_kernels import NUMBA_AVAILABLE
+
+# THIS EXAMPLE REPORTS ACCURACY VERSUS COST OF THE IMPLICIT INTEGRATORS OF THE
+# PARABOLIC PDE. The same open loop control sequence is applied with the explicit
+# scheme, Crank-Nicolson and backward Euler at several timesteps. The states at
+# the control samples are compared against an explicit solution with dt=1e-6.
+
+T = 0.2
+dx = 5e-3
+X = 1
+control_sample_rate = 1e-3
+
+def getInitialCondition(nx):
+    return 3 * np.linspace(0, 1, nx + 1)
+
+def getBetaFunction(nx):
+    return 50 * np.cos(8 * np.arccos(np.linspace(0, 1, nx + 1))).astype(np.float32)
+
+# Smooth Dirichlet control matching the initial condition at x=X
+controls = 3 * np.cos(2 * np.pi * control_sample_rate * np.arange(int(round(T / control_sample_rate))))
+
+def parameters(dt):
+    return {
+        "T": T,
+        "dt": dt,
+        "X": X,
+        "dx": dx,
+        "reward_class": TunedReward1D(int(round(T/dt)), -1e3, 3e2),
+        "normalize": False,
+        "sensing_loc": "full",
+        "control_type": "Dirchilet",
+        "sensing_type": None,
+        "sensing_noise_func": lambda state: state,
+        "limit_pde_state_size": False,
+        "max_state_value": 1e10,
+        "max_control_value": 20,
+        "reset_init_condition_func": getInitialCondition,
+        "reset_recirculation_func": getBetaFunction,
+        "control_sample_rate": control_sample_rate,
+    }
+
+def runEpisode(solver, dt, backend):
+    with contextlib.redirect_stdout(io.StringIO()):
+        env = gym.make("PDEControlGym-ReactionDiffusionPDE1D", solver=solver, backend=backend, **parameters(dt))
+    # Compile outside of the timed region
+    env.reset(seed=0)
+    env.step(controls[0])
+    obs, _ = env.reset(seed=0)
+    states = []
+    start = time.perf_counter()
+    for control in controls:
+        obs, reward, terminate, truncate, info = env.step(control)
+        states.append(obs)
+    return np.array(states, dtype=np.float64), time.perf_counter() - start
+
+backends = ["numpy", "numba"] if NUMBA_AVAILABLE else ["numpy"]
+reference, _ = runEpisode("explicit", 1e-6, backends[-1])
+norm = np.linalg.norm(reference, axis=1)
+
+print(f"{'solver':>15} {'dt':>8} " + " ".join(f"{backend + ' time [s]':>16}" for backend in backends) + f" {'max relative L2 error':>22}")
+cases = [("explicit", 1e-5)] + [(solver, dt) for solver in ["crank-nicolson", "implicit"] for dt in [1e-5, 1e-4, 2.5e-4, 1e-3]]
+for solver, dt in cases:
+    times = []
+    for backend in backends:
+        states, elapsed = runEpisode(solver, dt, backend)
+        times.append(elapsed)
+    error = (np.linalg.norm(states - reference, axis=1) / norm).max()
+    print(f"{solver:>15} {dt:>8.1e} " + " ".join(f"{elapsed:>16.3f}" for elapsed in times) + f" {error:>22.2e}")
@@ -6,6 +6,7 @@ from stable_baselines3 import PPO
 from stable_baselines3 import SAC
 import pde_control_gym
 from pde_control_gym.src import TunedReward1D
+from pde_control_gym.src.controllers import BacksteppingController
 
 # THIS EXAMPLE TEST A SERIES OF ALGORITHMS AND CALCULATES THE AVERAGE REWARD OF EACH OVER 1K SAMPLES
 
@@ -20,26 +21,6 @@ def solveBetaFunction(x, gamma):
         beta[idx] = 50*math.cos(gamma*math.acos(val))
     return beta
 
-# Kernel function solver for backstepping
-def solveKernelFunction(beta):
-    k = np.zeros((len(beta), len(beta)))
-    # First we calculate a at each timestep
-    a = beta
-
-    # FD LOOP
-    k[1][1] = -(a[1] + a[0]) * dx / 4
-    for i in range(1, len(beta)-1):
-        k[i+1][0] = 0
-        k[i+1][i+1] = k[i][i]-dx/4.0*(a[i-1] + a[i])
-        k[i+1][i] = k[i][i] - dx/2 * a[i]
-        for j in range(1, i):
-                k[i+1][j] = -k[i-1][j] + k[i][j+1] + k[i][j-1] + a[j]*(dx**2)*(k[i][j+1]+k[i][j-1])/2
-    return k
-
-# Control convolution solver
-def solveControl(kernel, u):
-    return sum(kernel[-1][0:len(u)-1]*u[0:len(u)-1])*dx
-
 # Set initial condition function here
 def getInitialCondition(nx):
     return np.ones(nx+1)*np.random.uniform(1, 10)
@@ -100,9 +81,8 @@ def runSingleEpisode(model, env, parameter):
     u = np.array(uStorage)
     return rew, u
 
-def bcksController(obs, beta):
-    kernel = solveKernelFunction(beta)
-    return solveControl(kernel, obs)
+def bcksController(obs, controller):
+    return controller(obs)
 
 def RLController(obs, model):
     action, _state = model.predict(obs)
@@ -125,6 +105,7 @@ num_instances = 10
 # For backstepping controller
 spatial = np.linspace(dx, X, int(round(X/dx)))
 beta = solveBetaFunction(spatial, 7.35)
+controller = BacksteppingController("reaction-diffusion", beta, dx)
 
 # Load RL models. # DUMMY ARGUMENTS NEED TO BE MODIFIED
 ppoModelPath = "./logsPPO/rl_model_1000_steps"
@@ -136,7 +117,7 @@ sacModel = SAC.load(sacModelPath)
 # Backstepping
 total_bcks_reward = 0
 for i in range(num_instances):
-    rew, _ = runSingleEpisode(bcksController, envBcks, beta)
+    rew, _ = runSingleEpisode(bcksController, envBcks, controller)
     total_bcks_reward += rew
 print("Backstepping Reward Average:", total_bcks_reward/num_instances)
 
@@ -0,0 +1,78 @@
+import math
+import time
+import numpy as np
+import gymnasium as gym
+import pde_control_gym
+from pde_control_gym.src import TunedReward1D
+from pde_control_gym.src.controllers import BacksteppingController
+
+# THIS EXAMPLE SCORES LINEAR FEEDBACK GAINS OF THE HYPERBOLIC PDE WITH CLOSED-LOOP ROLLOUTS.
+# The backstepping gain is scaled by a factor and every scaled gain is evaluated over a
+# whole episode, once with a loop over step and once with rollout_linear_feedback. Both
+# give the same total reward. With the numba backend the rollout runs the feedback, the
+# substeps and the reward of the whole episode as one compiled function. With numpy it
+# runs the periods of step in a Python loop and costs about as much as the loop over step.
+# The propagator solver with the decimated history, which only stores the control samples,
+# applies every period as one matrix product and the rollout iterates the closed loop map.
+
+def solveBetaFunction(x, gamma):
+    beta = np.zeros(len(x), dtype=np.float32)
+    for idx, val in enumerate(x):
+        beta[idx] = 5*math.cos(gamma*math.acos(val))
+    return beta
+
+def getInitialCondition(nx):
+    return np.ones(nx)*5
+
+def getBetaFunction(nx):
+    return solveBetaFunction(np.linspace(0, 1, nx), 7.35)
+
+T = 5
+dt = 1e-4
+dx = 1e-2
+X = 1
+
+def makeEnv(backend, solver, history):
+    hyperbolicParameters = {
+            "T": T, "dt": dt, "X": X, "dx": dx,
+            "reward_class": TunedReward1D(int(round(T/dt)), -1e3, 3e2),
+            "normalize": False,
+            "sensing_loc": "full", "control_type": "Dirchilet", "sensing_type": None,
+            "sensing_noise_func": lambda state: state,
+            "limit_pde_state_size": True, "max_state_value": 1e10, "max_control_value": 20,
+            "reset_init_condition_func": getInitialCondition,
+            "reset_recirculation_func": getBetaFunction,
+            "control_sample_rate": 0.01,
+            "backend": backend, "solver": solver, "history": history,
+    }
+    return gym.make("PDEControlGym-TransportPDE1D", **hyperbolicParameters)
+
+spatial = np.linspace(dx, X, int(round(X/dx)))
+controller = BacksteppingController("transport", solveBetaFunction(spatial, 7.35), dx)
+gain = controller.gain
+scales = [0, 0.25, 0.5, 0.75, 1, 1.25]
+
+def scoreWithStep(env, K):
+    obs, _ = env.reset()
+    total = 0
+    terminate = truncate = False
+    while not terminate and not truncate:
+        obs, reward, terminate, truncate, _ = env.step(K @ obs)
+        total += reward
+    return total
+
+def scoreWithRollout(env, K):
+    env.reset()
+    _, _, rewards = env.unwrapped.rollout_linear_feedback(K)
+    return rewards.sum()
+
+print(f"{'backend':>8} {'solver':>11} {'history':>10} {'mode':>8} {'time [s]':>9}  total reward per gain scale {scales}")
+for backend, solver, history in [("numpy", "explicit", "full"), ("numba", "explicit", "full"), ("numpy", "propagator", "decimated")]:
+    env = makeEnv(backend, solver, history)
+    # Compiles the numba kernels before timing
+    scoreWithRollout(env, gain)
+    for mode, score in [("step", scoreWithStep), ("rollout", scoreWithRollout)]:
+        start = time.perf_counter()
+        totals = [score(env, scale * gain) for scale in scales]
+        elapsed = time.perf_counter() - start
+        print(f"{backend:>8} {solver:>11} {history:>10} {mode:>8} {elapsed:>9.3f}  " + " ".join(f"{total:8.2f}" for total in totals))
@@ -3,6 +3,7 @@ import numpy as np
 import math
 import matplotlib.pyplot as plt
 from pde_control_gym.src import TunedReward1D
+from pde_control_gym.src.controllers import BacksteppingController
 import pde_control_gym
 
 # THIS EXAMPLE SOLVES THE HYPERBOLIC PDE PROBLEM USING A BACKSTEPPING CONTROLLER
@@ -18,23 +19,6 @@ def solveBetaFunction(x, gamma):
         beta[idx] = 5*math.cos(gamma*math.acos(val))
     return beta
 
-# Kernel function solver for backstepping
-def solveKernelFunction(theta):
-    kappa = np.zeros(len(theta))
-    for i in range(0, len(theta)):
-        kernelIntegral = 0
-        for j in range(0, i):
-            kernelIntegral += (kappa[i-j]*theta[j])*dx
-        kappa[i] = kernelIntegral  - theta[i]
-    return np.flip(kappa)
-
-# Control convolution solver
-def solveControl(kernel, u):
-    res = 0
-    for i in range(len(u)):
-        res += kernel[i]*u[i]
-    return res*1e-2
-
 # Set initial condition function here
 def getInitialCondition(nx):
     return np.ones(nx)*np.random.uniform(1, 10)
@@ -86,12 +70,12 @@ obs,__ = env.reset()
 uStorage.append(obs)
 
 spatial = np.linspace(dx, X, int(round(X/dx)))
-kernel = solveKernelFunction(solveBetaFunction(spatial, 7.35))
+controller = BacksteppingController("transport", solveBetaFunction(spatial, 7.35), dx)
 i = 0
 rew = 0
 while not truncate and not terminate:
     # use backstepping controller
-    action = solveControl(kernel, obs)
+    action = controller(obs)
     obs, rewards, terminate, truncate, info = env.step(action)
     uStorage.append(obs)
     rew += rewards 
@@ -5,6 +5,7 @@ import matplotlib.pyplot as plt
 from stable_baselines3 import PPO
 from stable_baselines3 import SAC
 from pde_control_gym.src import TunedReward1D
+from pde_control_gym.src.controllers import BacksteppingController
 import pde_control_gym
 
 # THIS EXAMPLE TEST A SERIES OF ALGORITHMS AND CALCULATES THE AVERAGE REWARD OF EACH OVER 1K SAMPLES
@@ -20,23 +21,6 @@ def solveBetaFunction(x, gamma):
         beta[idx] = 5*math.cos(gamma*math.acos(val))
     return beta
 
-# Kernel function solver for backstepping
-def solveKernelFunction(theta):
-    kappa = np.zeros(len(theta))
-    for i in range(0, len(theta)):
-        kernelIntegral = 0
-        for j in range(0, i):
-            kernelIntegral += (kappa[i-j]*theta[j])*dx
-        kappa[i] = kernelIntegral  - theta[i]
-    return np.flip(kappa)
-
-# Control convolution solver
-def solveControl(kernel, u):
-    res = 0
-    for i in range(len(u)):
-        res += kernel[i]*u[i]
-    return res*1e-2
-
 # Set initial condition function here
 def getInitialCondition(nx):
     return np.ones(nx)*np.random.uniform(1, 10)
@@ -97,9 +81,8 @@ def runSingleEpisode(model, env, parameter):
     u = np.array(uStorage)
     return rew, u
 
-def bcksController(obs, beta):
-    kernel = solveKernelFunction(beta)
-    return solveControl(kernel, obs)
+def bcksController(obs, controller):
+    return controller(obs)
 
 def RLController(obs, model):
     action, _state = model.predict(obs)
@@ -122,6 +105,7 @@ num_instances = 10
 # For backstepping controller
 spatial = np.linspace(dx, X, int(round(X/dx))+1)
 beta = solveBetaFunction(spatial, 7.35)
+controller = BacksteppingController("transport", beta, dx)
 
 # Load RL models. # DUMMY ARGUMENTS NEED TO BE MODIFIED
 ppoModelPath = "./logsPPO/rl_model_10000_steps"
@@ -133,7 +117,7 @@ sacModel = SAC.load(sacModelPath)
 # Backstepping
 total_bcks_reward = 0
 for i in range(num_instances):
-    rew, _ = runSingleEpisode(bcksController, envBcks, beta)
+    rew, _ = runSingleEpisode(bcksController, envBcks, controller)
     total_bcks_reward += rew
 print("Backstepping Reward Average:", total_bcks_reward/num_instances)
 
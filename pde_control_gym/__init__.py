@@ -9,9 +9,13 @@ register(
 )
 
 register(
-    id="PDEControlGym-TrafficPDE1D", entry_point="pde_control_gym.src:TrafficPDE1D"
+    id="PDEControlGym-TrafficPDE1D", entry_point="pde_control_gym.src:TrafficPDE1D", vector_entry_point="pde_control_gym.src:TrafficPDE1DVector"
 )
 
 register(
-    id="PDEControlGym-NavierStokes2D", entry_point="pde_control_gym.src:NavierStokes2D"
+    id="PDEControlGym-TrafficNetworkPDE1D", entry_point="pde_control_gym.src:TrafficNetworkPDE1D"
+)
+
+register(
+    id="PDEControlGym-NavierStokes2D", entry_point="pde_control_gym.src:NavierStokes2D", vector_entry_point="pde_control_gym.src:NavierStokes2DVector"
 )
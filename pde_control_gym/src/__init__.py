@@ -1,5 +1,6 @@
-from pde_control_gym.src.environments1d import TransportPDE1D, ReactionDiffusionPDE1D, TrafficPDE1D
-from pde_control_gym.src.environments2d import NavierStokes2D
+from pde_control_gym.src.environments1d import TransportPDE1D, ReactionDiffusionPDE1D, TrafficPDE1D, TrafficPDE1DVector, TrafficNetworkPDE1D, StateHistory
+from pde_control_gym.src.environments2d import NavierStokes2D, NavierStokes2DVector, ReferenceTrajectory
 from pde_control_gym.src.rewards import BaseReward, NormReward, TunedReward1D, NSReward, TrafficARZReward
+from pde_control_gym.src.controllers import BacksteppingController
 
-__all__ = ["TransportPDE1D", "ReactionDiffusionPDE1D", "NavierStokes2D", "BaseReward", "NormReward", "TunedReward1D", "NSReward", "TrafficPDE1D", "TrafficARZReward"]
+__all__ = ["TransportPDE1D", "ReactionDiffusionPDE1D", "NavierStokes2D", "NavierStokes2DVector", "ReferenceTrajectory", "BaseReward", "NormReward", "TunedReward1D", "NSReward", "TrafficPDE1D", "TrafficARZReward", "TrafficPDE1DVector", "TrafficNetworkPDE1D", "StateHistory", "BacksteppingController"]
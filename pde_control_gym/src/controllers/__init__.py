@@ -0,0 +1,3 @@
+from pde_control_gym.src.controllers.backstepping import transport_kernel, reaction_diffusion_kernel, BacksteppingController
+
+__all__ = ["transport_kernel", "reaction_diffusion_kernel", "BacksteppingController"]
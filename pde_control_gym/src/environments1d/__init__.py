@@ -1,4 +1,7 @@
 from pde_control_gym.src.environments1d.hyperbolic import TransportPDE1D
 from pde_control_gym.src.environments1d.parabolic import ReactionDiffusionPDE1D
 from pde_control_gym.src.environments1d.traffic_arz_env import TrafficPDE1D
-__all__ = ["TransportPDE1D", "ReactionDiffusionPDE1D", "TrafficPDE1D"]
+from pde_control_gym.src.environments1d.traffic_arz_vector_env import TrafficPDE1DVector
+from pde_control_gym.src.environments1d.traffic_arz_network_env import TrafficNetworkPDE1D
+from pde_control_gym.src.environments1d.state_history import StateHistory
+__all__ = ["TransportPDE1D", "ReactionDiffusionPDE1D", "TrafficPDE1D", "TrafficPDE1DVector", "TrafficNetworkPDE1D", "StateHistory"]
@@ -2,9 +2,12 @@ import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
 import matplotlib.pyplot as plt
+import warnings
 from abc import abstractmethod
-from typing import Type
-from pde_control_gym.src.rewards import BaseReward
+from typing import Optional, Tuple, Type
+from pde_control_gym.src.rewards import BaseReward, TunedReward1D
+from pde_control_gym.src.environments1d import numba_kernels
+from pde_control_gym.src.environments1d.numba_kernels import NUMBA_AVAILABLE
 
 class PDEEnv1D(gym.Env):
     """
@@ -16,8 +19,11 @@ class PDEEnv1D(gym.Env):
     :param dx: The spatial timestep of the simulation.
     :param reward_class: An instance of the reward class to specify user reward for each simulation step. Must inherit BaseReward class. See `reward documentation <../../utils/rewards.html>`_ for detials.
     :param normalize: Chooses whether to take action inputs between -1 and 1 and normalize them to betwen (``-max_control_value``, ``max_control_value``) or to leave inputs unaltered. ``max_control_value`` is environment specific so please see the environment for details. 
+    :param history: Chooses how the solution is stored over an episode. ``"full"`` keeps every timestep, ``"rolling"`` keeps the last ``history_window`` timesteps, ``"decimated"`` keeps the state at every control sample and ``"none"`` only keeps the latest timestep. See :class:`StateHistory` for details. The history must store the timesteps read by the reward, which is checked at construction with :meth:`BaseReward.history_lookback`. :class:`TunedReward1D` reads the state 100 timesteps back, which ``"decimated"`` serves if the control period divides 100 timesteps and the episode, and ``"rolling"`` with a ``history_window`` above 100.
+    :param history_window: Number of timesteps kept by the ``"rolling"`` history. Rewards reading past timesteps, such as :class:`NormReward` with the ``"differential"`` horizon, require the window to cover the timesteps they read.
+    :param backend: Chooses how the simulation substeps between two actions are computed. ``"numpy"`` runs the vectorized NumPy implementation and ``"numba"`` runs the whole substep loop as a single JIT-compiled function. ``"numba"`` requires the optional `numba <https://numba.pydata.org>`_ package and falls back to ``"numpy"`` with a warning if it is not installed.
     """
-    def __init__(self, T: float, dt: float, X: float, dx: float, reward_class: Type[BaseReward], normalize: bool = False):
+    def __init__(self, T: float, dt: float, X: float, dx: float, reward_class: Type[BaseReward], normalize: bool = False, history: str = "full", history_window: Optional[int] = None, backend: str = "numpy"):
         super(PDEEnv1D, self).__init__()
         # Build parameters for number of time steps and number of spatial steps
         self.nt = int(round(T/dt)+1)
@@ -33,17 +39,29 @@ class PDEEnv1D(gym.Env):
         self.action_space = spaces.Box(
             np.full(1, -1, dtype="float32"), np.full(1, 1, dtype="float32")
         )
+        self.normalize_action = normalize
         if normalize:
             self.normalize = lambda action, max_value : (action + 1)*max_value - max_value
         else:
             self.normalize = lambda action, max_value : action
-        # Holds entire system state. Modified with ghost points for parabolic PDE
-        self.u = np.zeros((self.nt, self.nx))
+        # Storage policy of the system state. The environments create the StateHistory since they know the ghost points and control rate
+        self.history = history
+        self.history_window = history_window
         self.time_index = 0
 
         # Setup reward function.
         self.reward_class = reward_class
 
+        # Setup compute backend for the simulation substeps
+        if backend not in ("numpy", "numba"):
+            raise Exception(
+                "Invalid backend parameter. Please use 'numpy' or 'numba'. See documentation for details."
+            )
+        if backend == "numba" and not NUMBA_AVAILABLE:
+            warnings.warn("Numba is not installed. Falling back to the numpy backend.")
+            backend = "numpy"
+        self.backend = backend
+
     @abstractmethod
     def step(self, action: np.ndarray):
         """
@@ -55,6 +73,74 @@ class PDEEnv1D(gym.Env):
         """
         pass
 
+    def sensing_operator(self) -> np.ndarray:
+        """
+        sensing_operator
+
+        Returns the matrix ``C`` of shape ``(m, n)`` mapping a state of ``n`` points to its noise free observation of ``m`` values, i.e. the observation is ``C @ u`` for the configured ``sensing_loc`` and ``sensing_type``.
+        """
+        n = self.u.state_shape[0]
+        return np.atleast_2d(self.sensing_update(np.eye(n), self.dx, lambda state: state))
+
+    def rollout_linear_feedback(self, K: np.ndarray, n_steps: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        rollout_linear_feedback
+
+        Runs the closed loop with the linear feedback ``control = K @ obs`` from the current state for ``n_steps`` control periods, or until the episode ends, without going through ``step``. The gain is folded into the sensing operator once, so the feedback is a single dot product with the state. The sensing noise function is not applied. Rewards, termination and the stored solution follow ``step``, so the rollout matches calling ``step`` with the same controls up to rounding and the environment is left in the same state.
+
+        With ``backend="numba"``, the ``"explicit"`` solver, the ``"full"`` history and the :class:`TunedReward1D` reward, the feedback, the substeps and the reward of all periods run in a single compiled function. With ``solver="propagator"`` every period the history does not store substeps of is a single product with the closed loop map :math:`A + b K^T`. Otherwise the periods run in a Python loop over the solver of ``step``.
+
+        :param K: Gain vector with one entry per observed value.
+        :param n_steps: Number of control periods. Defaults to the remaining periods of the episode.
+        :return: A tuple of the states at the control samples of shape ``(n + 1, n_points)`` starting with the current state, the controls of shape ``(n,)`` and the rewards of shape ``(n,)``, where ``n`` is the number of periods run.
+        """
+        gain = np.asarray(K, dtype=np.float64).reshape(-1) @ self.sensing_operator()
+        sample_rate = int(round(self.control_sample_rate/self.dt))
+        if n_steps is None:
+            n_steps = -(-(self.nt - 1 - self.time_index) // sample_rate)
+        controls = np.empty(n_steps)
+        rewards = np.empty(n_steps)
+        t0 = self.time_index
+        if self.backend == "numba" and self.solver == "explicit" and self.u.policy == "full" and type(self.reward_class) is TunedReward1D:
+            # Whole closed loop runs as a single compiled function
+            reward = self.reward_class
+            n, self.time_index = numba_kernels.linear_feedback_closed_loop(
+                self.u.stored(), t0, n_steps, sample_rate, gain, self.dx, self.dt, self.beta, self.has_diffusion,
+                self.control_type == "Neumann", self.normalize_action, self.max_control_value,
+                self.limit_pde_state_size, self.max_state_value, reward.nt, reward.truncate_penalty, reward.terminate_reward, reward.history_lookback(),
+                controls, rewards,
+            )
+            self.u.commit(t0, self.time_index - t0)
+            samples = np.minimum(t0 + sample_rate * np.arange(n + 1), self.time_index)
+            return self.u.stored()[samples].astype(np.float64), controls[:n], rewards[:n]
+        closed_loop = None
+        if self.solver == "propagator":
+            # Closed loop map of a full control period, the control enters through the gain
+            A, b, C, d = self.propagator
+            closed_loop = A + np.outer(b, gain)
+            closed_trace = C + np.outer(d, gain)
+        states = np.empty((n_steps + 1, gain.shape[0]))
+        states[0] = self.u[t0]
+        n = 0
+        while n < n_steps:
+            controls[n] = gain @ states[n]
+            t0 = self.time_index
+            if closed_loop is not None and t0 + sample_rate <= self.nt - 1 and not self.u.stores_between(t0, sample_rate):
+                u = self.u.period(t0, sample_rate)
+                u[sample_rate] = closed_loop @ u[0]
+                self.u.commit(t0, sample_rate, closed_trace @ u[0])
+                self.time_index = t0 + sample_rate
+            else:
+                self._advance_period(controls[n])
+            terminate = self.terminate()
+            truncate = self.truncate()
+            states[n + 1] = self.u[self.time_index]
+            rewards[n] = self.reward_class.reward(self.u, self.time_index, terminate, truncate, self.u[self.time_index][-1])
+            n += 1
+            if terminate or truncate:
+                break
+        return states[:n + 1], controls[:n], rewards[:n]
+
     @abstractmethod
     def reset(self, init_cond: np.ndarray, recirculation_func):
         """
@@ -1,9 +1,13 @@
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
+import warnings
 from typing import Callable, Optional
 
 from pde_control_gym.src.environments1d.base_env_1d import PDEEnv1D
+from pde_control_gym.src.environments1d import numba_kernels
+from pde_control_gym.src.environments1d.linear_propagator import control_period_propagator
+from pde_control_gym.src.environments1d.state_history import StateHistory
 
 class TransportPDE1D(PDEEnv1D):
     r""" 
@@ -21,6 +25,7 @@ class TransportPDE1D(PDEEnv1D):
     :param max_state_value: Only used when ``limit_pde_state_size`` is ``True``. Then, this sets the value for which the :math:`L_2` norm of the PDE will be compared to at each step asin ``limit_pde_state_size``.
     :param max_control_value: Sets the maximum control value input as between [``-max_control_value``, ``max_control_value``] and is used in the normalization of action inputs.
     :param control_sample_rate: Sets the sample rate at which the controller is applied to the PDE. This allows the PDE to be simulated at a smaller resolution then the controller.
+    :param solver: Sets how the PDE is advanced over one control period. ``"explicit"`` runs the finite difference substeps one by one. ``"propagator"`` uses that the PDE is linear in :math:`u` for a fixed :math:`\beta` and applies the whole control period as a single affine map :math:`u \mapsto Au + bU` which is built once per ``reset`` and cached across episodes with identical plants. The map only yields the state at the end of the period, so a control period whose substeps are stored by the history runs the explicit substeps instead. The propagator therefore only applies with the ``"decimated"`` and ``"none"`` histories, which store the state at the control samples, and warns at construction with the other histories. ``history="decimated"`` is the setup to use with :class:`TunedReward1D`. The boundary values of the skipped substeps are computed with a second affine map, so :meth:`StateHistory.boundary_sum` and the terminal reward of :class:`TunedReward1D` match the ``"explicit"`` solver.
     """
     def __init__(self, sensing_noise_func: Callable[[np.ndarray], np.ndarray],
                  reset_init_condition_func: Callable[[int], np.ndarray],
@@ -32,6 +37,7 @@ class TransportPDE1D(PDEEnv1D):
                  max_state_value: float = 1e10, 
                  max_control_value: float = 20, 
                  control_sample_rate: float=0.1,
+                 solver: str = "explicit",
                  **kwargs):
         super().__init__(**kwargs)
         self.sensing_noise_func = sensing_noise_func
@@ -44,6 +50,19 @@ class TransportPDE1D(PDEEnv1D):
         self.max_state_value = max_state_value
         self.max_control_value = max_control_value
         self.control_sample_rate = control_sample_rate
+        if solver not in ("explicit", "propagator"):
+            raise Exception(
+                "Invalid solver parameter. Please use 'explicit' or 'propagator'. See documentation for details."
+            )
+        self.solver = solver
+        # Selects the substeps of the compiled closed loop of rollout_linear_feedback
+        self.has_diffusion = False
+        # Holds the system state over the episode according to the history policy
+        self.u = StateHistory(self.nt, self.nx, self.history, self.history_window, int(round(control_sample_rate/self.dt)))
+        # Fail before the episode if the reward reads timesteps the history does not store
+        self.u.check_lookback(self.reward_class.history_lookback(), int(round(control_sample_rate/self.dt)))
+        if solver == "propagator" and self.u.stores_between(0, int(round(control_sample_rate/self.dt))):
+            warnings.warn(f"The propagator solver only computes the state at the end of a control period, but history='{self.history}' stores every substep. The control periods run the explicit substeps instead. Use history='decimated' to apply the propagator.")
 	    # Observation space changes depending on sensing
         match self.sensing_loc:
             case "full":
@@ -131,29 +150,7 @@ class TransportPDE1D(PDEEnv1D):
 
         :param control: The control input to apply to the PDE at the boundary.
         """
-        Nx = self.nx
-        dx = self.dx
-        dt = self.dt
-        sample_rate = int(round(self.control_sample_rate/dt))
-        i = 0
-        # Actions are applied at a slower rate then the PDE is simulated at
-        while i < sample_rate and self.time_index < self.nt-1:
-            self.time_index += 1
-            # Explicit update of u according to finite difference derivation
-            self.u[self.time_index][-1] = self.normalize(self.control_update(
-                control, self.u[self.time_index][-2], dx), self.max_control_value
-            )
-            self.u[self.time_index][0 : Nx - 1] = self.u[self.time_index - 1][
-                0 : Nx - 1
-            ] + dt * (
-                (
-                    self.u[self.time_index - 1][1:Nx]
-                    - self.u[self.time_index - 1][0 : Nx - 1]
-                )
-                / dx
-                + (self.u[self.time_index - 1][0] * self.beta)[0 : Nx - 1]
-            )
-            i += 1
+        self._advance_period(control)
         terminate = self.terminate()
         truncate = self.truncate()
         return (
@@ -168,6 +165,76 @@ class TransportPDE1D(PDEEnv1D):
             {},
         )
 
+    def _advance_period(self, control: float):
+        # Advances the PDE by one control period with a constant control and commits the substeps to the history
+        Nx = self.nx
+        dx = self.dx
+        dt = self.dt
+        sample_rate = int(round(self.control_sample_rate/dt))
+        t0 = self.time_index
+        n = min(sample_rate, self.nt - 1 - t0)
+        # Row 0 holds the current state and rows 1 to n the substeps of this control period
+        u = self.u.period(t0, n)
+        if self.solver == "propagator" and not self.u.stores_between(t0, n):
+            # Whole control period is applied as a single affine map. The map only yields the last substep, so periods whose substeps are stored run the substeps below
+            if n > 0:
+                A, b, C, d = self.propagator if n == sample_rate else self.control_period_propagator(n)
+                control = float(np.squeeze(control))
+                u[n] = A @ u[0] + b * control
+                # Boundary values of the substeps which are not simulated for the boundary sum of the history
+                self.u.commit(t0, n, C @ u[0] + d * control)
+                self.time_index = t0 + n
+                return
+        elif self.backend == "numba":
+            # Whole substep loop runs as a single compiled function
+            numba_kernels.transport_substeps(
+                u, 0, n, float(np.squeeze(control)), dx, dt, self.beta,
+                self.control_type == "Neumann", self.normalize_action, self.max_control_value,
+            )
+        else:
+            # Actions are applied at a slower rate then the PDE is simulated at
+            for t in range(1, n + 1):
+                # Explicit update of u according to finite difference derivation
+                u[t][-1] = self.normalize(self.control_update(
+                    control, u[t][-2], dx), self.max_control_value
+                )
+                u[t][0 : Nx - 1] = u[t - 1][0 : Nx - 1] + dt * (
+                    (u[t - 1][1:Nx] - u[t - 1][0 : Nx - 1]) / dx
+                    + (u[t - 1][0] * self.beta)[0 : Nx - 1]
+                )
+        self.u.commit(t0, n)
+        self.time_index = t0 + n
+
+    def substep_operator(self):
+        """
+        substep_operator
+
+        Returns the affine map ``(S, g)`` of a single explicit substep such that the next row of the solution is ``S @ u + g * control``.
+        """
+        nx, dx, dt = self.nx, self.dx, self.dt
+        beta = np.asarray(self.beta, dtype=np.float64)
+        scale = self.max_control_value if self.normalize_action else 1
+        S = np.zeros((nx, nx))
+        g = np.zeros(nx)
+        j = np.arange(nx - 1)
+        S[j, j] = 1 - dt / dx
+        S[j, j + 1] = dt / dx
+        S[j, 0] += dt * beta[0 : nx - 1]
+        # The control sets u(X). The Neumann update reads the not yet updated entry of the new row, which is zero
+        g[nx - 1] = scale * dx if self.control_type == "Neumann" else scale
+        return S, g
+
+    def control_period_propagator(self, n_substeps: int):
+        """
+        control_period_propagator
+
+        Returns the cached affine map ``(A, b)`` advancing the PDE by ``n_substeps`` substeps with a constant control, followed by the map ``(C, d)`` of the boundary values of the substeps, see :func:`compose_substeps`.
+
+        :param n_substeps: Number of substeps in the control period.
+        """
+        key = ("transport", np.asarray(self.beta).tobytes(), self.nx, self.dx, self.dt, self.control_sample_rate, self.control_type, self.normalize_action, self.max_control_value)
+        return control_period_propagator(key, self.substep_operator, n_substeps)
+
     def terminate(self):
         """
         terminate
@@ -211,12 +278,11 @@ class TransportPDE1D(PDEEnv1D):
             raise Exception(
                 "Please pass both an initial condition and a recirculation function in the parameters dictionary. See documentation for more details"
                 )
-        self.u = np.zeros(
-            (self.nt, self.nx), dtype=np.float32
-        )
-        self.u[0] = init_condition
+        self.u.reset(init_condition)
         self.time_index = 0
         self.beta = beta
+        if self.solver == "propagator":
+            self.propagator = self.control_period_propagator(int(round(self.control_sample_rate/self.dt)))
         return (
             self.sensing_update(
                 self.u[self.time_index],
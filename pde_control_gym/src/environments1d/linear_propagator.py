@@ -0,0 +1,55 @@
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, Tuple
+
+# Operators are shared by all environments of a process so identical plants reuse them across episodes.
+_PROPAGATOR_CACHE = OrderedDict()
+MAX_CACHED_PROPAGATORS = 64
+
+
+def compose_substeps(S: np.ndarray, g: np.ndarray, n_substeps: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    r"""
+    compose_substeps
+
+    Composes ``n_substeps`` applications of the affine substep map :math:`u \mapsto S u + g c` into a single control-period map :math:`u \mapsto A u + b c` by repeated squaring of the augmented matrix. The boundary value, the last entry of the state, of every substep is affine in the state and control at the start of the period as well. Its trace :math:`u \mapsto C u + d c` over the substeps ``1`` to ``n_substeps`` is built by propagating the last row of the augmented matrix.
+
+    :param S: Substep matrix of shape ``(n, n)``.
+    :param g: Substep control vector of shape ``(n,)``.
+    :param n_substeps: Number of substeps in the control period.
+    :return: A tuple ``(A, b, C, d)`` where ``C`` has shape ``(n_substeps, n)`` and ``d`` shape ``(n_substeps,)``.
+    """
+    n = S.shape[0]
+    augmented = np.zeros((n + 1, n + 1))
+    augmented[:n, :n] = S
+    augmented[:n, n] = g
+    augmented[n, n] = 1
+    period = np.linalg.matrix_power(augmented, n_substeps)
+    # Row t of the trace is the last row of the augmented matrix to the power t + 1
+    trace = np.empty((n_substeps, n + 1))
+    row = augmented[n - 1]
+    for t in range(n_substeps):
+        trace[t] = row
+        row = row @ augmented
+    return np.ascontiguousarray(period[:n, :n]), period[:n, n].copy(), np.ascontiguousarray(trace[:, :n]), trace[:, n].copy()
+
+
+def control_period_propagator(key: tuple, build_substep: Callable[[], Tuple[np.ndarray, np.ndarray]], n_substeps: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    control_period_propagator
+
+    Returns the cached control-period operator ``(A, b, C, d)`` of :func:`compose_substeps` for ``key`` or builds it from the substep map returned by ``build_substep``. The least recently used operators are evicted once ``MAX_CACHED_PROPAGATORS`` operators are cached.
+
+    :param key: Hashable description of the plant and discretization. ``n_substeps`` is appended to the key.
+    :param build_substep: Function returning the affine substep map ``(S, g)``.
+    :param n_substeps: Number of substeps in the control period.
+    """
+    key = key + (n_substeps,)
+    if key in _PROPAGATOR_CACHE:
+        _PROPAGATOR_CACHE.move_to_end(key)
+        return _PROPAGATOR_CACHE[key]
+    S, g = build_substep()
+    propagator = compose_substeps(S, g, n_substeps)
+    _PROPAGATOR_CACHE[key] = propagator
+    if len(_PROPAGATOR_CACHE) > MAX_CACHED_PROPAGATORS:
+        _PROPAGATOR_CACHE.popitem(last=False)
+    return propagator
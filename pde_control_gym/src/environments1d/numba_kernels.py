@@ -0,0 +1,447 @@
+import numpy as np
+
+# Numba is an optional dependency. Without it the environments fall back to the NumPy backend.
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+
+def jit(func):
+    """
+    jit
+
+    Compiles ``func`` in nopython mode when Numba is installed. Otherwise the plain Python function is returned.
+    """
+    if NUMBA_AVAILABLE:
+        return numba.njit(cache=True)(func)
+    return func
+
+
+@jit
+def _boundary_value(control, state, dx, neumann, normalize, max_control_value):
+    # Mirrors control_update followed by normalize in the environments
+    if neumann:
+        value = control * dx + state
+    else:
+        value = control
+    if normalize:
+        value = (value + 1) * max_control_value - max_control_value
+    return value
+
+
+@jit
+def transport_substeps(u, t0, n, control, dx, dt, beta, neumann, normalize, max_control_value):
+    """
+    transport_substeps
+
+    Runs ``n`` explicit substeps of :class:`TransportPDE1D` writing rows ``t0+1`` to ``t0+n`` of ``u``.
+    """
+    nx = u.shape[1]
+    for t in range(t0 + 1, t0 + n + 1):
+        u[t, nx - 1] = _boundary_value(control, u[t, nx - 2], dx, neumann, normalize, max_control_value)
+        u0 = u[t - 1, 0]
+        for j in range(nx - 1):
+            u[t, j] = u[t - 1, j] + dt * ((u[t - 1, j + 1] - u[t - 1, j]) / dx + u0 * beta[j])
+
+
+@jit
+def reaction_diffusion_substeps(u, t0, n, control, dx, dt, beta, neumann, normalize, max_control_value):
+    """
+    reaction_diffusion_substeps
+
+    Runs ``n`` explicit substeps of :class:`ReactionDiffusionPDE1D` writing rows ``t0+1`` to ``t0+n`` of ``u``. The last column of ``u`` is the ghost point.
+    """
+    nx = u.shape[1] - 1
+    F = dt / (dx**2)
+    for t in range(t0 + 1, t0 + n + 1):
+        for j in range(1, nx):
+            u[t, j] = u[t - 1, j] + F * (u[t - 1, j - 1] - 2 * u[t - 1, j] + u[t - 1, j + 1]) + dt * beta[j] * u[t - 1, j]
+        u[t, 0] = 0
+        u[t, nx] = _boundary_value(control, u[t - 1, nx - 1], dx, neumann, normalize, max_control_value)
+
+
+@jit
+def _norm(u, t):
+    # L2 norm of row t of u
+    total = 0.0
+    for j in range(u.shape[1]):
+        total += u[t, j] * u[t, j]
+    return np.sqrt(total)
+
+
+@jit
+def _tuned_reward(u, t, terminate, truncate, nt, truncate_penalty, terminate_reward, lookback):
+    # TunedReward1D of timestep t of the full solution u. Negative timesteps wrap around as in the solution array
+    norm = _norm(u, t)
+    if terminate and norm < 20:
+        boundary = 0.0
+        for s in range(u.shape[0]):
+            boundary += abs(u[s, u.shape[1] - 1])
+        return terminate_reward - boundary / 1000 - norm
+    if truncate:
+        return truncate_penalty * (nt - t)
+    past = t - lookback
+    if past < 0:
+        past += u.shape[0]
+    return _norm(u, past) - norm
+
+
+@jit
+def linear_feedback_closed_loop(u, t0, n_periods, sample_rate, gain, dx, dt, beta, diffusion, neumann, normalize, max_control_value, limit, max_state_value, nt, truncate_penalty, terminate_reward, lookback, controls, rewards):
+    """
+    linear_feedback_closed_loop
+
+    Runs up to ``n_periods`` control periods of :meth:`PDEEnv1D.rollout_linear_feedback` from timestep ``t0`` of the full solution ``u``, with the control ``gain @ u[t]`` at the start of every period written into ``controls``. The substeps follow :func:`transport_substeps`, or :func:`reaction_diffusion_substeps` if ``diffusion``, and every period is scored with :class:`TunedReward1D` of parameters ``nt``, ``truncate_penalty``, ``terminate_reward`` and ``lookback`` into ``rewards``. The loop ends after the period on which ``step`` would end the episode, i.e. the last timestep of ``u`` is reached or, with ``limit``, the norm of the state reaches ``max_state_value``.
+
+    Returns the number of periods run and the new time index.
+    """
+    last = u.shape[0] - 1
+    t = t0
+    n = 0
+    while n < n_periods:
+        control = 0.0
+        for j in range(gain.shape[0]):
+            control += gain[j] * u[t, j]
+        controls[n] = control
+        m = min(sample_rate, last - t)
+        if diffusion:
+            reaction_diffusion_substeps(u, t, m, control, dx, dt, beta, neumann, normalize, max_control_value)
+        else:
+            transport_substeps(u, t, m, control, dx, dt, beta, neumann, normalize, max_control_value)
+        t += m
+        terminate = t >= last
+        truncate = limit and _norm(u, t) >= max_state_value
+        rewards[n] = _tuned_reward(u, t, terminate, truncate, nt, truncate_penalty, terminate_reward, lookback)
+        n += 1
+        if terminate or truncate:
+            break
+    return n, t
+
+
+@jit
+def _veq(vm, rm, rho):
+    return vm * (1 - rho / rm)
+
+
+@jit
+def _arz_step(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, r_half, y_half, fr_half, fy_half):
+    # One Lax-Wendroff timestep of TrafficPDE1D in place
+    M = r.shape[0]
+    # Boundary conditions
+    r[0] = r[1]
+    y[0] = q_inlet - r[0] * _veq(vm, rm, r[0])
+    r[M - 1] = r[M - 2]
+    y[M - 1] = q_outlet - r[M - 1] * _veq(vm, rm, r[M - 1])
+    _arz_interior(r, y, 1, M - 1, dt, dx, vm, rm, tau, r_half, y_half, fr_half, fy_half)
+
+
+@jit
+def _arz_interior(r, y, lo, hi, dt, dx, vm, rm, tau, r_half, y_half, fr_half, fy_half):
+    # Lax-Wendroff update of the cells lo to hi-1 in place, with the cells lo-1 and hi as fixed neighbors
+    lam = dt / (2 * dx)
+    # Midpoint values and their fluxes
+    ve = _veq(vm, rm, r[lo - 1])
+    fr_l = y[lo - 1] + r[lo - 1] * ve
+    fy_l = y[lo - 1] * (y[lo - 1] / r[lo - 1] + ve)
+    for j in range(lo - 1, hi):
+        ve = _veq(vm, rm, r[j + 1])
+        fr_r = y[j + 1] + r[j + 1] * ve
+        fy_r = y[j + 1] * (y[j + 1] / r[j + 1] + ve)
+        rh = 0.5 * (r[j + 1] + r[j]) - lam * (fr_r - fr_l)
+        yh = 0.5 * (y[j + 1] + y[j]) - lam * (fy_r - fy_l) - 0.25 * dt / tau * (y[j + 1] + y[j])
+        ve = _veq(vm, rm, rh)
+        r_half[j] = rh
+        y_half[j] = yh
+        fr_half[j] = yh + rh * ve
+        fy_half[j] = yh * (yh / rh + ve)
+        fr_l = fr_r
+        fy_l = fy_r
+
+    # Update values in the inner domain
+    for j in range(lo, hi):
+        r[j] -= (dt / dx) * (fr_half[j] - fr_half[j - 1])
+        y[j] -= (dt / dx) * (fy_half[j] - fy_half[j - 1]) + 0.5 * dt / tau * (y_half[j] + y_half[j - 1])
+
+
+@jit
+def _ctm_step(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, fr_half, fy_half):
+    # One cell transmission model timestep of TrafficPDE1D in place, see ctm_step
+    M = r.shape[0]
+    # Boundary conditions
+    r[0] = r[1]
+    y[0] = q_inlet - r[0] * _veq(vm, rm, r[0])
+    r[M - 1] = r[M - 2]
+    y[M - 1] = q_outlet - r[M - 1] * _veq(vm, rm, r[M - 1])
+
+    # Minimum of the demand of the upstream and the supply of the downstream cell on the upstream diagram
+    w_up = y[0] / r[0]
+    for j in range(M - 1):
+        w_down = y[j + 1] / r[j + 1]
+        critical = rm * (vm + w_up) / (2 * vm)
+        if j == 0:
+            demand = q_inlet
+        else:
+            rho = min(r[j], critical)
+            demand = rho * (vm + w_up - vm / rm * rho)
+        rho = max(r[j + 1] + rm / vm * (w_up - w_down), critical)
+        supply = max(rho * (vm + w_up - vm / rm * rho), 0.0)
+        if j == M - 2:
+            supply = min(supply, q_outlet)
+        fr_half[j] = min(demand, supply)
+        fy_half[j] = w_up * fr_half[j]
+        w_up = w_down
+
+    # Update values in the inner domain
+    for j in range(1, M - 1):
+        r[j] -= (dt / dx) * (fr_half[j] - fr_half[j - 1])
+        y[j] -= (dt / dx) * (fy_half[j] - fy_half[j - 1]) + dt / tau * y[j]
+
+
+@jit
+def _arz_timestep(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, ctm, split, r_half, y_half, fr_half, fy_half):
+    # One timestep of the chosen scheme, with the relaxation source split from the transport if split
+    M = r.shape[0]
+    if split:
+        decay = np.exp(-0.5 * dt / tau)
+        for j in range(1, M - 1):
+            y[j] *= decay
+        tau = np.inf
+    if ctm:
+        _ctm_step(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, fr_half, fy_half)
+    else:
+        _arz_step(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, r_half, y_half, fr_half, fy_half)
+    if split:
+        for j in range(1, M - 1):
+            y[j] *= decay
+
+
+@jit
+def arz_substeps(r, y, n, q_inlet, q_outlet, dt, dx, vm, rm, tau, ctm, split, r_half, y_half, fr_half, fy_half):
+    """
+    arz_substeps
+
+    Runs ``n`` Lax-Wendroff timesteps, or cell transmission model timesteps if ``ctm``, of :class:`TrafficPDE1D` updating the 1D arrays ``r`` and ``y`` in place. With ``split`` the relaxation source is integrated exactly as in :func:`split_relaxation_step`. The ``(M-1,)`` arrays ``r_half``, ``y_half``, ``fr_half`` and ``fy_half`` are scratch, e.g. the midpoint buffers of an :class:`ARZWorkspace`.
+    """
+    for _ in range(n):
+        _arz_timestep(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, ctm, split, r_half, y_half, fr_half, fy_half)
+
+
+@jit
+def arz_active_substeps(r, y, n, q_inlet, q_outlet, dt, dx, vm, rm, tau, rs, qs, tile, tolerance, deviating, active, starts, stops, r_half, y_half, fr_half, fy_half):
+    """
+    arz_active_substeps
+
+    Runs ``n`` Lax-Wendroff timesteps of :class:`TrafficPDE1D` that only update the active tiles of ``tile`` cells, see the ``active_tiles`` parameter of :class:`TrafficPDE1D`. A tile is active if one of its cells deviates from the steady state by more than ``tolerance`` relative to ``rs`` and ``qs``, if it lies within ``n`` cells of such a tile, or if it holds the inlet or the outlet. The boolean arrays ``deviating`` and ``active`` and the integer arrays ``starts`` and ``stops`` with one entry per tile are scratch, as are the ``(M-1,)`` midpoint buffers of :func:`arz_substeps`. Returns the number of active cells.
+    """
+    M = r.shape[0]
+    n_tiles = (M + tile - 1) // tile
+    deviating[:] = False
+    for j in range(M):
+        if abs(r[j] - rs) / rs > tolerance or abs(y[j]) / qs > tolerance:
+            deviating[j // tile] = True
+    deviating[0] = True
+    deviating[n_tiles - 1] = True
+    # Dilate the deviating tiles by the halo a wave crosses in n timesteps
+    halo = (n + tile - 1) // tile
+    active[:] = False
+    for k in range(n_tiles):
+        if deviating[k]:
+            active[max(k - halo, 0):min(k + halo + 1, n_tiles)] = True
+    segments = 0
+    cells = 0
+    for k in range(n_tiles):
+        if active[k] and (k == 0 or not active[k - 1]):
+            starts[segments] = k * tile
+        if active[k] and (k == n_tiles - 1 or not active[k + 1]):
+            stops[segments] = min((k + 1) * tile, M)
+            cells += stops[segments] - starts[segments]
+            segments += 1
+
+    for _ in range(n):
+        r[0] = r[1]
+        y[0] = q_inlet - r[0] * _veq(vm, rm, r[0])
+        r[M - 1] = r[M - 2]
+        y[M - 1] = q_outlet - r[M - 1] * _veq(vm, rm, r[M - 1])
+        for i in range(segments):
+            _arz_interior(r, y, max(starts[i], 1), min(stops[i], M - 1), dt, dx, vm, rm, tau, r_half, y_half, fr_half, fy_half)
+    return cells
+
+
+@jit
+def _arz_adaptive(r, y, period, cfl, q_inlet, q_outlet, dx, vm, rm, tau, ctm, split, r_half, y_half, fr_half, fy_half):
+    # CFL limited timesteps over one control period, returns the number of substeps
+    M = r.shape[0]
+    substeps = 0
+    remaining = period
+    while remaining > 1e-12 * period:
+        # Largest characteristic speed max(|v|, |v - rho * vm/rm|)
+        speed = 0.0
+        for j in range(M):
+            v = y[j] / r[j] + _veq(vm, rm, r[j])
+            speed = max(speed, abs(v), abs(v - r[j] * vm / rm))
+        dt = remaining if speed == 0 else min(cfl * dx / speed, remaining)
+        if not split:
+            dt = min(dt, tau)
+        _arz_timestep(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, ctm, split, r_half, y_half, fr_half, fy_half)
+        remaining -= dt
+        substeps += 1
+    return substeps
+
+
+@jit
+def arz_adaptive_substeps(r, y, period, cfl, q_inlet, q_outlet, dx, vm, rm, tau, ctm, split, r_half, y_half, fr_half, fy_half):
+    """
+    arz_adaptive_substeps
+
+    Advances the 1D arrays ``r`` and ``y`` of :class:`TrafficPDE1D` by ``period`` seconds with CFL limited Lax-Wendroff timesteps, or cell transmission model timesteps if ``ctm``, see :func:`adaptive_substeps`. Without ``split`` the timesteps are also limited by ``tau``. The midpoint buffers are scratch as in :func:`arz_substeps`. Returns the number of substeps.
+    """
+    return _arz_adaptive(r, y, period, cfl, q_inlet, q_outlet, dx, vm, rm, tau, ctm, split, r_half, y_half, fr_half, fy_half)
+
+
+@jit
+def _arz_control_period(r, y, v, q_inlet, q_outlet, time_index, T, dt, control_freq, cfl, dx, vm, rm, tau, ctm, split, vs, rs, r_half, y_half, fr_half, fy_half):
+    # One control period of TrafficPDE1D.step followed by the velocity and the reward of TrafficARZReward. Returns the new time index, the reward, whether a cell exceeds vm or rm and whether the state is steady
+    M = r.shape[0]
+    time_index += dt
+    if time_index < T:
+        if cfl > 0:
+            _arz_adaptive(r, y, control_freq * dt, cfl, q_inlet, q_outlet, dx, vm, rm, tau, ctm, split, r_half, y_half, fr_half, fy_half)
+        else:
+            for _ in range(control_freq):
+                _arz_timestep(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, ctm, split, r_half, y_half, fr_half, fy_half)
+    dv = 0.0
+    dr = 0.0
+    above = False
+    steady = True
+    for j in range(M):
+        v[j] = y[j] / r[j] + _veq(vm, rm, r[j])
+        dv += (v[j] - vs) ** 2
+        dr += (r[j] - rs) ** 2
+        above = above or v[j] > vm or r[j] > rm
+        steady = steady and r[j] - rs == 0 and v[j] - vs == 0
+    return time_index, -(np.sqrt(dv) / vs + np.sqrt(dr) / rs), above, steady
+
+
+@jit
+def arz_open_loop(r, y, v, q_inlet, q_outlet, time_index, T, dt, control_freq, cfl, dx, vm, rm, tau, ctm, split, vs, rs, reward_threshold, limit, rewards, states, stride, r_half, y_half, fr_half, fy_half):
+    """
+    arz_open_loop
+
+    Runs the control periods of :meth:`TrafficPDE1D.step_many` with the boundary fluxes ``q_inlet[k]`` and ``q_outlet[k]`` of period ``k``, updating ``r``, ``y`` and the velocity ``v`` in place. Every period runs ``control_freq`` timesteps of ``dt``, or CFL limited substeps if ``cfl > 0``, and is scored with :class:`TrafficARZReward` into ``rewards``. The density and velocity after every ``stride`` periods are written into the rows of ``states`` if ``stride > 0``. The loop ends after the period on which ``step`` would end the episode, i.e. ``time_index`` reaches ``T/dt``, the reward exceeds ``reward_threshold`` or the state is truncated.
+
+    The midpoint buffers are scratch as in :func:`arz_substeps`. Returns the number of periods run, the new ``time_index`` and whether the episode was terminated and truncated.
+    """
+    M = r.shape[0]
+    terminate = False
+    truncate = False
+    n = 0
+    while n < q_inlet.shape[0]:
+        time_index, rewards[n], above, steady = _arz_control_period(r, y, v, q_inlet[n], q_outlet[n], time_index, T, dt, control_freq, cfl, dx, vm, rm, tau, ctm, split, vs, rs, r_half, y_half, fr_half, fy_half)
+        n += 1
+        if stride > 0 and n % stride == 0:
+            states[n // stride - 1, :M] = r
+            states[n // stride - 1, M:] = v
+        if time_index >= T / dt:
+            time_index = 0.0
+            terminate = True
+        terminate = terminate or rewards[n - 1] > reward_threshold
+        truncate = (limit and above) or steady
+        if terminate or truncate:
+            break
+    return n, time_index, terminate, truncate
+
+
+@jit
+def arz_closed_loop(r, y, v, K, qs, low, high, inlet, outlet, start, stop, time_index, T, dt, control_freq, cfl, dx, vm, rm, tau, ctm, split, vs, rs, reward_threshold, limit, normalized, observations, actions, rewards, r_half, y_half, fr_half, fy_half):
+    """
+    arz_closed_loop
+
+    Runs the control periods ``start`` to ``stop-1`` of :meth:`TrafficPDE1D.rollout_linear_feedback` with the actions ``qs + K @ deviation``, where ``deviation`` holds the relative deviations of the density and velocity of every cell from ``rs`` and ``vs`` at the start of the period. The actions are written into ``actions`` and clipped to ``low`` and ``high`` before the inlet flux is taken from action ``inlet`` and the outlet flux from action ``outlet``, or ``qs`` for a negative index. Every period follows :func:`arz_open_loop` and writes its observation, the deviations if ``normalized`` and otherwise the density and velocity, into row ``k+1`` of ``observations``. The loop ends early after the period on which ``step`` would end the episode.
+
+    The midpoint buffers are scratch as in :func:`arz_substeps`. Returns the index after the last period run, the new ``time_index`` and whether the episode was terminated and truncated.
+    """
+    M = r.shape[0]
+    terminate = False
+    truncate = False
+    n = start
+    while n < stop:
+        for i in range(K.shape[0]):
+            action = qs
+            for j in range(M):
+                action += K[i, j] * (r[j] - rs) / rs + K[i, M + j] * (v[j] - vs) / vs
+            actions[n, i] = action
+        q_inlet = min(max(actions[n, inlet], low[inlet]), high[inlet]) if inlet >= 0 else qs
+        q_outlet = min(max(actions[n, outlet], low[outlet]), high[outlet]) if outlet >= 0 else qs
+        time_index, rewards[n], above, steady = _arz_control_period(r, y, v, q_inlet, q_outlet, time_index, T, dt, control_freq, cfl, dx, vm, rm, tau, ctm, split, vs, rs, r_half, y_half, fr_half, fy_half)
+        n += 1
+        for j in range(M):
+            if normalized:
+                observations[n, j] = (r[j] - rs) / rs
+                observations[n, M + j] = (v[j] - vs) / vs
+            else:
+                observations[n, j] = r[j]
+                observations[n, M + j] = v[j]
+        if time_index >= T / dt:
+            time_index = 0.0
+            terminate = True
+        terminate = terminate or rewards[n - 1] > reward_threshold
+        truncate = (limit and above) or steady
+        if terminate or truncate:
+            break
+    return n, time_index, terminate, truncate
+
+
+def tridiagonal_factor(lower, diag, upper):
+    """
+    tridiagonal_factor
+
+    Computes the LU (Thomas) factorization of the tridiagonal matrix with sub-diagonal ``lower``, diagonal ``diag`` and super-diagonal ``upper``. The factorization is returned as ``(lower, inv_pivot, upper_prime)`` for use with :func:`tridiagonal_solve`.
+    """
+    m = diag.shape[0]
+    inv_pivot = np.empty(m)
+    upper_prime = np.empty(m - 1)
+    inv_pivot[0] = 1 / diag[0]
+    for i in range(m - 1):
+        upper_prime[i] = upper[i] * inv_pivot[i]
+        inv_pivot[i + 1] = 1 / (diag[i + 1] - lower[i] * upper_prime[i])
+    return np.asarray(lower, dtype=np.float64).copy(), inv_pivot, upper_prime
+
+
+@jit
+def tridiagonal_solve(lower, inv_pivot, upper_prime, rhs, out):
+    """
+    tridiagonal_solve
+
+    Solves the factorized tridiagonal system for ``rhs`` in :math:`O(m)` writing the solution to ``out``.
+    """
+    m = rhs.shape[0]
+    out[0] = rhs[0] * inv_pivot[0]
+    for i in range(1, m):
+        out[i] = (rhs[i] - lower[i - 1] * out[i - 1]) * inv_pivot[i]
+    for i in range(m - 2, -1, -1):
+        out[i] -= upper_prime[i] * out[i + 1]
+
+
+@jit
+def reaction_diffusion_implicit_substeps(u, t0, n, control, dx, dt, beta, theta, lower, inv_pivot, upper_prime, neumann, normalize, max_control_value, rhs, sol):
+    """
+    reaction_diffusion_implicit_substeps
+
+    Runs ``n`` theta-method substeps of :class:`ReactionDiffusionPDE1D` writing rows ``t0+1`` to ``t0+n`` of ``u``. ``(lower, inv_pivot, upper_prime)`` is the factorized left hand side matrix from :func:`tridiagonal_factor`. ``rhs`` and ``sol`` are preallocated buffers of ``nx-1`` interior points for the right hand side and the solution.
+    """
+    nx = u.shape[1] - 1
+    F = dt / (dx**2)
+    # The boundary value is affine in the last interior point, u(X) = alpha * u_{nx-1} + gamma
+    gamma = _boundary_value(control, 0.0, dx, neumann, normalize, max_control_value)
+    for t in range(t0 + 1, t0 + n + 1):
+        for j in range(1, nx):
+            rhs[j - 1] = u[t - 1, j] + (1 - theta) * (F * (u[t - 1, j - 1] - 2 * u[t - 1, j] + u[t - 1, j + 1]) + dt * beta[j] * u[t - 1, j])
+        rhs[nx - 2] += theta * F * gamma
+        tridiagonal_solve(lower, inv_pivot, upper_prime, rhs, sol)
+        u[t, 0] = 0
+        for j in range(1, nx):
+            u[t, j] = sol[j - 1]
+        u[t, nx] = _boundary_value(control, u[t, nx - 1], dx, neumann, normalize, max_control_value)
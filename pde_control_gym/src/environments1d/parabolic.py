@@ -1,9 +1,30 @@
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
+import warnings
 from typing import Callable, Optional
 
 from pde_control_gym.src.environments1d.base_env_1d import PDEEnv1D
+from pde_control_gym.src.environments1d import numba_kernels
+from pde_control_gym.src.environments1d.linear_propagator import control_period_propagator
+from pde_control_gym.src.environments1d.state_history import StateHistory
+
+def _recurrence_scan(coefficients: np.ndarray):
+    # Passes of a prefix scan for y_i = a_i y_{i-1} + c_i with a_0 = 0. Pass s adds a_i^(s) y_{i-s}, where a^(s) is the product of the coefficients skipped so far
+    passes = []
+    a = coefficients.copy()
+    s = 1
+    while s < a.shape[0]:
+        passes.append((s, a[s:].copy()))
+        a[s:] = a[s:] * a[:-s]
+        s *= 2
+    return passes
+
+
+def _apply_scan(passes, y: np.ndarray):
+    # Turns y from the terms c_i into the solution of the recurrence in place
+    for s, a in passes:
+        y[s:] += a * y[:-s]
 
 class ReactionDiffusionPDE1D(PDEEnv1D):
     r""" 
@@ -21,6 +42,7 @@ class ReactionDiffusionPDE1D(PDEEnv1D):
     :param max_state_value: Only used when ``limit_pde_state_size`` is ``True``. Then, this sets the value for which the :math:`L_2` norm of the PDE will be compared to at each step asin ``limit_pde_state_size``.
     :param max_control_value: Sets the maximum control value input as between [``-max_control_value``, ``max_control_value``] and is used in the normalization of action inputs.
     :param control_sample_rate: Sets the sample rate at which the controller is applied to the PDE. This allows the PDE to be simulated at a smaller resolution then the controller.
+    :param solver: Sets how the PDE is advanced over one control period. ``"explicit"`` runs the finite difference substeps one by one. ``"propagator"`` uses that the PDE is linear in :math:`u` for a fixed :math:`\beta` and applies the whole control period as a single affine map :math:`u \mapsto Au + bU` which is built once per ``reset`` and cached across episodes with identical plants. The map only yields the state at the end of the period, so a control period whose substeps are stored by the history runs the explicit substeps instead. The propagator therefore only applies with the ``"decimated"`` and ``"none"`` histories, which store the state at the control samples, and warns at construction with the other histories. ``history="decimated"`` is the setup to use with :class:`TunedReward1D`. The boundary values of the skipped substeps are computed with a second affine map, so :meth:`StateHistory.boundary_sum` and the terminal reward of :class:`TunedReward1D` match the ``"explicit"`` solver. ``"crank-nicolson"`` and ``"implicit"`` (backward Euler) are unconditionally stable theta-method integrators which solve a tridiagonal system per substep with a factorization computed once per ``reset``. The ``"numba"`` backend runs the substitutions of the factorization in the compiled substeps and the ``"numpy"`` backend as vectorized prefix scans. They allow ``dt`` well above the explicit stability limit :math:`dt \leq dx^2/2`. The ghost point follows the boundary condition at the new time level, :math:`u(X) = U` for Dirichlet and :math:`u(X) = u_{N-1} + U dx` for Neumann control.
     """
     def __init__(self, sensing_noise_func: Callable[[np.ndarray], np.ndarray],
                  reset_init_condition_func: Callable[[int], np.ndarray],
@@ -32,6 +54,7 @@ class ReactionDiffusionPDE1D(PDEEnv1D):
                  max_state_value: float = 1e10, 
                  max_control_value: float = 20, 
                  control_sample_rate: float=0.0001,
+                 solver: str = "explicit",
                  **kwargs):
         super().__init__(**kwargs)
         self.sensing_noise_func = sensing_noise_func
@@ -44,6 +67,16 @@ class ReactionDiffusionPDE1D(PDEEnv1D):
         self.max_state_value = max_state_value
         self.max_control_value = max_control_value
         self.control_sample_rate = control_sample_rate
+        if solver not in ("explicit", "propagator", "crank-nicolson", "implicit"):
+            raise Exception(
+                "Invalid solver parameter. Please use 'explicit', 'propagator', 'crank-nicolson', or 'implicit'. See documentation for details."
+            )
+        self.solver = solver
+        # Selects the substeps of the compiled closed loop of rollout_linear_feedback
+        self.has_diffusion = True
+        self.theta = 0.5 if solver == "crank-nicolson" else 1.0
+        # Right hand side and solution of the tridiagonal solves of the implicit solvers
+        self._implicit_scratch = (np.empty(self.nx - 1), np.empty(self.nx - 1))
         # Observation space changes depending on sensing
         match self.sensing_loc:
             case "full":
@@ -120,8 +153,12 @@ class ReactionDiffusionPDE1D(PDEEnv1D):
                 raise Exception(
                     "Invalid control_type parameter. Please use 'Neumann' or 'Dirchilet'. See documentation for details."
                 )
-        # Add ghost point nx+1
-        self.u = np.zeros((self.nt, self.nx+1))
+        # Add ghost point nx+1. Holds the system state over the episode according to the history policy
+        self.u = StateHistory(self.nt, self.nx+1, self.history, self.history_window, int(round(control_sample_rate/self.dt)))
+        # Fail before the episode if the reward reads timesteps the history does not store
+        self.u.check_lookback(self.reward_class.history_lookback(), int(round(control_sample_rate/self.dt)))
+        if solver == "propagator" and self.u.stores_between(0, int(round(control_sample_rate/self.dt))):
+            warnings.warn(f"The propagator solver only computes the state at the end of a control period, but history='{self.history}' stores every substep. The control periods run the explicit substeps instead. Use history='decimated' to apply the propagator.")
 
     def step(self, control):
         """
@@ -131,24 +168,7 @@ class ReactionDiffusionPDE1D(PDEEnv1D):
 
         :param control: The control input to apply to the PDE at the boundary.
         """
-        Nx = self.nx
-        dx = self.dx
-        dt = self.dt
-        sample_rate = int(round(self.control_sample_rate/dt))
-        F = dt/(dx**2)
-        i = 0
-        # Actions are applied at a slower rate then the PDE is simulated at
-        while i < sample_rate and self.time_index < self.nt-1:
-            self.time_index += 1
-            self.u[self.time_index][1:Nx] = self.u[self.time_index-1][1:Nx] +  \
-                      F*(self.u[self.time_index-1][0:Nx-1] - 2*self.u[self.time_index-1][1:Nx] + self.u[self.time_index-1][2:Nx+1]) +dt*self.beta[1:Nx]*self.u[self.time_index-1][1:Nx]
-            # Explicit u(0, t) = 0 BC
-            self.u[self.time_index][0] = 0
-            # Explicit update of u according to finite difference derivation
-            self.u[self.time_index][-1] = self.normalize(self.control_update(
-                control, self.u[self.time_index-1][-2], self.dx), self.max_control_value
-            )
-            i += 1
+        self._advance_period(control)
         terminate = self.terminate()
         truncate = self.truncate()
         return (
@@ -163,6 +183,162 @@ class ReactionDiffusionPDE1D(PDEEnv1D):
             {},
         )
 
+    def _advance_period(self, control: float):
+        # Advances the PDE by one control period with a constant control and commits the substeps to the history
+        Nx = self.nx
+        dx = self.dx
+        dt = self.dt
+        sample_rate = int(round(self.control_sample_rate/dt))
+        F = dt/(dx**2)
+        t0 = self.time_index
+        n = min(sample_rate, self.nt - 1 - t0)
+        # Row 0 holds the current state and rows 1 to n the substeps of this control period
+        u = self.u.period(t0, n)
+        if self.solver == "propagator" and not self.u.stores_between(t0, n):
+            # Whole control period is applied as a single affine map. The map only yields the last substep, so periods whose substeps are stored run the substeps below
+            if n > 0:
+                A, b, C, d = self.propagator if n == sample_rate else self.control_period_propagator(n)
+                control = float(np.squeeze(control))
+                u[n] = A @ u[0] + b * control
+                # Boundary values of the substeps which are not simulated for the boundary sum of the history
+                self.u.commit(t0, n, C @ u[0] + d * control)
+                self.time_index = t0 + n
+                return
+        elif self.solver in ("crank-nicolson", "implicit"):
+            self.implicit_substeps(u, n, float(np.squeeze(control)))
+        elif self.backend == "numba":
+            # Whole substep loop runs as a single compiled function
+            numba_kernels.reaction_diffusion_substeps(
+                u, 0, n, float(np.squeeze(control)), dx, dt, self.beta,
+                self.control_type == "Neumann", self.normalize_action, self.max_control_value,
+            )
+        else:
+            # Actions are applied at a slower rate then the PDE is simulated at
+            for t in range(1, n + 1):
+                u[t][1:Nx] = u[t-1][1:Nx] +  \
+                          F*(u[t-1][0:Nx-1] - 2*u[t-1][1:Nx] + u[t-1][2:Nx+1]) +dt*self.beta[1:Nx]*u[t-1][1:Nx]
+                # Explicit u(0, t) = 0 BC
+                u[t][0] = 0
+                # Explicit update of u according to finite difference derivation
+                u[t][-1] = self.normalize(self.control_update(
+                    control, u[t-1][-2], self.dx), self.max_control_value
+                )
+        self.u.commit(t0, n)
+        self.time_index = t0 + n
+
+    def implicit_substeps(self, u: np.ndarray, n_substeps: int, control: float):
+        """
+        implicit_substeps
+
+        Advances the PDE by ``n_substeps`` theta-method substeps with a constant control using the factorization built in ``reset``.
+
+        :param u: Array whose first row holds the current state. Rows ``1`` to ``n_substeps`` are overwritten with the substeps.
+        :param n_substeps: Number of substeps to take.
+        :param control: The control input to apply to the PDE at the boundary.
+        """
+        theta = self.theta
+        if self.backend == "numba":
+            numba_kernels.reaction_diffusion_implicit_substeps(
+                u, 0, n_substeps, control, self.dx, self.dt, self.beta, theta,
+                *self.factorization,
+                self.control_type == "Neumann", self.normalize_action, self.max_control_value,
+                *self._implicit_scratch,
+            )
+            return
+        Nx = self.nx
+        dt = self.dt
+        F = dt/(self.dx**2)
+        # The ghost point is affine in the last interior point, u(X) = alpha*u_{N-1} + gamma
+        gamma = self.normalize(self.control_update(control, 0.0, self.dx), self.max_control_value)
+        rhs = self._implicit_scratch[0]
+        for t in range(1, n_substeps + 1):
+            prev = u[t-1]
+            rhs[:] = prev[1:Nx] + (1-theta)*(F*(prev[0:Nx-1] - 2*prev[1:Nx] + prev[2:Nx+1]) + dt*self.beta[1:Nx]*prev[1:Nx])
+            rhs[-1] += theta*F*gamma
+            u[t][1:Nx] = self.implicit_solve(rhs)
+            u[t][0] = 0
+            u[t][-1] = self.normalize(self.control_update(
+                control, u[t][-2], self.dx), self.max_control_value
+            )
+
+    def implicit_matrix(self):
+        r"""
+        implicit_matrix
+
+        Returns the sub-diagonal, diagonal and super-diagonal of the tridiagonal matrix :math:`I - \theta dt L` acting on the interior points ``1`` to ``nx-1``. The dependence of the ghost point on the last interior point under Neumann control is folded into the last diagonal entry.
+        """
+        nx, dt = self.nx, self.dt
+        beta = np.asarray(self.beta, dtype=np.float64)
+        scale = self.max_control_value if self.normalize_action else 1
+        alpha = scale if self.control_type == "Neumann" else 0
+        F = dt / (self.dx**2)
+        diag = 1 + self.theta * (2 * F - dt * beta[1:nx])
+        diag[-1] -= self.theta * F * alpha
+        off = np.full(nx - 2, -self.theta * F)
+        return off, diag, off
+
+    def implicit_factorization(self):
+        """
+        implicit_factorization
+
+        Returns the Thomas factorization of :meth:`implicit_matrix` used by the solves of both backends.
+        """
+        return numba_kernels.tridiagonal_factor(*self.implicit_matrix())
+
+    def implicit_solver(self) -> Callable[[np.ndarray], np.ndarray]:
+        """
+        implicit_solver
+
+        Returns a function solving the system of :meth:`implicit_matrix` for a right hand side with vectorized NumPy, used by the ``"numpy"`` backend. The forward and back substitution of :meth:`implicit_factorization` are first order linear recurrences. Each runs as :math:`\lceil \log_2 (nx-1) \rceil` vectorized passes of a prefix scan whose coefficients are computed once with the factorization, so a solve is :math:`O(nx \log nx)` in a few array operations instead of a Python loop over the points.
+        """
+        lower, inv_pivot, upper_prime = self.implicit_factorization()
+        # y_i = p_i r_i - p_i l_{i-1} y_{i-1} forward and x_i = y_i - u'_i x_{i+1} backward, the latter as a forward recurrence on the reversed vector
+        forward = _recurrence_scan(np.concatenate(([0.0], -inv_pivot[1:] * lower)))
+        backward = _recurrence_scan(np.concatenate(([0.0], -upper_prime[::-1])))
+        sol = self._implicit_scratch[1]
+
+        def solve(rhs):
+            np.multiply(rhs, inv_pivot, out=sol)
+            _apply_scan(forward, sol)
+            _apply_scan(backward, sol[::-1])
+            return sol
+        return solve
+
+    def substep_operator(self):
+        """
+        substep_operator
+
+        Returns the affine map ``(S, g)`` of a single explicit substep such that the next row of the solution is ``S @ u + g * control``.
+        """
+        nx, dx, dt = self.nx, self.dx, self.dt
+        beta = np.asarray(self.beta, dtype=np.float64)
+        scale = self.max_control_value if self.normalize_action else 1
+        F = dt / (dx**2)
+        S = np.zeros((nx + 1, nx + 1))
+        g = np.zeros(nx + 1)
+        j = np.arange(1, nx)
+        S[j, j - 1] = F
+        S[j, j] = 1 - 2 * F + dt * beta[1:nx]
+        S[j, j + 1] = F
+        # u(0, t) = 0 leaves the first row empty. The control sets the ghost point nx
+        if self.control_type == "Neumann":
+            S[nx, nx - 1] = scale
+            g[nx] = scale * dx
+        else:
+            g[nx] = scale
+        return S, g
+
+    def control_period_propagator(self, n_substeps: int):
+        """
+        control_period_propagator
+
+        Returns the cached affine map ``(A, b)`` advancing the PDE by ``n_substeps`` substeps with a constant control, followed by the map ``(C, d)`` of the boundary values of the substeps, see :func:`compose_substeps`.
+
+        :param n_substeps: Number of substeps in the control period.
+        """
+        key = ("reaction-diffusion", np.asarray(self.beta).tobytes(), self.nx, self.dx, self.dt, self.control_sample_rate, self.control_type, self.normalize_action, self.max_control_value)
+        return control_period_propagator(key, self.substep_operator, n_substeps)
+
     def terminate(self):
         """
         terminate
@@ -205,12 +381,16 @@ class ReactionDiffusionPDE1D(PDEEnv1D):
             raise Exception(
                 "Please pass both an initial condition and a recirculation function in the parameters dictionary. See documentation for more details"
                 )
-        self.u = np.zeros(
-            (self.nt, self.nx+1), dtype=np.float32
-        )
-        self.u[0] = init_condition
+        self.u.reset(init_condition)
         self.time_index = 0
         self.beta = beta
+        if self.solver == "propagator":
+            self.propagator = self.control_period_propagator(int(round(self.control_sample_rate/self.dt)))
+        elif self.solver in ("crank-nicolson", "implicit"):
+            if self.backend == "numba":
+                self.factorization = self.implicit_factorization()
+            else:
+                self.implicit_solve = self.implicit_solver()
         return (
             self.sensing_update(
                 self.u[self.time_index],
@@ -0,0 +1,260 @@
+import numpy as np
+from typing import Optional, Union
+
+class StateHistory:
+    r"""
+    StateHistory
+
+    Stores the solution of an environment indexed by timestep. The storage policy bounds the memory of an environment:
+
+    * ``"full"`` keeps every timestep in a ``(nt, columns)`` array, which is the behavior of a plain solution array.
+    * ``"rolling"`` keeps the last ``window`` timesteps in a ring buffer of shape ``(window, columns)``. Older timesteps raise an ``IndexError``.
+    * ``"decimated"`` keeps every ``stride``-th timestep and the latest one. Other timesteps raise an ``IndexError``.
+    * ``"none"`` only keeps the latest timestep, which is a ``"rolling"`` history with a window of one timestep.
+
+    The buffers are allocated on the first ``reset`` and reused for later episodes. The history is read like the solution array, e.g. ``u[t]`` returns the state at timestep ``t`` and ``u[:, -1]`` returns the boundary value over all stored timesteps, so rewards indexing past timesteps keep working as long as the policy stores them. The ``"rolling"`` and ``"decimated"`` policies return copies since their buffers are overwritten during the episode. Since ``u[:, -1]`` only covers the stored timesteps, :meth:`boundary_sum` returns the sum of the absolute boundary value over every simulated timestep for all policies.
+
+    :param nt: Number of timesteps of an episode.
+    :param columns: Number of spatial points of a state, including ghost points, or the shape of a state.
+    :param policy: Storage policy. Either ``"full"``, ``"rolling"``, ``"decimated"`` or ``"none"``.
+    :param window: Number of timesteps kept by the ``"rolling"`` policy.
+    :param stride: Timesteps between two stored states for the ``"decimated"`` policy.
+    :param dtype: Data type of the stored states.
+    """
+    def __init__(self, nt: int, columns: Union[int, tuple], policy: str = "full", window: int = None, stride: int = 1, dtype=np.float32):
+        if policy not in ("full", "rolling", "decimated", "none"):
+            raise Exception(
+                "Invalid history parameter. Please use 'full', 'rolling', 'decimated', or 'none'. See documentation for details."
+            )
+        # Name of the policy as given for error messages
+        self.name = policy
+        if policy == "none":
+            policy, window = "rolling", 1
+        if policy == "rolling" and (window is None or window < 1):
+            raise Exception(
+                "The rolling history requires history_window to be a positive number of timesteps. See documentation for details."
+            )
+        self.nt = nt
+        self.columns = columns
+        self.state_shape = tuple(columns) if isinstance(columns, tuple) else (columns,)
+        self.policy = policy
+        self.window = window
+        self.stride = max(int(stride), 1)
+        self.dtype = dtype
+        self.data = None
+        self.latest = 0
+        # Holds the substeps of one period for the bounded policies
+        self.scratch = None
+        # Running sum of |u[t, -1]| for the bounded policies and the row returned by next_row which is not summed yet
+        self.boundary_total = 0.0
+        self._pending = None
+
+    @property
+    def shape(self):
+        return (self.nt,) + self.state_shape
+
+    def __len__(self):
+        return self.nt
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in (self.data, self.scratch) if buffer is not None)
+
+    def reset(self, state: np.ndarray):
+        """
+        reset
+
+        Starts a new episode with ``state`` at timestep ``0``. The buffers are only allocated on the first call. Afterwards only the rows written in the previous episode are cleared.
+
+        :param state: The initial condition.
+        """
+        if self.data is None:
+            match self.policy:
+                case "full":
+                    rows = self.nt
+                case "rolling":
+                    rows = self.window
+                case "decimated":
+                    # Stored timesteps followed by the latest timestep
+                    rows = (self.nt - 1) // self.stride + 2
+            self.data = np.zeros((rows,) + self.state_shape, dtype=self.dtype)
+        elif self.policy == "full":
+            self.data[1 : self.latest + 1] = 0
+        else:
+            self.data.fill(0)
+        self.data[0] = state
+        if self.policy == "decimated":
+            self.data[-1] = state
+        self.latest = 0
+        self.boundary_total = float(np.abs(self.data[0][-1]).sum())
+        self._pending = None
+
+    def period(self, t0: int, n: int) -> np.ndarray:
+        """
+        period
+
+        Returns a ``(n+1, columns)`` array for simulating timesteps ``t0+1`` to ``t0+n``. The first row holds the state at ``t0`` and the other rows are zero. The array must be passed to :meth:`commit` once the rows are filled.
+
+        :param t0: The latest timestep of the history.
+        :param n: The number of timesteps to simulate.
+        """
+        if self.policy == "full":
+            return self.data[t0 : t0 + n + 1]
+        if self.scratch is None or self.scratch.shape[0] < n + 1:
+            self.scratch = np.zeros((n + 1,) + self.state_shape, dtype=self.dtype)
+        work = self.scratch[: n + 1]
+        work[0] = self[t0]
+        work[1:] = 0
+        return work
+
+    def stores_between(self, t0: int, n: int) -> bool:
+        """
+        stores_between
+
+        Returns whether the history stores any of the timesteps ``t0+1`` to ``t0+n-1`` inside a period, i.e. whether a solver has to compute the substeps of the period or only its last timestep.
+
+        :param t0: The latest timestep of the history.
+        :param n: The number of timesteps of the period.
+        """
+        match self.policy:
+            case "full":
+                return n > 1
+            case "rolling":
+                return n > 1 and self.window > 1
+            case "decimated":
+                return (t0 // self.stride + 1) * self.stride < t0 + n
+
+    def commit(self, t0: int, n: int, boundary: Optional[np.ndarray] = None):
+        """
+        commit
+
+        Records the timesteps ``t0+1`` to ``t0+n`` simulated in the array returned by :meth:`period`.
+
+        :param t0: The timestep passed to :meth:`period`.
+        :param n: The number of simulated timesteps.
+        :param boundary: The boundary values of the timesteps ``t0+1`` to ``t0+n`` for a period whose rows in between were not simulated, see :meth:`stores_between`. Defaults to the last column of the simulated rows.
+        """
+        if n <= 0:
+            return
+        work = self.scratch
+        if self.policy != "full":
+            self._sum_pending()
+            self.boundary_total += float(np.abs(work[1 : n + 1, -1] if boundary is None else boundary).sum())
+        match self.policy:
+            case "rolling":
+                t = np.arange(max(t0 + 1, t0 + n + 1 - self.window), t0 + n + 1)
+                self.data[t % self.window] = work[t - t0]
+            case "decimated":
+                t = np.arange((t0 // self.stride + 1) * self.stride, t0 + n + 1, self.stride)
+                self.data[t // self.stride] = work[t - t0]
+                self.data[-1] = work[n]
+        self.latest = t0 + n
+
+    def next_row(self) -> np.ndarray:
+        """
+        next_row
+
+        Advances the history by one timestep and returns the array the new state is written to. This records a single timestep without the copies of :meth:`period` and :meth:`commit`.
+        """
+        t = self.latest + 1
+        self.latest = t
+        match self.policy:
+            case "full":
+                return self.data[t]
+            case "rolling":
+                row = self.data[t % self.window]
+            case "decimated":
+                row = self.data[t // self.stride] if t % self.stride == 0 else self.data[-1]
+        # The row is written after it is returned, so its boundary value is summed on the next call
+        self._sum_pending()
+        self._pending = row
+        return row
+
+    def _sum_pending(self):
+        if self._pending is not None:
+            self.boundary_total += float(np.abs(self._pending[-1]).sum())
+            self._pending = None
+
+    def boundary_sum(self) -> float:
+        """
+        boundary_sum
+
+        Returns the sum of the absolute boundary value ``|u[t, -1]|`` over the timesteps ``0`` to ``latest``, which is ``np.sum(abs(u[:, -1]))`` of the full solution. The bounded policies keep it as a running sum updated in :meth:`commit` and :meth:`next_row`, so it does not depend on the stored timesteps.
+        """
+        if self.policy == "full":
+            return np.sum(abs(self.data[:, -1]))
+        self._sum_pending()
+        return self.boundary_total
+
+    def _row(self, t: int) -> np.ndarray:
+        if t < 0:
+            t += self.nt
+        if self.policy == "full":
+            return self.data[t]
+        if t > self.latest or t < 0:
+            raise IndexError(f"Timestep {t} has not been simulated yet.")
+        if self.policy == "rolling":
+            if t <= self.latest - self.window:
+                raise IndexError(
+                    f"Timestep {t} is outside of the rolling history of the last {self.window} timesteps."
+                )
+            return self.data[t % self.window].copy()
+        if t == self.latest and t % self.stride:
+            return self.data[-1].copy()
+        if t % self.stride:
+            raise IndexError(
+                f"Timestep {t} is not stored by the decimated history of every {self.stride}-th timestep."
+            )
+        return self.data[t // self.stride].copy()
+
+    def check_lookback(self, lookback: Optional[int], period: int):
+        """
+        check_lookback
+
+        Raises an exception if the history cannot serve a reader which is called every ``period`` timesteps and at the last timestep of the episode and reads the ``lookback`` timesteps before the latest one. A ``lookback`` of ``None`` reads every timestep of the episode, which only the ``"full"`` policy stores.
+
+        :param lookback: The number of timesteps read before the latest one or ``None``.
+        :param period: The number of timesteps between two reads.
+        """
+        match self.policy:
+            case "full":
+                return
+            case "rolling":
+                if lookback is not None and lookback < self.window:
+                    return
+            case "decimated":
+                if lookback == 0 or (lookback is not None and lookback % self.stride == 0 and period % self.stride == 0 and (self.nt - 1) % self.stride == 0):
+                    return
+        raise Exception(
+            f"Invalid history parameter. The reward reads {'every timestep' if lookback is None else f'up to {lookback} timesteps before the current one'}, which history='{self.name}' does not store. Please use history='full' or a larger history_window. See documentation for details."
+        )
+
+    def stored(self) -> np.ndarray:
+        """
+        stored
+
+        Returns the stored states in chronological order. For the ``"full"`` policy this is the whole solution array.
+        """
+        match self.policy:
+            case "full":
+                return self.data
+            case "rolling":
+                t = np.arange(max(0, self.latest - self.window + 1), self.latest + 1)
+                return self.data[t % self.window]
+            case "decimated":
+                rows = self.data[: self.latest // self.stride + 1]
+                if self.latest % self.stride:
+                    rows = np.concatenate((rows, self.data[-1:]))
+                return rows
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            rows, rest = index[0], index[1:]
+        else:
+            rows, rest = index, ()
+        if isinstance(rows, (int, np.integer)):
+            return self._row(int(rows))[rest] if rest else self._row(int(rows))
+        return self.stored()[(rows,) + rest]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.stored(), dtype=dtype)
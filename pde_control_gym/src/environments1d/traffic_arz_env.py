@@ -1,8 +1,12 @@
+import functools
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
-from typing import Callable, Optional
+from typing import Callable, Optional, Tuple
 from pde_control_gym.src.environments1d.base_env_1d import PDEEnv1D
+from pde_control_gym.src.environments1d import numba_kernels
+from pde_control_gym.src.rewards import TrafficARZReward
+from pde_control_gym.src.environments1d.traffic_arz_solver import ARZWorkspace, MUSCLWorkspace, lax_wendroff_step, active_lax_wendroff_substeps, ctm_step, muscl_step, split_relaxation_step, adaptive_substeps
 import random
 
 class TrafficPDE1D(PDEEnv1D):
@@ -11,7 +15,7 @@ class TrafficPDE1D(PDEEnv1D):
 
     This class implements the Traffic ARZ PDE and inherits from the class :class:`PDEEnv1D`. Thus, for a full list of of arguments, first see the class :class:`PDEEnv1D` in conjunction with the arguments presented here
 
-    :param simulation_type: Defines the type of boundary control. Inputs 'inlet', 'outlet' and 'both' represents boundary control at inlet, outlet and both respectively. 
+    :param simulation_type: Defines the type of boundary control. Inputs 'inlet', 'outlet' and 'both' represents boundary control at inlet, outlet and both respectively. 'inlet-train' and 'outlet-train' control the same boundary as 'inlet' and 'outlet', 'outlet-train' with a steady state resampled at every reset. 'inlet-train' controls the inlet with the outlet held at the steady flux, which earlier versions did not simulate. 
     :param v_max: Maximum permissible velocity (meters/second) on freeway under simulation 
     :param ro_max: Maximum permissible density (vehicles/meter) on freeway under simulation
     :param v_steady: Desired steady state velocity (meters/second). Ensure that v_steady and ro_steady obey the equilibrium equation v_steady = v_max(1 - ro_steady/v_max)
@@ -19,6 +23,12 @@ class TrafficPDE1D(PDEEnv1D):
     :param tau: Relaxation time (seconds) required by the driver to adjust to the new velocity
     :param limit_pde_state_size: This is a boolean which will terminate the episode early if the observation velocity or density is greater than v_max and ro_max respectively
     :param control_freq: Number of PDE simulation steps performed using same action per environment step() call
+    :param cfl: Enables adaptive substeps when given. A ``step`` then advances one control period of ``control_freq * dt`` seconds with substeps of the largest timestep whose CFL number, based on the maximum characteristic speed :math:`\max(|v|, |v + \rho V'(\rho)|)` of the current state, is ``cfl``. The number of substeps and the effective timestep of a step are reported in its ``info`` as ``"substeps"`` and ``"dt_effective"``.
+    :param scheme: The finite volume scheme of a PDE timestep. ``"lax-wendroff"`` is the second order Richtmyer/Lax-Wendroff scheme, which oscillates near shocks. ``"muscl"`` reconstructs the cell interfaces with minmod limited slopes, uses HLL fluxes and a two stage Runge-Kutta method, and resolves shocks without oscillations at three to four times the cost per timestep with numpy, so coarser grids reach the same accuracy. ``"ctm"`` is the first order Godunov scheme of the cell transmission model, with the inlet flux as demand, the outlet flux as supply and the supply and demand of the cells on the Greenshields diagram. It never oscillates, which suits pretraining on a coarse model before fine-tuning with ``"lax-wendroff"``. A timestep is only slightly cheaper than a Lax-Wendroff timestep, by about 20% with numpy and 5% to 15% with numba. The numba backend compiles ``"lax-wendroff"`` and ``"ctm"`` and runs ``"muscl"`` with numpy.
+    :param copy_observation: Whether ``step`` and ``reset`` return a copy of the observation. The observation is written into a single preallocated ``(2M,)`` buffer without temporaries. With ``False`` the buffer itself is returned, which avoids the copy but is overwritten by the next call.
+    :param relaxation: The treatment of the relaxation source :math:`-y/\tau`. ``"explicit"`` evaluates it inside the scheme, which is only stable for timesteps up to the order of ``tau``, so adaptive substeps are limited by ``tau`` as well. ``"exponential"`` splits it from the transport and integrates it exactly with :func:`split_relaxation_step`, so the timestep only depends on the characteristic speeds even for small ``tau``.
+    :param active_tiles: Enables active-region tracking for long corridors whose road is mostly at the steady state. The cells are grouped into tiles of ``active_tiles`` cells and every control period only updates the tiles with a cell that deviates from the steady state, the tiles within ``control_freq`` cells of them, which a wave can reach during the period, and the tiles at the inlet and outlet. The other tiles are skipped and are reactivated once a wave approaches them, so the cost of a PDE timestep grows with the size of the disturbances instead of the length of the corridor. The number of updated cells of a step is reported in its ``info`` as ``"active_cells"``. Requires the ``"lax-wendroff"`` scheme with ``"explicit"`` relaxation and a fixed timestep. :meth:`branch` always updates every cell.
+    :param active_tolerance: The relative deviation of :math:`\rho` from ``rs`` and of :math:`y` from zero, relative to ``qs``, above which a cell is active. With ``0`` the result is identical to updating every cell, while a small positive tolerance lets the tiles behind a passing wave become quiescent again.
     """
     def __init__(self, 
                  simulation_type: str = 'inlet', 
@@ -29,6 +39,12 @@ class TrafficPDE1D(PDEEnv1D):
                  tau: float = 60,
                  limit_pde_state_size: bool = False,
                  control_freq: int = 1,
+                 cfl: Optional[float] = None,
+                 scheme: str = "lax-wendroff",
+                 relaxation: str = "explicit",
+                 copy_observation: bool = True,
+                 active_tiles: Optional[int] = None,
+                 active_tolerance: float = 1e-6,
                  **kwargs):
         super().__init__(**kwargs)
         
@@ -41,6 +57,21 @@ class TrafficPDE1D(PDEEnv1D):
 
         assert(isinstance(control_freq, int) and control_freq >= 1) , f"control_freq must be a positive integer (got {control_freq} of type {type(control_freq).__name__})"
         self.control_freq = control_freq
+        if cfl is not None and not cfl > 0:
+            raise ValueError('Invalid cfl. Please use a positive CFL number or None for the fixed timestep.')
+        self.cfl = cfl
+        if scheme not in ("lax-wendroff", "ctm", "muscl"):
+            raise ValueError('Invalid scheme. Please use "lax-wendroff", "ctm" or "muscl".')
+        self.scheme = scheme
+        if relaxation not in ("explicit", "exponential"):
+            raise ValueError('Invalid relaxation. Please use "explicit" or "exponential".')
+        self.relaxation = relaxation
+        if active_tiles is not None and not (isinstance(active_tiles, int) and active_tiles >= 1):
+            raise ValueError('Invalid active_tiles. Please use a positive number of cells per tile or None to update every cell.')
+        if active_tiles is not None and (scheme != "lax-wendroff" or relaxation != "explicit" or cfl is not None):
+            raise ValueError('Invalid active_tiles. Active tiles require the "lax-wendroff" scheme with "explicit" relaxation and a fixed timestep.')
+        self.active_tiles = active_tiles
+        self.active_tolerance = active_tolerance
         
         if self.simulation_type == 'outlet':
             print('Case 1: Outlet Boundary Control')
@@ -76,17 +107,44 @@ class TrafficPDE1D(PDEEnv1D):
         self.M = len(x)
         self.qs = self.qs
         self.qs_input = np.linspace(self.qs/2, 2*self.qs,40)
-        self.r = np.zeros([self.M,1])
-        self.y = np.zeros([self.M,1])
+        # Density, auxiliary variable and velocity are contiguous (M,) arrays updated in place
+        self.r = np.zeros(self.M)
+        self.y = np.zeros(self.M)
+        self.v = np.zeros(self.M)
+        self._veq = np.zeros(self.M)
+        # Observation buffer, the density and velocity parts are written through views
+        self.copy_observation = copy_observation
+        self._obs = np.zeros(2 * self.M)
+        self._obs_r, self._obs_v = self._obs[:self.M], self._obs[self.M:]
 
         #Initial condition of the PDE
-        self.r = self.rs * np.transpose(np.sin(3 * x / self.L * np.pi ) * 0.1 + np.ones([1,self.M]))
-        self.y = self.qs * np.ones([self.M,1]) - self.vm * self.r + self.vm / self.rm * (self.r)**(2)
-        self.v = self.y/self.r + TrafficPDE1D.Veq(self.vm, self.rm, self.r)
+        self._initial_condition(x)
         
         self.info = dict()
         self.info['V'] = self.v
 
+        # Scratch buffers reused by every PDE timestep
+        if self.scheme == "muscl":
+            self.workspace, self.scheme_step = MUSCLWorkspace((self.M,)), muscl_step
+        else:
+            self.workspace, self.scheme_step = ARZWorkspace((self.M,)), ctm_step if self.scheme == "ctm" else lax_wendroff_step
+        if self.relaxation == "exponential":
+            self.scheme_step = functools.partial(split_relaxation_step, step=self.scheme_step)
+        # Midpoint buffers of the workspace passed as scratch to the compiled kernels
+        if self.scheme != "muscl":
+            self._midpoints = (self.workspace.r_half, self.workspace.y_half, self.workspace.flux_r_half, self.workspace.flux_y_half)
+        # Scratch buffers of the batched candidates of branch, created on first use
+        self._branch_workspace = None
+        if self.active_tiles is not None:
+            # Deviation of every cell from the steady state and the first cell of every tile
+            self._deviation = np.zeros(self.M)
+            self._tile_starts = np.arange(0, self.M, self.active_tiles)
+            # Holds the packed active cells, which include two neighbors per run of active tiles
+            self._active_workspace = ARZWorkspace((self.M + 2 * len(self._tile_starts),))
+            # Tile flags and run bounds used as scratch by the compiled kernel
+            n_tiles = len(self._tile_starts)
+            self._tile_scratch = (np.zeros(n_tiles, dtype=np.bool_), np.zeros(n_tiles, dtype=np.bool_), np.zeros(n_tiles, dtype=np.int64), np.zeros(n_tiles, dtype=np.int64))
+
         #Observation space
         if self.simulation_type == 'outlet-train':
             self.observation_space  = spaces.Box(low=-10, high=10, shape=(2 * self.M,), dtype=np.float64)
@@ -142,97 +200,287 @@ class TrafficPDE1D(PDEEnv1D):
             - truncated (bool): Whether the simulation was truncated as desired state has been achieved.
             - info (dict): Additional information about the current state for debugging.
         """
-        Nx = self.nx
-        dx = self.dx
-        dt = self.dt
-        self.time_index += dt
-        qs_input = action
+        self._advance_period(action)
+        reward = self.reward_class.reward(self.vs, self.rs, self.v, self.r)
         
-        if self.simulation_type == 'both':
-            qs_input = np.clip(qs_input, a_min=self.action_space.low, a_max=self.action_space.high)
-            q_inlet_input = qs_input[0]
-            q_outlet_input = qs_input[1]
-
+        if self.simulation_type == 'outlet-train':
+            return self._observation(normalized=True), reward, self.terminate(), self.truncate(), self.info
         else:
-            qs_input = np.clip(qs_input, a_min=self.action_space.low, a_max=self.action_space.high)[0]
+            return self._observation(), reward, (self.terminate() or reward > -0.00023), self.truncate(), self.info
 
-        #PDE control at inlet
-        if self.simulation_type == 'outlet' or self.simulation_type == 'outlet-train':
-			# Fixed inlet boundary input
-            self.q_inlet = self.qs
+    def step_many(self, actions: np.ndarray, state_stride: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, bool, bool, Optional[np.ndarray]]:
+        """
+        step_many
 
-        elif self.simulation_type == 'inlet':
-			# Control inlet boundary 
-            self.q_inlet = qs_input
+        Applies a sequence of actions open loop, one per control period, without building the observation and info of every period. The state, rewards and termination follow calling ``step`` with every action, and the loop ends after the period on which ``step`` would end the episode. With ``backend="numba"``, a ``"lax-wendroff"`` or ``"ctm"`` scheme without ``active_tiles`` and the :class:`TrafficARZReward` reward, all periods run in a single compiled function, so the Python overhead per control period vanishes. The rewards then match ``step`` up to rounding. Otherwise the periods run in a Python loop over the solver of ``step``.
 
-        elif self.simulation_type == 'both':
-            # Control inlet boundary 
-            self.q_inlet = q_inlet_input
-        
-        count = 0
-        while count < self.control_freq and self.time_index < self.T:
-            # Boundary conditions
-            self.r[0] = self.r[1]
-            self.y[0] = self.q_inlet - self.r[0] * TrafficPDE1D.Veq(self.vm, self.rm, self.r[0])
-            self.r[self.M-1] = self.r[self.M-2]
-
-            # PDE control at outlet
-            if self.simulation_type == 'outlet' or self.simulation_type == 'outlet-train':
-                # Control outlet boundary 
-                self.y[self.M-1] = qs_input - self.r[self.M-1]* TrafficPDE1D.Veq(self.vm, self.rm, self.r[self.M-1])
-            
-            elif self.simulation_type == 'inlet':
-                # Fixed outlet boundary 
-                self.y[self.M-1] = self.qs - self.r[self.M-1]* TrafficPDE1D.Veq(self.vm, self.rm, self.r[self.M-1])
-            
-            elif self.simulation_type == 'both':
-                # Control outlet boundary 
-                self.y[self.M-1] = q_outlet_input - self.r[self.M-1]* TrafficPDE1D.Veq(self.vm, self.rm, self.r[self.M-1])
-                
-            #Vectorized finite differencing of PDE
-            r_jm1 = self.r[0:self.M-2]
-            r_j   = self.r[1:self.M-1]
-            r_jp1 = self.r[2:self.M]
-            
-            y_jm1 = self.y[0:self.M-2]
-            y_j   = self.y[1:self.M-1]
-            y_jp1 = self.y[2:self.M]
-            
-            # Compute midpoint values
-            r_pmid = 0.5 * (r_jp1 + r_j) - (dt / (2 * dx)) * (TrafficPDE1D.F_r(self.vm, self.rm, r_jp1, y_jp1) - TrafficPDE1D.F_r(self.vm, self.rm, r_j, y_j))
-            r_mmid = 0.5 * (r_jm1 + r_j) - (dt / (2 * dx)) * (TrafficPDE1D.F_r(self.vm, self.rm, r_j, y_j) - TrafficPDE1D.F_r(self.vm, self.rm, r_jm1, y_jm1))
-            
-            y_pmid = (
-                0.5 * (y_jp1 + y_j)
-                - (dt / (2 * dx)) * (TrafficPDE1D.F_y(self.vm, self.rm, r_jp1, y_jp1) - TrafficPDE1D.F_y(self.vm, self.rm, r_j, y_j))
-                - 0.25 * dt / self.tau * (y_jp1 + y_j)
-            )
-            
-            y_mmid = (
-                0.5 * (y_jm1 + y_j)
-                - (dt / (2 * dx)) * (TrafficPDE1D.F_y(self.vm, self.rm, r_j, y_j) - TrafficPDE1D.F_y(self.vm, self.rm, r_jm1, y_jm1))
-                - 0.25 * dt / self.tau * (y_jm1 + y_j)
-            )
-            
-            # Update values in the inner domain
-            self.r[1:self.M-1] -= (dt / dx) * (TrafficPDE1D.F_r(self.vm, self.rm, r_pmid, y_pmid) - TrafficPDE1D.F_r(self.vm, self.rm, r_mmid, y_mmid))
-            self.y[1:self.M-1] -= (
-                (dt / dx) * (TrafficPDE1D.F_y(self.vm, self.rm, r_pmid, y_pmid) - TrafficPDE1D.F_y(self.vm, self.rm, r_mmid, y_mmid))
-                + 0.5 * dt / self.tau * (y_pmid + y_mmid)
+        :param actions: The actions of shape ``(K,)``, or ``(K, 2)`` for ``simulation_type='both'``.
+        :param state_stride: Stores the density and velocity after every ``state_stride`` periods when given.
+        :return: A tuple of:
+            - rewards (np.ndarray): The rewards of the periods run, of shape ``(n,)`` with ``n <= K``.
+            - observation (np.ndarray): The observation after the last period, as returned by ``step``.
+            - done (bool): Whether the simulation should terminate.
+            - truncated (bool): Whether the simulation was truncated.
+            - states (np.ndarray): The concatenated density and velocity after periods ``state_stride``, ``2 * state_stride``, ..., of shape ``(n // state_stride, 2M)``, or ``None`` without ``state_stride``.
+        """
+        actions = np.asarray(actions, dtype=np.float64).reshape(-1, self.action_space.shape[0])
+        K = actions.shape[0]
+        stride = state_stride or 0
+        if stride < 0:
+            raise ValueError('Invalid state_stride. Please use a positive number of periods or None.')
+        rewards = np.empty(K)
+        states = np.empty((K // stride if stride else 0, 2 * self.M))
+        outlet_train = self.simulation_type == 'outlet-train'
+        terminate = truncate = False
+        compiled = self.backend == "numba" and self.scheme != "muscl"
+        if compiled and self.active_tiles is None and type(self.reward_class) is TrafficARZReward:
+            # Whole sequence of control periods runs as a single compiled function
+            q_inlet, q_outlet = self._boundary_fluxes(actions, self.qs)
+            q_inlet, q_outlet = np.full(K, q_inlet), np.full(K, q_outlet)
+            n, self.time_index, terminate, truncate = numba_kernels.arz_open_loop(
+                self.r, self.y, self.v, q_inlet, q_outlet, float(self.time_index), self.T, self.dt, self.control_freq,
+                self.cfl or 0.0, self.dx, self.vm, self.rm, self.tau, self.scheme == "ctm", self.relaxation == "exponential",
+                self.vs, self.rs, np.inf if outlet_train else -0.00023, self.limit_pde_state_size, rewards, states, stride, *self._midpoints,
             )
+            if n:
+                self.q_inlet = q_inlet[n - 1]
+        else:
+            n = 0
+            while n < K:
+                self._advance_period(actions[n])
+                rewards[n] = self.reward_class.reward(self.vs, self.rs, self.v, self.r)
+                n += 1
+                if stride and n % stride == 0:
+                    states[n // stride - 1, :self.M] = self.r
+                    states[n // stride - 1, self.M:] = self.v
+                if outlet_train:
+                    terminate = self.terminate()
+                else:
+                    terminate = self.terminate() or rewards[n - 1] > -0.00023
+                truncate = self.truncate()
+                if terminate or truncate:
+                    break
+        return rewards[:n], self._observation(normalized=outlet_train), terminate, truncate, states[:n // stride] if stride else None
+
+    def get_state(self) -> dict:
+        """
+        get_state
 
-            count += 1
+        Returns a snapshot of the freeway that :meth:`set_state` and :meth:`branch` accept. It holds copies of the density ``r`` and the auxiliary variable ``y`` together with the time index and the steady state targets ``rs``, ``vs`` and ``qs``, which are resampled by every reset of ``'outlet-train'``. The reward object, the spaces and ``info`` are not part of the snapshot.
+        """
+        return {"r": self.r.copy(), "y": self.y.copy(), "time_index": self.time_index, "rs": self.rs, "vs": self.vs, "qs": self.qs}
 
-        # Calculate Velocity
-        self.v = self.y/(self.r) + TrafficPDE1D.Veq(self.vm, self.rm, self.r)
-        reward = self.reward_class.reward(self.vs, self.rs, self.v, self.r)
-        
-        if self.simulation_type == 'outlet-train':
-            return np.reshape(np.concatenate(((self.r-self.rs)/self.rs, (self.v-self.vs)/self.vs)), -1), reward, self.terminate(), self.truncate(), self.info
+    def set_state(self, state: dict):
+        """
+        set_state
+
+        Restores a snapshot returned by :meth:`get_state`. The state arrays are overwritten in place and the velocity is recomputed, so the snapshot can be restored any number of times.
+
+        :param state: The snapshot.
+        """
+        np.copyto(self.r, state["r"])
+        np.copyto(self.y, state["y"])
+        self.time_index = state["time_index"]
+        self.rs, self.vs, self.qs = state["rs"], state["vs"], state["qs"]
+        self._velocity()
+
+    def branch(self, state: dict, action_batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        branch
+
+        Simulates ``B`` candidate action sequences from the snapshot ``state`` of :meth:`get_state`. The freeways of all candidates are held as ``(B, M)`` arrays and every timestep of the chosen scheme advances all of them in one vectorized pass, as in :class:`TrafficPDE1DVector`. The environment itself is not modified. Every candidate follows the rewards and termination of ``step`` and stops receiving rewards after the period on which ``step`` would end its episode. With ``cfl`` all candidates share the substeps of the fastest characteristic speed among them, so their rewards differ from ``step`` up to the accuracy of the scheme. Otherwise they match ``step`` up to rounding.
+
+        :param state: The snapshot the candidates start from.
+        :param action_batch: The actions of shape ``(B, K)``, or ``(B, K, 2)`` for ``simulation_type='both'``.
+        :return: A tuple of the rewards of shape ``(B, K)``, which are zero after the end of an episode, and the number of periods run by every candidate of shape ``(B,)``.
+        """
+        n_actions = self.action_space.shape[0]
+        action_batch = np.asarray(action_batch, dtype=np.float64)
+        B, K = action_batch.shape[:2]
+        action_batch = action_batch.reshape(B, K, n_actions)
+        rs, vs, qs = state["rs"], state["vs"], state["qs"]
+        r = np.repeat(np.asarray(state["r"], dtype=np.float64)[None], B, axis=0)
+        y = np.repeat(np.asarray(state["y"], dtype=np.float64)[None], B, axis=0)
+        v, veq = np.empty_like(r), np.empty_like(r)
+        # Scratch buffers of the batch are kept for the next call with the same number of candidates
+        if self._branch_workspace is None or self._branch_workspace.shape != r.shape:
+            self._branch_workspace = type(self.workspace)(r.shape)
+        ws = self._branch_workspace
+        time_index = state["time_index"]
+        rewards = np.zeros((B, K))
+        lengths = np.full(B, K)
+        running = np.ones(B, dtype=np.bool_)
+        for k in range(K):
+            time_index += self.dt
+            q_inlet, q_outlet = self._boundary_fluxes(action_batch[:, k], qs)
+            if time_index < self.T:
+                if self.cfl is not None:
+                    adaptive_substeps(r, y, q_inlet, q_outlet, self.control_freq * self.dt, self.cfl, self.dx, self.vm, self.rm, self.tau, ws, self.scheme_step, np.inf if self.relaxation == "exponential" else self.tau)
+                else:
+                    for _ in range(self.control_freq):
+                        self.scheme_step(r, y, q_inlet, q_outlet, self.dt, self.dx, self.vm, self.rm, self.tau, ws)
+            # v = y/r + Veq(r) evaluated in place
+            np.divide(r, self.rm, out=veq)
+            np.subtract(1, veq, out=veq)
+            np.multiply(self.vm, veq, out=veq)
+            np.divide(y, r, out=v)
+            np.add(v, veq, out=v)
+            for i in np.flatnonzero(running):
+                rewards[i, k] = self.reward_class.reward(vs, rs, v[i], r[i])
+            terminated = np.full(B, time_index >= self.T / self.dt)
+            if self.simulation_type != 'outlet-train':
+                terminated |= rewards[:, k] > -0.00023
+            truncated = np.all(r - rs == 0, axis=1) & np.all(v - vs == 0, axis=1)
+            if self.limit_pde_state_size:
+                truncated |= np.any(v > self.vm, axis=1) | np.any(r > self.rm, axis=1)
+            ended = running & (terminated | truncated)
+            lengths[ended] = k + 1
+            running &= ~ended
+            if not np.any(running):
+                break
+        return rewards, lengths
+
+    def _boundary_fluxes(self, action, qs):
+        # Inlet and outlet fluxes of an action, or of a (K, n_actions) array of actions, clipped to the action space. The fixed boundary has the steady flux qs
+        action = np.clip(action, a_min=self.action_space.low, a_max=self.action_space.high)
+        match self.simulation_type:
+            case 'outlet' | 'outlet-train':
+                # Fixed inlet boundary input, control outlet boundary
+                return qs, action[..., 0]
+            case 'inlet' | 'inlet-train':
+                # Control inlet boundary, fixed outlet boundary
+                return action[..., 0], qs
+            case _:
+                # Control inlet and outlet boundary
+                return action[..., 0], action[..., 1]
+
+    def _advance_period(self, action):
+        # Applies the boundary fluxes of the action for one control period and updates the velocity
+        dx = self.dx
+        dt = self.dt
+        self.time_index += dt
+        self.q_inlet, q_outlet = self._boundary_fluxes(action, self.qs)
+
+        r, y = self.r, self.y
+        count = 0
+        compiled = self.backend == "numba" and self.scheme != "muscl"
+        split = self.relaxation == "exponential"
+        if self.cfl is not None:
+            # One control period with CFL limited substeps
+            period = self.control_freq * dt
+            if self.time_index < self.T:
+                if compiled:
+                    count = numba_kernels.arz_adaptive_substeps(r, y, period, self.cfl, float(np.squeeze(self.q_inlet)), float(np.squeeze(q_outlet)), dx, self.vm, self.rm, self.tau, self.scheme == "ctm", split, *self._midpoints)
+                else:
+                    count = adaptive_substeps(r, y, self.q_inlet, q_outlet, period, self.cfl, dx, self.vm, self.rm, self.tau, self.workspace, self.scheme_step, np.inf if split else self.tau)
+            self.info["dt_effective"] = period / count if count else 0.0
         else:
-            return np.reshape(np.concatenate((self.r, self.v)), -1), reward, (self.terminate() or reward > -0.00023), self.truncate(), self.info
+            if self.active_tiles is not None and self.time_index < self.T:
+                # Only the tiles a wave can reach during this control period are updated
+                if compiled:
+                    active_cells = numba_kernels.arz_active_substeps(r, y, self.control_freq, float(np.squeeze(self.q_inlet)), float(np.squeeze(q_outlet)), dt, dx, self.vm, self.rm, self.tau, self.rs, self.qs, self.active_tiles, self.active_tolerance, *self._tile_scratch, *self._midpoints)
+                else:
+                    starts, stops = self._active_segments()
+                    active_lax_wendroff_substeps(r, y, self.q_inlet, q_outlet, self.control_freq, dt, dx, self.vm, self.rm, self.tau, starts, stops, self._active_workspace)
+                    active_cells = int(np.sum(stops - starts))
+                count = self.control_freq
+                self.info["active_cells"] = active_cells
+            elif compiled and self.time_index < self.T:
+                # Whole substep loop runs as a single compiled function
+                numba_kernels.arz_substeps(r, y, self.control_freq, float(np.squeeze(self.q_inlet)), float(np.squeeze(q_outlet)), dt, dx, self.vm, self.rm, self.tau, self.scheme == "ctm", split, *self._midpoints)
+                count = self.control_freq
+            while count < self.control_freq and self.time_index < self.T:
+                self.scheme_step(r, y, self.q_inlet, q_outlet, dt, dx, self.vm, self.rm, self.tau, self.workspace)
+                count += 1
+            self.info["dt_effective"] = dt if count else 0.0
+        self.info["substeps"] = count
 
-    
+        # Calculate Velocity
+        self._velocity()
+
+    def _active_segments(self):
+        """
+        _active_segments
+
+        Returns the first and one past the last cell of every run of active tiles. A tile is active if a cell deviates from the steady state by more than ``active_tolerance`` relative to ``rs`` and ``qs``, or if it lies within the halo of ``control_freq`` cells, the distance a wave travels during one control period, of such a tile. The tiles at the inlet and outlet are always active. All other cells stay at the steady state, up to ``active_tolerance``, for the whole control period, so skipping them leaves the Lax-Wendroff update of the active cells unchanged.
+        """
+        # The velocity buffer is free as scratch until the velocity is updated after the substeps
+        deviation, tmp = self._deviation, self._veq
+        np.subtract(self.r, self.rs, out=deviation)
+        np.abs(deviation, out=deviation)
+        np.divide(deviation, self.rs, out=deviation)
+        np.abs(self.y, out=tmp)
+        np.divide(tmp, self.qs, out=tmp)
+        np.maximum(deviation, tmp, out=deviation)
+        tiles = np.maximum.reduceat(deviation, self._tile_starts) > self.active_tolerance
+        tiles[0] = tiles[-1] = True
+        # Dilate the deviating tiles by the halo
+        halo = -(-self.control_freq // self.active_tiles)
+        active = tiles.copy()
+        for shift in range(1, halo + 1):
+            active[shift:] |= tiles[:-shift]
+            active[:-shift] |= tiles[shift:]
+        edges = np.flatnonzero(np.diff(active, prepend=False, append=False))
+        starts = edges[0::2] * self.active_tiles
+        stops = np.minimum(edges[1::2] * self.active_tiles, self.M)
+        return starts, stops
+
+    def rollout_linear_feedback(self, K: np.ndarray, n_steps: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        r"""
+        rollout_linear_feedback
+
+        Runs the closed loop with the linear feedback ``action = qs + K @ deviation`` from the current state for ``n_steps`` control periods, or until the episode ends, without going through ``step``. The ``deviation`` holds the relative deviations :math:`(\rho - \rho_s)/\rho_s` and :math:`(v - v_s)/v_s` of every cell, i.e. the observation of ``'outlet-train'``. Rewards, termination and the state follow ``step``, so the rollout matches calling ``step`` with the same actions. With ``backend="numba"``, a ``"lax-wendroff"`` or ``"ctm"`` scheme without ``active_tiles`` and the :class:`TrafficARZReward` reward, the feedback, the solver and the reward of all periods run in a single compiled function as in :meth:`step_many`, and the actions and rewards match ``step`` up to rounding. Otherwise the periods run in a Python loop over the solver of ``step``. The output buffers grow with the number of periods run, so the default ``n_steps`` does not allocate the whole episode upfront.
+
+        :param K: Gain of shape ``(n_actions, 2M)``, or ``(2M,)`` for a single action.
+        :param n_steps: Number of control periods. Defaults to the periods remaining until ``terminate``.
+        :return: A tuple of the observations of shape ``(n + 1, 2M)`` starting with the current observation in the convention of ``step``, the actions of shape ``(n, n_actions)`` and the rewards of shape ``(n,)``, where ``n`` is the number of periods run.
+        """
+        K = np.asarray(K, dtype=np.float64).reshape(-1, 2 * self.M)
+        outlet_train = self.simulation_type == 'outlet-train'
+        if n_steps is None:
+            # time_index grows by dt every period and terminate fires at T/dt. One period more than the estimate covers the rounding of time_index, the loop ends on terminate anyway
+            n_steps = max(int(np.ceil((self.T / self.dt - self.time_index) / self.dt)) + 1, 0)
+        capacity = min(n_steps, 1024)
+        observations = np.empty((capacity + 1, 2 * self.M))
+        actions = np.empty((capacity, K.shape[0]))
+        rewards = np.empty(capacity)
+        observations[0] = self._observation(normalized=outlet_train)
+        compiled = self.backend == "numba" and self.scheme != "muscl" and self.active_tiles is None and type(self.reward_class) is TrafficARZReward
+        if compiled:
+            # Index of the action driving each boundary, -1 for the fixed steady flux
+            inlet, outlet = {'outlet': (-1, 0), 'outlet-train': (-1, 0), 'inlet': (0, -1), 'inlet-train': (0, -1)}.get(self.simulation_type, (0, 1))
+        n = 0
+        done = False
+        while n < n_steps and not done:
+            if n == capacity:
+                # Doubles the buffers instead of allocating all periods of a long episode upfront
+                capacity = min(2 * capacity, n_steps)
+                observations = np.concatenate((observations, np.empty((capacity - n, 2 * self.M))))
+                actions = np.concatenate((actions, np.empty((capacity - n, K.shape[0]))))
+                rewards = np.concatenate((rewards, np.empty(capacity - n)))
+            if compiled:
+                # Periods up to the capacity run as a single compiled function
+                n, self.time_index, terminate, truncate = numba_kernels.arz_closed_loop(
+                    self.r, self.y, self.v, K, self.qs, self.action_space.low, self.action_space.high, inlet, outlet, n, capacity,
+                    float(self.time_index), self.T, self.dt, self.control_freq, self.cfl or 0.0, self.dx, self.vm, self.rm, self.tau,
+                    self.scheme == "ctm", self.relaxation == "exponential", self.vs, self.rs, np.inf if outlet_train else -0.00023,
+                    self.limit_pde_state_size, outlet_train, observations, actions, rewards, *self._midpoints,
+                )
+                done = terminate or truncate
+                if n:
+                    self.q_inlet = self._boundary_fluxes(actions[n - 1], self.qs)[0]
+                continue
+            deviation = observations[n] if outlet_train else self._observation(normalized=True)
+            actions[n] = self.qs + K @ deviation
+            self._advance_period(actions[n])
+            rewards[n] = self.reward_class.reward(self.vs, self.rs, self.v, self.r)
+            observations[n + 1] = self._observation(normalized=outlet_train)
+            if outlet_train:
+                done = self.terminate() or self.truncate()
+            else:
+                done = self.terminate() or rewards[n] > -0.00023 or self.truncate()
+            n += 1
+        return observations[:n + 1], actions[:n], rewards[:n]
 
     def reset(self, seed: Optional[int]=None, options: Optional[dict]=None):
         """
@@ -244,8 +492,6 @@ class TrafficPDE1D(PDEEnv1D):
         """
 
         x = np.arange(0,self.X+self.dx,self.dx)
-        self.r = np.zeros([self.M,1])
-        self.y = np.zeros([self.M,1])
 
         #Stochastic reset of environment during training
         if self.simulation_type == 'outlet-train':
@@ -256,16 +502,45 @@ class TrafficPDE1D(PDEEnv1D):
             self.qs = self.rs * self.vs
         
         #Initial condition of the PDE
-        self.r = self.rs * np.transpose(np.sin(3 * x / self.L * np.pi ) * 0.1 + np.ones([1,self.M]))
-        self.y = self.qs * np.ones([self.M,1]) - self.vm * self.r + self.vm / self.rm * (self.r)**(2)
-        self.v = self.y/self.r + TrafficPDE1D.Veq(self.vm, self.rm, self.r)
+        self._initial_condition(x)
 
-        obs = np.reshape(np.concatenate((self.r, self.v)), -1)
+        obs = self._observation()
     
         info = {}  # Optional info dict for debugging/logging
     
         return obs, info
 
+    def _initial_condition(self, x):
+        # Writes the initial density, auxiliary variable and velocity into the state arrays
+        self.r[:] = self.rs * (np.sin(3 * x / self.L * np.pi ) * 0.1 + np.ones(self.M))
+        self.y[:] = self.qs * np.ones(self.M) - self.vm * self.r + self.vm / self.rm * (self.r)**(2)
+        self._velocity()
+
+    def _velocity(self):
+        # v = y/r + Veq(r) evaluated in place
+        veq = self._veq
+        np.divide(self.r, self.rm, out=veq)
+        np.subtract(1, veq, out=veq)
+        np.multiply(self.vm, veq, out=veq)
+        np.divide(self.y, self.r, out=self.v)
+        np.add(self.v, veq, out=self.v)
+
+    def _observation(self, normalized: bool = False):
+        """
+        _observation
+
+        Writes the density and velocity, or their deviations relative to the steady state if ``normalized``, into the observation buffer and returns it, or a copy of it if ``copy_observation`` is set.
+        """
+        if normalized:
+            np.subtract(self.r, self.rs, out=self._obs_r)
+            np.divide(self._obs_r, self.rs, out=self._obs_r)
+            np.subtract(self.v, self.vs, out=self._obs_v)
+            np.divide(self._obs_v, self.vs, out=self._obs_v)
+        else:
+            np.copyto(self._obs_r, self.r)
+            np.copyto(self._obs_v, self.v)
+        return self._obs.copy() if self.copy_observation else self._obs
+
     #Helper functions
     @staticmethod
     def Veq(vm, rm, rho):
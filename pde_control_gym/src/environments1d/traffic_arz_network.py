@@ -0,0 +1,193 @@
+import numpy as np
+
+class ARZNetwork:
+    r"""
+    ARZNetwork
+
+    Index tables of a freeway network of ARZ links joined by junctions, precomputed once for :func:`network_ctm_step`. The cells of all links are packed into one concatenated array of ``N`` cells, link ``l`` holding the cells ``offsets[l]`` to ``offsets[l] + cells[l] - 1`` from its upstream to its downstream end. Every link has ``round(L/dx) - 1`` cells, the inner cells of a :class:`TrafficPDE1D` freeway of the same length.
+
+    A junction joins the downstream ends of its incoming links to the upstream ends of its outgoing links. It is either a merge with a single outgoing link or a diverge with a single incoming link, which splits its flow among the outgoing links with fixed split ratios. A junction with one incoming and one outgoing link joins two links in series. Links whose upstream end is not the outgoing link of a junction are sources fed by an inflow and links whose downstream end is not the incoming link of a junction are sinks limited by an outflow.
+
+    :param lengths: The length (meters) of every link.
+    :param dx: The spatial timestep of the simulation.
+    :param junctions: The junctions as dictionaries with the incoming links ``"in"``, the outgoing links ``"out"`` and, for diverges, the split ratios ``"split"`` of the outgoing links, which sum to one.
+    """
+    def __init__(self, lengths, dx, junctions):
+        self.n_links = len(lengths)
+        self.cells = np.array([int(round(L / dx)) - 1 for L in lengths], dtype=np.int64)
+        if self.n_links == 0 or np.any(self.cells < 1):
+            raise ValueError('Invalid links. Please use at least one link with a length of at least two cells.')
+        self.offsets = np.concatenate(([0], np.cumsum(self.cells)[:-1]))
+        self.N = int(self.cells.sum())
+        self.first = self.offsets
+        self.last = self.offsets + self.cells - 1
+        self.slices = [slice(int(o), int(o + n)) for o, n in zip(self.offsets, self.cells)]
+
+        # Every link end belongs to at most one junction
+        self.upstream = np.full(self.n_links, -1)
+        self.downstream = np.full(self.n_links, -1)
+        self.junctions = []
+        for j, junction in enumerate(junctions):
+            links_in, links_out = list(junction["in"]), list(junction["out"])
+            if not links_in or not links_out or (len(links_in) > 1 and len(links_out) > 1):
+                raise ValueError('Invalid junctions. Please use a merge with one outgoing link or a diverge with one incoming link.')
+            split = np.asarray(junction.get("split", np.ones(len(links_out)) / len(links_out)), dtype=np.float64)
+            if len(split) != len(links_out) or np.any(split <= 0) or not np.isclose(split.sum(), 1):
+                raise ValueError('Invalid junctions. Please use positive split ratios of the outgoing links which sum to one.')
+            for link in links_in + links_out:
+                if not 0 <= link < self.n_links:
+                    raise ValueError(f'Invalid junctions. Link {link} does not exist.')
+            for link in links_in:
+                if self.downstream[link] >= 0:
+                    raise ValueError(f'Invalid junctions. The downstream end of link {link} belongs to two junctions.')
+                self.downstream[link] = j
+            for link in links_out:
+                if self.upstream[link] >= 0:
+                    raise ValueError(f'Invalid junctions. The upstream end of link {link} belongs to two junctions.')
+                self.upstream[link] = j
+            self.junctions.append((links_in, links_out, split))
+        self.sources = np.flatnonzero(self.upstream < 0)
+        self.sinks = np.flatnonzero(self.downstream < 0)
+        self.source_cells = self.first[self.sources]
+        self.sink_cells = self.last[self.sinks]
+
+        # Interfaces between neighboring cells of the same link
+        self.internal_up = np.concatenate([np.arange(f, l) for f, l in zip(self.first, self.last)])
+        self.internal_down = self.internal_up + 1
+
+        # Merges, including links in series, as movements from the last cell of an incoming link to the junction
+        merges = [(links_in, links_out[0]) for links_in, links_out, _ in self.junctions if len(links_out) == 1]
+        self.merge_in = np.array([self.last[link] for links_in, _ in merges for link in links_in], dtype=np.int64)
+        self.merge_junction = np.array([m for m, (links_in, _) in enumerate(merges) for _ in links_in], dtype=np.int64)
+        self.merge_out = np.array([self.first[link] for _, link in merges], dtype=np.int64)
+        # Diverges as movements from the junction to the first cell of an outgoing link
+        diverges = [(links_in[0], links_out, split) for links_in, links_out, split in self.junctions if len(links_out) > 1]
+        self.diverge_in = np.array([self.last[link] for link, _, _ in diverges], dtype=np.int64)
+        self.diverge_out = np.array([self.first[link] for _, links_out, _ in diverges for link in links_out], dtype=np.int64)
+        self.diverge_junction = np.array([d for d, (_, links_out, _) in enumerate(diverges) for _ in links_out], dtype=np.int64)
+        self.diverge_split = np.concatenate([split for _, _, split in diverges]) if diverges else np.zeros(0)
+
+        # Cell sized flux buffers of the left and right interface of every cell
+        self.flux_left_r = np.empty(self.N)
+        self.flux_right_r = np.empty(self.N)
+        self.flux_left_y = np.empty(self.N)
+        self.flux_right_y = np.empty(self.N)
+
+    def link_flows(self, inflows):
+        """
+        link_flows
+
+        Returns the steady flow of every link that carries the given inflows of the sources through the network. Merges add the flows of their incoming links and diverges split their flow by the split ratios.
+
+        :param inflows: The inflow of every source in the order of ``sources``.
+        """
+        flows = np.full(self.n_links, np.nan)
+        flows[self.sources] = inflows
+        pending = list(range(len(self.junctions)))
+        while pending:
+            ready = [j for j in pending if not np.any(np.isnan(flows[self.junctions[j][0]]))]
+            if not ready:
+                raise ValueError('Invalid junctions. The links of the network must not form a cycle.')
+            for j in ready:
+                links_in, links_out, split = self.junctions[j]
+                flows[links_out] = flows[links_in].sum() * split
+                pending.remove(j)
+        return flows
+
+
+def _demand(r_up, w_up, vm, rm):
+    # Demand Q_wu(min(rho_u, rho_c)) of the upstream cell, evaluated as in ctm_step
+    free = np.add(w_up, vm)
+    demand = np.minimum(r_up, np.multiply(rm / (2 * vm), free))
+    return np.multiply(demand, np.subtract(free, np.multiply(vm / rm, demand)))
+
+
+def _supply(w_up, r_down, w_down, vm, rm):
+    # Supply Q_wu(max(rho_m, rho_c)) of the downstream cell to vehicles with marker w_up, evaluated as in ctm_step
+    free = np.add(w_up, vm)
+    supply = np.add(r_down, np.multiply(rm / vm, np.subtract(w_up, w_down)))
+    supply = np.maximum(supply, np.multiply(rm / (2 * vm), free))
+    supply = np.multiply(supply, np.subtract(free, np.multiply(vm / rm, supply)))
+    return np.maximum(supply, 0)
+
+
+def network_ctm_step(r, y, q_source, q_sink, dt, dx, vm, rm, tau, net):
+    r"""
+    network_ctm_step
+
+    Advances the ARZ state of all links of the network ``net`` by one timestep of the cell transmission model of :func:`ctm_step`, updating the packed ``(N,)`` arrays ``r`` and ``y`` in place. The fluxes of all interfaces of a kind are evaluated with one array operation over the index tables of :class:`ARZNetwork`:
+
+    * Interfaces inside a link use the demand and supply of :func:`ctm_step`.
+    * A source admits its inflow up to the supply of the first cell of its link and a sink passes the demand of the last cell of its link up to its outflow. Unlike the boundary cells of :func:`ctm_step`, whose marker grows without bound for inflows far above the flux of a light first cell, the entering vehicles carry the marker of the first cell, which keeps on-ramps in free flow stable.
+    * A merge admits the demands of its incoming links if the outgoing link supplies their sum and otherwise scales them by the ratio of supply and total demand. The supply is evaluated for the demand weighted marker of the arriving vehicles.
+    * A diverge passes the largest flow up to the demand of its incoming link whose split among the outgoing links fits their supplies (first in, first out).
+
+    The flux of :math:`y` through every interface is the marker :math:`w` of the crossing vehicles times their flux. Each junction flux leaves its incoming links and enters its outgoing links exactly, so the number of vehicles and the total of :math:`y` are conserved across junctions.
+
+    :param r: Density of shape ``(N,)``.
+    :param y: Auxiliary variable :math:`y = \rho (v - V(\rho))` of shape ``(N,)``.
+    :param q_source: Traffic flux demanded at the sources, in the order of ``net.sources``.
+    :param q_sink: Traffic flux supplied at the sinks, in the order of ``net.sinks``.
+    :param net: The :class:`ARZNetwork` of the packed state.
+    """
+    w = y / r
+    left_r, right_r, left_y, right_y = net.flux_left_r, net.flux_right_r, net.flux_left_y, net.flux_right_y
+
+    # Interfaces inside the links
+    up, down = net.internal_up, net.internal_down
+    w_up = w[up]
+    flux = np.minimum(_demand(r[up], w_up, vm, rm), _supply(w_up, r[down], w[down], vm, rm))
+    right_r[up] = left_r[down] = flux
+    right_y[up] = left_y[down] = w_up * flux
+
+    # Sources, the entering vehicles carry the marker of the first cell
+    cells = net.source_cells
+    w_in = w[cells]
+    flux = np.minimum(q_source, _supply(w_in, r[cells], w_in, vm, rm))
+    left_r[cells] = flux
+    left_y[cells] = w_in * flux
+
+    # Sinks, the outflow is the demand of the last cell up to the supplied outflow
+    cells = net.sink_cells
+    w_out = w[cells]
+    flux = np.minimum(_demand(r[cells], w_out, vm, rm), q_sink)
+    right_r[cells] = flux
+    right_y[cells] = w_out * flux
+
+    if net.merge_in.size:
+        cells, junction, out = net.merge_in, net.merge_junction, net.merge_out
+        n = out.size
+        w_in = w[cells]
+        demand = _demand(r[cells], w_in, vm, rm)
+        total = np.bincount(junction, demand, minlength=n)
+        # Demand weighted marker of the arriving vehicles, the marker of the outgoing link without demand
+        w_mix = w[out]
+        np.divide(np.bincount(junction, demand * w_in, minlength=n), total, out=w_mix, where=total > 0)
+        supply = _supply(w_mix, r[out], w[out], vm, rm)
+        ratio = np.ones(n)
+        np.divide(supply, total, out=ratio, where=total > supply)
+        flux = demand * ratio[junction]
+        flux_y = w_in * flux
+        right_r[cells] = flux
+        right_y[cells] = flux_y
+        left_r[out] = np.bincount(junction, flux, minlength=n)
+        left_y[out] = np.bincount(junction, flux_y, minlength=n)
+
+    if net.diverge_in.size:
+        cells, junction, out, split = net.diverge_in, net.diverge_junction, net.diverge_out, net.diverge_split
+        w_in = w[cells]
+        flux = _demand(r[cells], w_in, vm, rm)
+        np.minimum.at(flux, junction, _supply(w_in[junction], r[out], w[out], vm, rm) / split)
+        right_r[cells] = flux
+        right_y[cells] = w_in * flux
+        flux_out = split * flux[junction]
+        left_r[out] = flux_out
+        left_y[out] = w_in[junction] * flux_out
+
+    # Conservative update of every cell with the relaxation source -y/tau
+    relax = np.multiply(dt / tau, y)
+    inner = np.multiply(dt / dx, np.subtract(right_r, left_r))
+    np.subtract(r, inner, out=r)
+    inner = np.multiply(dt / dx, np.subtract(right_y, left_y))
+    np.add(inner, relax, out=inner)
+    np.subtract(y, inner, out=y)
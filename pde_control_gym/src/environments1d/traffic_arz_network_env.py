@@ -0,0 +1,211 @@
+import numpy as np
+import gymnasium as gym
+from gymnasium import spaces
+from typing import Optional, Sequence, Type
+from pde_control_gym.src.environments1d.traffic_arz_network import ARZNetwork, network_ctm_step
+from pde_control_gym.src.rewards import BaseReward
+
+class TrafficNetworkPDE1D(gym.Env):
+    r"""
+    Traffic ARZ PDE on a freeway network
+
+    This class simulates a freeway network of ARZ links, each following the dynamics of :class:`TrafficPDE1D`, joined by merge and diverge junctions. The cells of all links are packed into one concatenated ``(N,)`` array and the junctions into precomputed index tables of :class:`ARZNetwork`, so every PDE timestep advances the whole network in one vectorized pass of :func:`network_ctm_step`. The junction fluxes follow the demand and supply of the cell transmission model and conserve the vehicles, so corridors with on-ramps and off-ramps are simulated by a single environment instead of one environment per link.
+
+    The steady state of every link carries the flow of the nominal inflows through the network on the branch of the Greenshields diagram selected by ``congested``. The episode starts from the steady state with the density perturbation of :class:`TrafficPDE1D` on every link. The inflows of the sources and the outflows of the sinks stay at their steady flows unless they are control points. The action is the vector of the controlled inflows, e.g. the metering rates of on-ramps, followed by the controlled outflows, each clipped to the capacity ``v_max * ro_max / 4``. The observation is the concatenated density and velocity of all ``N`` cells and the reward is the sum of the rewards of the links with respect to their steady states.
+
+    :param T: The end time of the simulation.
+    :param dt: The temporal timestep of the simulation.
+    :param dx: The spatial timestep of the simulation.
+    :param reward_class: An instance of the reward class to specify user reward for each simulation step. Must inherit BaseReward class. The reward is evaluated separately for each link.
+    :param links: The length (meters) of every link.
+    :param junctions: The junctions as dictionaries with the incoming links ``"in"``, the outgoing links ``"out"`` and, for diverges, the split ratios ``"split"``, see :class:`ARZNetwork`.
+    :param inflows: The nominal inflow (vehicles/second) of every source, as a dictionary from the source link to its inflow.
+    :param control_inflows: The source links whose inflow is controlled by the action.
+    :param control_outflows: The sink links whose outflow is controlled by the action.
+    :param v_max: Maximum permissible velocity (meters/second) on freeway under simulation
+    :param ro_max: Maximum permissible density (vehicles/meter) on freeway under simulation
+    :param tau: Relaxation time (seconds) required by the driver to adjust to the new velocity
+    :param congested: Whether the steady states lie on the congested branch of the Greenshields diagram.
+    :param limit_pde_state_size: This is a boolean which will terminate the episode early if the observation velocity or density is greater than v_max and ro_max respectively
+    :param control_freq: Number of PDE simulation steps performed using same action per environment step() call
+    :param copy_observation: Whether ``step`` and ``reset`` return a copy of the ``(2N,)`` observation buffer, see :class:`TrafficPDE1D`.
+    """
+    def __init__(self,
+                 T: float,
+                 dt: float,
+                 dx: float,
+                 reward_class: Type[BaseReward],
+                 links: Sequence[float],
+                 junctions: Sequence[dict],
+                 inflows: dict,
+                 control_inflows: Sequence[int] = (),
+                 control_outflows: Sequence[int] = (),
+                 v_max: float = 40,
+                 ro_max: float = 0.16,
+                 tau: float = 60,
+                 congested: bool = True,
+                 limit_pde_state_size: bool = False,
+                 control_freq: int = 1,
+                 copy_observation: bool = True):
+        super().__init__()
+        self.T = T
+        self.dt = dt
+        self.dx = dx
+        self.nt = int(round(T / dt))
+        self.reward_class = reward_class
+        self.vm = v_max
+        self.rm = ro_max
+        self.qm = v_max * ro_max/4
+        self.tau = tau
+        self.limit_pde_state_size = limit_pde_state_size
+
+        assert(isinstance(control_freq, int) and control_freq >= 1) , f"control_freq must be a positive integer (got {control_freq} of type {type(control_freq).__name__})"
+        self.control_freq = control_freq
+
+        self.network = ARZNetwork(links, dx, junctions)
+        net = self.network
+        self.N = net.N
+        if set(inflows) != set(net.sources.tolist()):
+            raise ValueError(f'Invalid inflows. Please give the inflow of every source link {net.sources.tolist()}.')
+        self.q_links = net.link_flows(np.array([inflows[link] for link in net.sources], dtype=np.float64))
+        # Steady density on the chosen branch of q = rho Veq(rho)
+        discriminant = 1 - self.q_links / self.qm
+        if np.any(self.q_links < 0) or np.any(discriminant < 0):
+            raise ValueError('Invalid inflows. The steady flow of every link must lie between zero and the capacity v_max * ro_max / 4.')
+        self.rs = self.rm / 2 * (1 + (1 if congested else -1) * np.sqrt(discriminant))
+        self.vs = self.vm * (1 - self.rs / self.rm)
+        self.q_source = self.q_links[net.sources]
+        self.q_sink = self.q_links[net.sinks]
+
+        # Positions of the control points among the sources and sinks
+        self.control_inflows = list(control_inflows)
+        self.control_outflows = list(control_outflows)
+        if not set(self.control_inflows) <= set(net.sources.tolist()) or not set(self.control_outflows) <= set(net.sinks.tolist()):
+            raise ValueError('Invalid control points. Please control the inflows of source links and the outflows of sink links.')
+        self._inflow_index = np.searchsorted(net.sources, self.control_inflows).astype(np.int64)
+        self._outflow_index = np.searchsorted(net.sinks, self.control_outflows).astype(np.int64)
+        self.n_controls = len(self.control_inflows) + len(self.control_outflows)
+
+        # Density, auxiliary variable and velocity of all links are contiguous (N,) arrays updated in place
+        self.r = np.zeros(self.N)
+        self.y = np.zeros(self.N)
+        self.v = np.zeros(self.N)
+        self._veq = np.zeros(self.N)
+        self.time_index = 0
+        self.copy_observation = copy_observation
+        self._obs = np.zeros(2 * self.N)
+        self._obs_r, self._obs_v = self._obs[:self.N], self._obs[self.N:]
+        self.info = dict()
+
+        self.observation_space = spaces.Box(low=0, high=self.vm, shape=(2 * self.N,), dtype=np.float64)
+        self.action_space = spaces.Box(dtype=np.float64, low=0, high=self.qm, shape=(self.n_controls,))
+
+    def steady_action(self) -> np.ndarray:
+        """
+        steady_action
+
+        Returns the action that keeps every control point at its steady flow.
+        """
+        return np.concatenate((self.q_source[self._inflow_index], self.q_sink[self._outflow_index]))
+
+    def reset(self, seed: Optional[int]=None, options: Optional[dict]=None):
+        r"""
+        reset
+
+        Resets every link to its steady state with the density perturbation :math:`0.1 \rho_s \sin(3 \pi x / L)` of :class:`TrafficPDE1D`, where ``x`` is the position of a cell on its link of length ``L``.
+
+        :param seed: Seed of the environment's random number generator.
+        :param options: Not used.
+        """
+        super().reset(seed=seed)
+        net = self.network
+        for link, cells in enumerate(net.slices):
+            n = net.cells[link]
+            x = np.arange(1, n + 1) * self.dx
+            length = (n + 1) * self.dx
+            r = self.rs[link] * (np.sin(3 * x / length * np.pi) * 0.1 + 1)
+            self.r[cells] = r
+            self.y[cells] = self.q_links[link] - self.vm * r + self.vm / self.rm * r**2
+        self.time_index = 0
+        self._velocity()
+        return self._observation(), {}
+
+    def step(self, action: np.ndarray):
+        """
+        step
+
+        Applies the controlled inflows and outflows of the action for one control period of ``control_freq`` PDE timesteps and returns the new state, reward, done, truncated and info.
+
+        :param action: The controlled inflows followed by the controlled outflows.
+        :return: A tuple of:
+            - observation (np.ndarray): The concatenated density (`r`) and velocity (`v`) of all cells after taking action.
+            - reward (float): The sum of the rewards of all links after action.
+            - done (bool): Whether the simulation should terminate.
+            - truncated (bool): Whether the simulation was truncated.
+            - info (dict): The inflows of the sources as ``"q_source"`` and the outflows of the sinks as ``"q_sink"``.
+        """
+        action = np.clip(np.asarray(action, dtype=np.float64).reshape(self.n_controls), a_min=0, a_max=self.qm)
+        q_source, q_sink = self.q_source.copy(), self.q_sink.copy()
+        q_source[self._inflow_index] = action[:len(self._inflow_index)]
+        q_sink[self._outflow_index] = action[len(self._inflow_index):]
+        for _ in range(self.control_freq):
+            network_ctm_step(self.r, self.y, q_source, q_sink, self.dt, self.dx, self.vm, self.rm, self.tau, self.network)
+        self.time_index += self.control_freq
+        self._velocity()
+        reward = sum(self.reward_class.reward(self.vs[link], self.rs[link], self.v[cells], self.r[cells]) for link, cells in enumerate(self.network.slices))
+        self.info["q_source"], self.info["q_sink"] = q_source, q_sink
+        return self._observation(), reward, self.time_index >= self.nt, self.truncate(), self.info
+
+    def truncate(self):
+        """
+        truncate
+
+        Determines whether to truncate the episode based on the PDE state size and the vairable ``limit_pde_state_size`` given in the PDE environment intialization.
+        """
+        return bool(self.limit_pde_state_size and (np.any(self.v > self.vm) or np.any(self.r > self.rm)))
+
+    def get_state(self) -> dict:
+        """
+        get_state
+
+        Returns a snapshot of the network with copies of the density ``r``, the auxiliary variable ``y`` and the time index, see :meth:`TrafficPDE1D.get_state`.
+        """
+        return {"r": self.r.copy(), "y": self.y.copy(), "time_index": self.time_index}
+
+    def set_state(self, state: dict):
+        """
+        set_state
+
+        Restores a snapshot returned by :meth:`get_state`. The state arrays are overwritten in place and the velocity is recomputed.
+
+        :param state: The snapshot.
+        """
+        np.copyto(self.r, state["r"])
+        np.copyto(self.y, state["y"])
+        self.time_index = state["time_index"]
+        self._velocity()
+
+    def link_state(self, link: int):
+        """
+        link_state
+
+        Returns views of the density and velocity of the cells of a link.
+
+        :param link: The index of the link.
+        """
+        cells = self.network.slices[link]
+        return self.r[cells], self.v[cells]
+
+    def _velocity(self):
+        # v = y/r + Veq(r) evaluated in place
+        veq = self._veq
+        np.divide(self.r, self.rm, out=veq)
+        np.subtract(1, veq, out=veq)
+        np.multiply(self.vm, veq, out=veq)
+        np.divide(self.y, self.r, out=self.v)
+        np.add(self.v, veq, out=self.v)
+
+    def _observation(self):
+        np.copyto(self._obs_r, self.r)
+        np.copyto(self._obs_v, self.v)
+        return self._obs.copy() if self.copy_observation else self._obs
@@ -0,0 +1,450 @@
+import numpy as np
+
+class ARZWorkspace:
+    r"""
+    ARZWorkspace
+
+    Preallocated scratch buffers for :func:`lax_wendroff_step` and :func:`ctm_step`. A workspace is created once by the environment for the shape of its state arrays and reused on every PDE timestep so that no temporaries are allocated inside the solver loop.
+
+    :param shape: Shape of the state arrays ``r`` and ``y``. The last axis holds the ``M`` cells of the freeway and any leading axes are batch axes.
+    """
+    def __init__(self, shape):
+        shape = tuple(shape)
+        half = shape[:-1] + (shape[-1] - 1,)
+        self.shape = shape
+        # Cell fluxes and a cell sized temporary
+        self.flux_r = np.empty(shape)
+        self.flux_y = np.empty(shape)
+        self.veq = np.empty(shape)
+        # Midpoint states, their fluxes and a midpoint sized temporary
+        self.r_half = np.empty(half)
+        self.y_half = np.empty(half)
+        self.flux_r_half = np.empty(half)
+        self.flux_y_half = np.empty(half)
+        self.veq_half = np.empty(half)
+        self._cells = {shape[-1]: self}
+        self._rows = {shape[0]: self}
+
+    def cells(self, n):
+        """
+        cells
+
+        Returns a workspace for the first ``n`` cells of the state arrays whose buffers are views into the buffers of this workspace, e.g. for updating a contiguous range of cells with :func:`lax_wendroff_interior`. The views are created once per ``n``.
+        """
+        if n not in self._cells:
+            view = ARZWorkspace.__new__(ARZWorkspace)
+            view.shape = self.shape[:-1] + (n,)
+            for name in ("flux_r", "flux_y", "veq"):
+                setattr(view, name, getattr(self, name)[..., :n])
+            for name in ("r_half", "y_half", "flux_r_half", "flux_y_half", "veq_half"):
+                setattr(view, name, getattr(self, name)[..., :n - 1])
+            view._cells = {n: view}
+            view._rows = {view.shape[0]: view}
+            self._cells[n] = view
+        return self._cells[n]
+
+    def rows(self, n):
+        """
+        rows
+
+        Returns a workspace for the first ``n`` instances of a batched workspace whose buffers are views into the buffers of this workspace, e.g. for advancing a subset of the instances gathered into ``(n, M)`` arrays. The views are created once per ``n``.
+        """
+        if n not in self._rows:
+            view = ARZWorkspace.__new__(ARZWorkspace)
+            view.shape = (n,) + self.shape[1:]
+            for name in ("flux_r", "flux_y", "veq", "r_half", "y_half", "flux_r_half", "flux_y_half", "veq_half"):
+                setattr(view, name, getattr(self, name)[:n])
+            view._cells = {view.shape[-1]: view}
+            view._rows = {n: view}
+            self._rows[n] = view
+        return self._rows[n]
+
+
+def fluxes(vm, rm, rho, y, flux_r, flux_y, veq):
+    r"""
+    fluxes
+
+    Evaluates :math:`F_r(\rho, y) = y + \rho V(\rho)` and :math:`F_y(\rho, y) = y (y/\rho + V(\rho))` into the preallocated arrays ``flux_r`` and ``flux_y``. ``veq`` is used as scratch and holds :math:`V(\rho)` on return.
+    """
+    # Veq = vm * (1 - rho/rm)
+    np.divide(rho, rm, out=veq)
+    np.subtract(1, veq, out=veq)
+    np.multiply(vm, veq, out=veq)
+    # F_r = y + rho * Veq
+    np.multiply(rho, veq, out=flux_r)
+    np.add(y, flux_r, out=flux_r)
+    # F_y = y * (y/rho + Veq)
+    np.divide(y, rho, out=flux_y)
+    np.add(flux_y, veq, out=flux_y)
+    np.multiply(y, flux_y, out=flux_y)
+
+
+def apply_flux_boundary(r, y, q_inlet, q_outlet, vm, rm):
+    r"""
+    apply_flux_boundary
+
+    Sets the boundary cells of the ARZ state from the inlet and outlet fluxes. The density is copied from the neighboring cell and :math:`y` is chosen such that the flux :math:`\rho v` equals the imposed flux.
+    """
+    M = r.shape[-1]
+    r[..., 0] = r[..., 1]
+    y[..., 0] = q_inlet - r[..., 0] * (vm * (1 - r[..., 0] / rm))
+    r[..., M-1] = r[..., M-2]
+    y[..., M-1] = q_outlet - r[..., M-1] * (vm * (1 - r[..., M-1] / rm))
+
+
+def lax_wendroff_step(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, ws):
+    r"""
+    lax_wendroff_step
+
+    Advances the ARZ state by one timestep of the two-step Richtmyer/Lax-Wendroff scheme, updating ``r`` and ``y`` in place. Every cell flux and every midpoint flux is evaluated exactly once into the buffers of ``ws``. The boundary cells are set from the inlet and outlet fluxes before the update.
+
+    :param r: Density of shape ``(..., M)``.
+    :param y: Auxiliary variable :math:`y = \rho (v - V(\rho))` of shape ``(..., M)``.
+    :param q_inlet: Traffic flux imposed at the inlet. Scalar or array of the batch shape.
+    :param q_outlet: Traffic flux imposed at the outlet. Scalar or array of the batch shape.
+    :param ws: An :class:`ARZWorkspace` matching the shape of ``r``.
+    """
+    M = r.shape[-1]
+    # Boundary conditions
+    r[..., 0] = r[..., 1]
+    y[..., 0] = q_inlet - r[..., 0] * (vm * (1 - r[..., 0] / rm))
+    r[..., M-1] = r[..., M-2]
+    y[..., M-1] = q_outlet - r[..., M-1] * (vm * (1 - r[..., M-1] / rm))
+    lax_wendroff_interior(r, y, dt, dx, vm, rm, tau, ws)
+
+
+def lax_wendroff_interior(r, y, dt, dx, vm, rm, tau, ws):
+    r"""
+    lax_wendroff_interior
+
+    Advances the inner cells ``1`` to ``M-2`` of the ARZ state by one timestep of :func:`lax_wendroff_step`, with the first and the last cell as fixed neighbors. Applied to a contiguous range of cells padded by one neighbor on each side, it updates the range exactly as :func:`lax_wendroff_step` updates it in the whole state.
+
+    :param ws: An :class:`ARZWorkspace` matching the shape of ``r``, e.g. :meth:`ARZWorkspace.cells` of a larger workspace.
+    """
+    M = r.shape[-1]
+    lam = dt / (2 * dx)
+    relax = 0.25 * dt / tau
+
+    # Cell fluxes, evaluated once per cell
+    fluxes(vm, rm, r, y, ws.flux_r, ws.flux_y, ws.veq)
+
+    # Midpoint values between cells j and j+1
+    r_half, y_half, tmp = ws.r_half, ws.y_half, ws.veq_half
+    np.add(r[..., 1:], r[..., :-1], out=r_half)
+    np.multiply(0.5, r_half, out=r_half)
+    np.subtract(ws.flux_r[..., 1:], ws.flux_r[..., :-1], out=tmp)
+    np.multiply(lam, tmp, out=tmp)
+    np.subtract(r_half, tmp, out=r_half)
+
+    relax_half = ws.flux_y_half
+    np.add(y[..., 1:], y[..., :-1], out=tmp)
+    np.multiply(0.5, tmp, out=y_half)
+    np.multiply(relax, tmp, out=relax_half)
+    np.subtract(ws.flux_y[..., 1:], ws.flux_y[..., :-1], out=tmp)
+    np.multiply(lam, tmp, out=tmp)
+    np.subtract(y_half, tmp, out=y_half)
+    np.subtract(y_half, relax_half, out=y_half)
+
+    # Midpoint fluxes, evaluated once per midpoint
+    fluxes(vm, rm, r_half, y_half, ws.flux_r_half, ws.flux_y_half, tmp)
+
+    # Update values in the inner domain
+    inner = tmp[..., :-1]
+    np.subtract(ws.flux_r_half[..., 1:], ws.flux_r_half[..., :-1], out=inner)
+    np.multiply(dt / dx, inner, out=inner)
+    np.subtract(r[..., 1:M-1], inner, out=r[..., 1:M-1])
+
+    relax_inner = ws.flux_r_half[..., :-1]
+    np.subtract(ws.flux_y_half[..., 1:], ws.flux_y_half[..., :-1], out=inner)
+    np.multiply(dt / dx, inner, out=inner)
+    np.add(y_half[..., 1:], y_half[..., :-1], out=relax_inner)
+    np.multiply(0.5 * dt / tau, relax_inner, out=relax_inner)
+    np.add(inner, relax_inner, out=inner)
+    np.subtract(y[..., 1:M-1], inner, out=y[..., 1:M-1])
+
+
+def active_lax_wendroff_substeps(r, y, q_inlet, q_outlet, n, dt, dx, vm, rm, tau, starts, stops, ws):
+    r"""
+    active_lax_wendroff_substeps
+
+    Runs ``n`` timesteps of :func:`lax_wendroff_step` on the 1D state that only update the cell ranges ``starts[i]`` to ``stops[i]-1``. The ranges and one neighbor on each side are gathered into a single packed array which is advanced by :func:`lax_wendroff_interior`, so the cost of a timestep grows with the number of updated cells and not with the number of ranges. The cells outside of the ranges are left unchanged, which matches :func:`lax_wendroff_step` as long as they and their neighbors are at a uniform steady state with :math:`y = 0`.
+
+    :param starts: First cell of every range, in increasing order.
+    :param stops: One past the last cell of every range. The ranges must not overlap or touch.
+    :param ws: An :class:`ARZWorkspace` of at least ``M + 2 * len(starts)`` cells.
+    """
+    M = r.shape[-1]
+    lo, hi = np.maximum(starts - 1, 0), np.minimum(stops + 1, M)
+    # Cells of the packed array and the packed positions that are updated, i.e. all but the neighbors of every range
+    index = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)])
+    inner = np.ones(len(index), dtype=np.bool_)
+    ends = np.cumsum(hi - lo)
+    inner[ends - (hi - lo)] = False
+    inner[ends - 1] = False
+    target = index[inner]
+    packed_r, packed_y = np.empty(len(index)), np.empty(len(index))
+    packed_ws = ws.cells(len(index))
+    for _ in range(n):
+        apply_flux_boundary(r, y, q_inlet, q_outlet, vm, rm)
+        np.take(r, index, out=packed_r)
+        np.take(y, index, out=packed_y)
+        lax_wendroff_interior(packed_r, packed_y, dt, dx, vm, rm, tau, packed_ws)
+        r[target] = packed_r[inner]
+        y[target] = packed_y[inner]
+
+
+def ctm_step(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, ws):
+    r"""
+    ctm_step
+
+    Advances the ARZ state by one timestep of the first order Godunov scheme of the cell transmission model, updating ``r`` and ``y`` in place. Vehicles carry the Lagrangian marker :math:`w = y/\rho = v - V(\rho)`, so the upstream cell of an interface with marker :math:`w_u` follows the fundamental diagram :math:`Q_{w_u}(\rho) = \rho (V(\rho) + w_u)` of the Greenshields model :math:`V`. The flux of vehicles through the interface is the minimum of the demand :math:`Q_{w_u}(\min(\rho_u, \rho_c))` of the upstream cell and the supply :math:`Q_{w_u}(\max(\rho_m, \rho_c))` of the downstream cell, where :math:`\rho_c` is the critical density of :math:`Q_{w_u}` and :math:`\rho_m` the density on :math:`Q_{w_u}` that moves with the downstream velocity. The flux of :math:`y` is :math:`w_u` times the flux of vehicles. The inlet flux is the minimum of ``q_inlet`` and the supply of the first cell, and the outlet flux the minimum of the demand of the last cell and ``q_outlet``. The boundary cells are set as in :func:`lax_wendroff_step`, so both schemes share the observation layout.
+
+    :param r: Density of shape ``(..., M)``.
+    :param y: Auxiliary variable :math:`y = \rho (v - V(\rho))` of shape ``(..., M)``.
+    :param q_inlet: Traffic flux demanded at the inlet. Scalar or array of the batch shape.
+    :param q_outlet: Traffic flux supplied at the outlet. Scalar or array of the batch shape.
+    :param ws: An :class:`ARZWorkspace` matching the shape of ``r``.
+    """
+    M = r.shape[-1]
+    apply_flux_boundary(r, y, q_inlet, q_outlet, vm, rm)
+
+    # Marker w = y/rho of every cell, the upstream and downstream cells of the interfaces
+    w = np.divide(y, r, out=ws.flux_y)
+    r_up, w_up, r_down, w_down = r[..., :-1], w[..., :-1], r[..., 1:], w[..., 1:]
+    free, critical, demand, supply, tmp = ws.veq_half, ws.r_half, ws.y_half, ws.flux_y_half, ws.flux_r_half
+    # Free flow speed vm + w_u and critical density rho_c = rm (vm + w_u) / (2 vm) of the upstream diagram
+    np.add(w_up, vm, out=free)
+    np.multiply(rm / (2 * vm), free, out=critical)
+
+    # Demand Q_wu(min(rho_u, rho_c)) with Q_wu(rho) = rho (vm + w_u - vm/rm rho)
+    np.minimum(r_up, critical, out=demand)
+    np.multiply(vm / rm, demand, out=tmp)
+    np.subtract(free, tmp, out=tmp)
+    np.multiply(demand, tmp, out=demand)
+
+    # Supply Q_wu(max(rho_m, rho_c)) with V(rho_m) + w_u = V(rho_d) + w_d, i.e. rho_m = rho_d + rm/vm (w_u - w_d)
+    np.subtract(w_up, w_down, out=supply)
+    np.multiply(rm / vm, supply, out=supply)
+    np.add(r_down, supply, out=supply)
+    np.maximum(supply, critical, out=supply)
+    np.multiply(vm / rm, supply, out=tmp)
+    np.subtract(free, tmp, out=tmp)
+    np.multiply(supply, tmp, out=supply)
+    np.maximum(supply, 0, out=supply)
+
+    # Inlet demand and outlet supply are the imposed fluxes
+    demand[..., 0] = q_inlet
+    supply[..., M-2] = np.minimum(supply[..., M-2], q_outlet)
+    flux_r = np.minimum(demand, supply, out=demand)
+    flux_y = np.multiply(w_up, flux_r, out=tmp)
+
+    # Update values in the inner domain with the relaxation source -y/tau
+    inner = free[..., :-1]
+    np.subtract(flux_r[..., 1:], flux_r[..., :-1], out=inner)
+    np.multiply(dt / dx, inner, out=inner)
+    np.subtract(r[..., 1:M-1], inner, out=r[..., 1:M-1])
+    relax = ws.veq[..., :M-2]
+    np.multiply(dt / tau, y[..., 1:M-1], out=relax)
+    np.subtract(flux_y[..., 1:], flux_y[..., :-1], out=inner)
+    np.multiply(dt / dx, inner, out=inner)
+    np.add(inner, relax, out=inner)
+    np.subtract(y[..., 1:M-1], inner, out=y[..., 1:M-1])
+
+
+class MUSCLWorkspace:
+    r"""
+    MUSCLWorkspace
+
+    Preallocated scratch buffers for :func:`muscl_step`, the counterpart of :class:`ARZWorkspace` for the MUSCL scheme. The scheme works on ``r`` and ``y`` stacked along a new first axis, so that the limiter, the reconstruction and the HLL flux treat both variables with a single array operation.
+
+    :param shape: Shape of the state arrays ``r`` and ``y``. The last axis holds the ``M`` cells of the freeway and any leading axes are batch axes.
+    """
+    def __init__(self, shape):
+        shape = tuple(shape)
+        half = shape[:-1] + (shape[-1] - 1,)
+        self.shape = shape
+        # Stacked state and the stacked state at the start of the step
+        self.state = np.empty((2,) + shape)
+        self.start = np.empty((2,) + shape)
+        # Limited slopes, zero in the boundary cells
+        self.slope = np.zeros((2,) + shape)
+        # Cell sized buffers used by max_characteristic_speed
+        self.flux_r = np.empty(shape)
+        self.flux_y = np.empty(shape)
+        self.veq = np.empty(shape)
+        # Left and right states of every interface, their fluxes and wave speeds
+        self.left = np.empty((2,) + half)
+        self.right = np.empty((2,) + half)
+        self.flux_left = np.empty((2,) + half)
+        self.flux_right = np.empty((2,) + half)
+        self.speed = np.empty((4,) + half)
+        self.tmp = np.empty((2,) + half)
+        self._rows = {shape[0]: self}
+
+    def rows(self, n):
+        """
+        rows
+
+        Returns a workspace for the first ``n`` instances of a batched workspace whose buffers are views into the buffers of this workspace, see :meth:`ARZWorkspace.rows`.
+        """
+        if n not in self._rows:
+            view = MUSCLWorkspace.__new__(MUSCLWorkspace)
+            view.shape = (n,) + self.shape[1:]
+            for name in ("flux_r", "flux_y", "veq"):
+                setattr(view, name, getattr(self, name)[:n])
+            for name in ("state", "start", "slope", "left", "right", "flux_left", "flux_right", "speed", "tmp"):
+                setattr(view, name, getattr(self, name)[:, :n])
+            view._rows = {n: view}
+            self._rows[n] = view
+        return self._rows[n]
+
+
+def _interface_speeds(vm, rm, u, flux, speed_slow, speed_fast):
+    # Fluxes of the reconstructed states u = (r, y) and the ARZ characteristic speeds v + rho V'(rho) <= v
+    fluxes(vm, rm, u[0], u[1], flux[0], flux[1], speed_fast)
+    # speed_fast holds V(rho) and becomes v = y/rho + V(rho)
+    np.divide(u[1], u[0], out=speed_slow)
+    np.add(speed_fast, speed_slow, out=speed_fast)
+    np.multiply(vm / rm, u[0], out=speed_slow)
+    np.subtract(speed_fast, speed_slow, out=speed_slow)
+
+
+def _muscl_stage(u, dt, dx, vm, rm, tau, ws):
+    # Forward Euler stage u <- u + dt * L(u) of the interior cells of the stacked state u = (r, y)
+    M = u.shape[-1]
+    # Minmod slopes 0.5 (sign(a) + sign(b)) min(|a|, |b|) of the backward and forward differences a, b
+    backward, forward, sign = ws.tmp[..., :-1], ws.slope[..., 1:-1], ws.flux_left[..., :-1]
+    np.subtract(u[..., 1:-1], u[..., :-2], out=backward)
+    np.subtract(u[..., 2:], u[..., 1:-1], out=forward)
+    np.sign(backward, out=sign)
+    np.abs(backward, out=backward)
+    np.sign(forward, out=ws.flux_right[..., :-1])
+    np.add(sign, ws.flux_right[..., :-1], out=sign)
+    np.abs(forward, out=forward)
+    np.minimum(backward, forward, out=forward)
+    np.multiply(0.5, forward, out=forward)
+    np.multiply(sign, forward, out=forward)
+
+    # Reconstructed states on both sides of every interface
+    left, right = ws.left, ws.right
+    np.multiply(0.5, ws.slope[..., :-1], out=left)
+    np.add(u[..., :-1], left, out=left)
+    np.multiply(0.5, ws.slope[..., 1:], out=right)
+    np.subtract(u[..., 1:], right, out=right)
+
+    # HLL flux with the wave speed estimates s_L = min(lambda_1), s_R = max(lambda_2) clipped at zero,
+    # which is the upwind flux when all waves move in one direction
+    slow_left, fast_left, slow_right, fast_right = ws.speed
+    _interface_speeds(vm, rm, left, ws.flux_left, slow_left, fast_left)
+    _interface_speeds(vm, rm, right, ws.flux_right, slow_right, fast_right)
+    s_left = np.minimum(slow_left, slow_right, out=slow_left)
+    np.minimum(s_left, 0, out=s_left)
+    s_right = np.maximum(fast_left, fast_right, out=fast_left)
+    np.maximum(s_right, 0, out=s_right)
+    # F = (s_R F_L - s_L F_R + s_L s_R (U_R - U_L)) / (s_R - s_L)
+    flux = ws.flux_left
+    np.subtract(right, left, out=right)
+    np.multiply(s_left, right, out=right)
+    np.multiply(s_right, right, out=right)
+    np.multiply(s_right, flux, out=flux)
+    np.add(flux, right, out=flux)
+    np.multiply(s_left, ws.flux_right, out=ws.flux_right)
+    np.subtract(flux, ws.flux_right, out=flux)
+    width = np.subtract(s_right, s_left, out=slow_right)
+    np.maximum(width, np.finfo(float).tiny, out=width)
+    np.divide(flux, width, out=flux)
+
+    # Conservative update with the relaxation source -y/tau
+    inner = ws.tmp[..., :-1]
+    np.subtract(flux[..., 1:], flux[..., :-1], out=inner)
+    np.multiply(dt / dx, inner, out=inner)
+    relax = left[0, ..., :-1]
+    np.multiply(dt / tau, u[1, ..., 1:M-1], out=relax)
+    np.add(inner[1], relax, out=inner[1])
+    np.subtract(u[..., 1:M-1], inner, out=u[..., 1:M-1])
+
+
+def muscl_step(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, ws):
+    r"""
+    muscl_step
+
+    Advances the ARZ state by one timestep of a second order finite volume scheme, updating ``r`` and ``y`` in place. The states at the cell interfaces are reconstructed with minmod limited slopes (MUSCL), the interface fluxes are HLL fluxes with the characteristic speeds :math:`v + \rho V'(\rho)` and :math:`v`, and the timestep is integrated with the two stage strong stability preserving Runge-Kutta method. Unlike :func:`lax_wendroff_step` the scheme does not oscillate near shocks. The boundary cells are set from the inlet and outlet fluxes before each stage.
+
+    :param r: Density of shape ``(..., M)``.
+    :param y: Auxiliary variable :math:`y = \rho (v - V(\rho))` of shape ``(..., M)``.
+    :param q_inlet: Traffic flux imposed at the inlet. Scalar or array of the batch shape.
+    :param q_outlet: Traffic flux imposed at the outlet. Scalar or array of the batch shape.
+    :param ws: A :class:`MUSCLWorkspace` matching the shape of ``r``.
+    """
+    u = ws.state
+    apply_flux_boundary(r, y, q_inlet, q_outlet, vm, rm)
+    u[0] = r
+    u[1] = y
+    np.copyto(ws.start, u)
+    _muscl_stage(u, dt, dx, vm, rm, tau, ws)
+    apply_flux_boundary(u[0], u[1], q_inlet, q_outlet, vm, rm)
+    _muscl_stage(u, dt, dx, vm, rm, tau, ws)
+    # Average of the start state and the two stage result
+    np.add(u, ws.start, out=u)
+    np.multiply(0.5, u[0], out=r)
+    np.multiply(0.5, u[1], out=y)
+
+
+def split_relaxation_step(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, ws, step=lax_wendroff_step):
+    r"""
+    split_relaxation_step
+
+    Advances the ARZ state by one timestep with the relaxation source :math:`-y/\tau` split from the transport (Strang splitting). The source is integrated exactly by scaling :math:`y` in the interior cells with :math:`e^{-dt/(2\tau)}` before and after a timestep of ``step`` without the source. Unlike the explicit source of the schemes, the split source is stable for any :math:`dt/\tau`, so the timestep is only limited by the characteristic speeds.
+
+    :param step: The transport scheme, :func:`lax_wendroff_step`, :func:`ctm_step` or :func:`muscl_step` with the matching workspace ``ws``.
+    """
+    M = r.shape[-1]
+    decay = np.exp(-0.5 * dt / tau)
+    np.multiply(decay, y[..., 1:M-1], out=y[..., 1:M-1])
+    step(r, y, q_inlet, q_outlet, dt, dx, vm, rm, np.inf, ws)
+    np.multiply(decay, y[..., 1:M-1], out=y[..., 1:M-1])
+
+
+def max_characteristic_speed(r, y, vm, rm, ws):
+    r"""
+    max_characteristic_speed
+
+    Returns the largest absolute characteristic speed :math:`\max(|v|, |v + \rho V'(\rho)|)` of the ARZ system over the cells, with :math:`v = y/\rho + V(\rho)` and :math:`V'(\rho) = -v_m/\rho_m`. The result has the batch shape of ``r``. The cell sized buffers of ``ws`` are used as scratch.
+    """
+    v, speed = ws.flux_r, ws.flux_y
+    # v = y/rho + Veq
+    np.divide(r, rm, out=ws.veq)
+    np.subtract(1, ws.veq, out=ws.veq)
+    np.multiply(vm, ws.veq, out=ws.veq)
+    np.divide(y, r, out=v)
+    np.add(v, ws.veq, out=v)
+    # v + rho * Veq'(rho) = v - rho * vm/rm
+    np.multiply(vm / rm, r, out=speed)
+    np.subtract(v, speed, out=speed)
+    np.abs(speed, out=speed)
+    np.abs(v, out=v)
+    np.maximum(v, speed, out=speed)
+    return speed.max(axis=-1)
+
+
+def adaptive_substeps(r, y, q_inlet, q_outlet, period, cfl, dx, vm, rm, tau, ws, step=lax_wendroff_step, max_dt=np.inf):
+    r"""
+    adaptive_substeps
+
+    Advances the ARZ state by exactly ``period`` seconds with the scheme ``step``. Every substep takes the largest timestep :math:`dt = \text{cfl}\, dx / s_{max}` allowed by the current maximum characteristic speed :math:`s_{max}`, and the last substep is shortened to end on the period. In the batched case the substeps are shared by all instances and limited by the fastest one.
+
+    :param period: The time to advance.
+    :param cfl: The CFL number of every substep.
+    :param step: The scheme of a substep, e.g. :func:`lax_wendroff_step` or :func:`muscl_step` with the matching workspace ``ws``.
+    :param max_dt: Upper bound of the substep timestep, e.g. :math:`\tau` for schemes with an explicit relaxation source.
+    :return: The number of substeps.
+    """
+    substeps = 0
+    remaining = period
+    while remaining > 1e-12 * period:
+        speed = np.max(max_characteristic_speed(r, y, vm, rm, ws))
+        dt = min(remaining if speed == 0 else cfl * dx / speed, remaining, max_dt)
+        step(r, y, q_inlet, q_outlet, dt, dx, vm, rm, tau, ws)
+        remaining -= dt
+        substeps += 1
+    return substeps
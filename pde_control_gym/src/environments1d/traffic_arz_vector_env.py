@@ -0,0 +1,267 @@
+import functools
+import numpy as np
+import gymnasium as gym
+from gymnasium import spaces
+from gymnasium.vector import VectorEnv, AutoresetMode
+from gymnasium.vector.utils import batch_space
+from typing import Optional, Type
+from pde_control_gym.src.environments1d.traffic_arz_env import TrafficPDE1D
+from pde_control_gym.src.environments1d.traffic_arz_solver import ARZWorkspace, MUSCLWorkspace, lax_wendroff_step, ctm_step, muscl_step, split_relaxation_step, adaptive_substeps
+from pde_control_gym.src.rewards import BaseReward
+
+class TrafficPDE1DVector(VectorEnv):
+    r"""
+    Batched Traffic ARZ PDE
+
+    This class simulates ``num_envs`` independent freeways of the :class:`TrafficPDE1D` environment in a single process. The densities ``r`` and auxiliary variables ``y`` of all instances are held as ``(num_envs, M)`` arrays and the update of the chosen scheme is applied to every instance in one vectorized pass. Each sub-environment follows exactly the dynamics, rewards, termination and truncation rules of :class:`TrafficPDE1D`. Sub-environments are reset automatically on the ``step`` call following the end of their episode (gymnasium's next-step autoreset).
+
+    The environment can be created with ``gym.make_vec("PDEControlGym-TrafficPDE1D", num_envs=B, **Parameters)``. All arguments except ``num_envs`` are identical to :class:`TrafficPDE1D`.
+
+    :param num_envs: Number of freeway instances simulated in the batch.
+    :param T: The end time of the simulation.
+    :param dt: The temporal timestep of the simulation.
+    :param X: The spatial length of the simulation.
+    :param dx: The spatial timestep of the simulation.
+    :param reward_class: An instance of the reward class to specify user reward for each simulation step. Must inherit BaseReward class. The reward is evaluated separately for each instance.
+    :param simulation_type: Defines the type of boundary control. Inputs 'inlet', 'outlet' and 'both' represents boundary control at inlet, outlet and both respectively. 'inlet-train' and 'outlet-train' control the same boundary as 'inlet' and 'outlet', 'outlet-train' with a steady state resampled at every reset. 'inlet-train' controls the inlet with the outlet held at the steady flux, which earlier versions did not simulate.
+    :param v_max: Maximum permissible velocity (meters/second) on freeway under simulation
+    :param ro_max: Maximum permissible density (vehicles/meter) on freeway under simulation
+    :param v_steady: Desired steady state velocity (meters/second).
+    :param ro_steady: Desired steady state density (vehicles/meter).
+    :param tau: Relaxation time (seconds) required by the driver to adjust to the new velocity
+    :param limit_pde_state_size: This is a boolean which will terminate the episode early if the observation velocity or density is greater than v_max and ro_max respectively
+    :param control_freq: Number of PDE simulation steps performed using same action per environment step() call
+    :param cfl: Enables adaptive substeps, see :class:`TrafficPDE1D`. The substeps are shared by the batch, so their timestep is limited by the fastest instance.
+    :param scheme: The finite volume scheme of a PDE timestep, ``"lax-wendroff"``, ``"ctm"`` or ``"muscl"``, see :class:`TrafficPDE1D`.
+    :param relaxation: The treatment of the relaxation source, ``"explicit"`` or ``"exponential"``, see :class:`TrafficPDE1D`.
+    :param copy_observation: Whether ``step`` and ``reset`` return a copy of the ``(num_envs, 2M)`` observation buffer, see :class:`TrafficPDE1D`.
+    """
+    metadata = {"autoreset_mode": AutoresetMode.NEXT_STEP}
+
+    def __init__(self,
+                 num_envs: int,
+                 T: float,
+                 dt: float,
+                 X: float,
+                 dx: float,
+                 reward_class: Type[BaseReward],
+                 simulation_type: str = 'inlet',
+                 v_steady: float = 10,
+                 ro_steady: float = 0.12,
+                 v_max: float = 40,
+                 ro_max: float = 0.16,
+                 tau: float = 60,
+                 limit_pde_state_size: bool = False,
+                 control_freq: int = 1,
+                 cfl: Optional[float] = None,
+                 scheme: str = "lax-wendroff",
+                 relaxation: str = "explicit",
+                 copy_observation: bool = True,
+                 normalize: bool = False):
+        super().__init__()
+        self.num_envs = num_envs
+        self.T = T
+        self.dt = dt
+        self.X = X
+        self.dx = dx
+        self.reward_class = reward_class
+
+        self.simulation_type = simulation_type
+        self.vm = v_max
+        self.rm = ro_max
+        self.qm = v_max * ro_max/4
+        self.tau = tau
+        self.limit_pde_state_size = limit_pde_state_size
+
+        assert(isinstance(control_freq, int) and control_freq >= 1) , f"control_freq must be a positive integer (got {control_freq} of type {type(control_freq).__name__})"
+        self.control_freq = control_freq
+        if cfl is not None and not cfl > 0:
+            raise ValueError('Invalid cfl. Please use a positive CFL number or None for the fixed timestep.')
+        self.cfl = cfl
+        if scheme not in ("lax-wendroff", "ctm", "muscl"):
+            raise ValueError('Invalid scheme. Please use "lax-wendroff", "ctm" or "muscl".')
+        self.scheme = scheme
+        self.workspace_class, self.scheme_step = {
+            "lax-wendroff": (ARZWorkspace, lax_wendroff_step),
+            "ctm": (ARZWorkspace, ctm_step),
+            "muscl": (MUSCLWorkspace, muscl_step),
+        }[scheme]
+        if relaxation not in ("explicit", "exponential"):
+            raise ValueError('Invalid relaxation. Please use "explicit" or "exponential".')
+        self.relaxation = relaxation
+        if relaxation == "exponential":
+            self.scheme_step = functools.partial(split_relaxation_step, step=self.scheme_step)
+
+        if self.simulation_type not in ('outlet', 'inlet', 'both', 'inlet-train', 'outlet-train'):
+            raise ValueError('Invalid simulation type')
+
+        if self.simulation_type == 'inlet' or self.simulation_type == 'outlet' or self.simulation_type == 'both':
+            if v_steady != TrafficPDE1D.Veq(v_max, ro_max, ro_steady):
+                raise ValueError('The steady state velocity and density do not satisfy the equilibrium condition. Check the values of v_steady and ro_steady and ensure that they obey v_steady = v_max(1 - ro_steady/v_max).')
+            self.rs = np.full(self.num_envs, ro_steady, dtype=np.float64)
+        else:
+            self.rs = self._sample_steady_density(self.num_envs)
+        self.vs = TrafficPDE1D.Veq(self.vm, self.rm, self.rs)
+        self.qs = self.rs * self.vs
+
+        self.x = np.arange(0, self.X+self.dx, self.dx)
+        self.L = self.X
+        self.M = len(self.x)
+        self.r = np.zeros((self.num_envs, self.M))
+        self.y = np.zeros((self.num_envs, self.M))
+        self.v = np.zeros((self.num_envs, self.M))
+        self._veq = np.zeros((self.num_envs, self.M))
+        # Observation buffer, the density and velocity parts are written through views
+        self.copy_observation = copy_observation
+        self._obs = np.zeros((self.num_envs, 2 * self.M))
+        self._obs_r, self._obs_v = self._obs[:, :self.M], self._obs[:, self.M:]
+        self.time_index = np.zeros(self.num_envs)
+        # Scratch buffers reused by every PDE timestep
+        self.workspace = self.workspace_class((self.num_envs, self.M))
+
+        # Spaces of a single freeway follow TrafficPDE1D. Action bounds are fixed per instance at construction.
+        if self.simulation_type == 'outlet-train':
+            self.single_observation_space = spaces.Box(low=-10, high=10, shape=(2 * self.M,), dtype=np.float64)
+        else:
+            self.single_observation_space = spaces.Box(low=0, high=40, shape=(2 * self.M,), dtype=np.float64)
+        n_actions = 2 if self.simulation_type == 'both' else 1
+        self.single_action_space = spaces.Box(dtype=np.float64, low=self.qs[0] * 0.8, high=1.2 * self.qs[0], shape=(n_actions,))
+        self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+        self.action_space = batch_space(self.single_action_space, self.num_envs)
+        self.action_low = np.repeat(0.8 * self.qs[:, None], n_actions, axis=1)
+        self.action_high = np.repeat(1.2 * self.qs[:, None], n_actions, axis=1)
+
+        self._autoreset_envs = np.zeros(self.num_envs, dtype=np.bool_)
+        self._reset_instances(np.ones(self.num_envs, dtype=np.bool_), resample=False)
+
+    def _sample_steady_density(self, n: int):
+        rs_values = np.array([0.115, 0.12, 0.125])
+        return rs_values[self.np_random.integers(0, 3, size=n)]
+
+    def _reset_instances(self, mask: np.ndarray, resample: bool = True):
+        """
+        _reset_instances
+
+        Resets the freeways selected by the boolean ``mask`` to the initial condition of :class:`TrafficPDE1D`.
+        """
+        #Stochastic reset of environment during training
+        if resample and self.simulation_type == 'outlet-train':
+            self.rs[mask] = self._sample_steady_density(int(np.count_nonzero(mask)))
+            self.vs[mask] = TrafficPDE1D.Veq(self.vm, self.rm, self.rs[mask])
+            self.qs[mask] = self.rs[mask] * self.vs[mask]
+
+        #Initial condition of the PDE
+        profile = np.sin(3 * self.x / self.L * np.pi) * 0.1 + 1
+        r = self.rs[mask, None] * profile
+        self.r[mask] = r
+        self.y[mask] = self.qs[mask, None] - self.vm * r + self.vm / self.rm * r**2
+        self.v[mask] = self.y[mask]/self.r[mask] + TrafficPDE1D.Veq(self.vm, self.rm, self.r[mask])
+        self.time_index[mask] = 0
+
+    def _observations(self):
+        if self.simulation_type == 'outlet-train':
+            rs, vs = self.rs[:, None], self.vs[:, None]
+            np.subtract(self.r, rs, out=self._obs_r)
+            np.divide(self._obs_r, rs, out=self._obs_r)
+            np.subtract(self.v, vs, out=self._obs_v)
+            np.divide(self._obs_v, vs, out=self._obs_v)
+        else:
+            np.copyto(self._obs_r, self.r)
+            np.copyto(self._obs_v, self.v)
+        return self._obs.copy() if self.copy_observation else self._obs
+
+    def step(self, actions):
+        """
+        step
+
+        Advances every freeway that did not end its episode on the previous call by one control period. Freeways whose episode ended on the previous call are reset instead and return their initial observation with zero reward.
+
+        :param actions: The control inputs of shape ``(num_envs, 1)`` or ``(num_envs, 2)`` for ``simulation_type='both'``.
+        :return: A tuple of batched observations, rewards, terminations, truncations and an info dict. The info holds the ``"substeps"`` and ``"dt_effective"`` of every freeway as ``(num_envs,)`` arrays, which are zero for freeways that were reset or did not advance.
+        """
+        actions = np.asarray(actions, dtype=np.float64).reshape(self.num_envs, -1)
+        actions = np.clip(actions, self.action_low, self.action_high)
+        resetting = self._autoreset_envs
+        stepping = ~resetting
+
+        self.time_index[stepping] += self.dt
+
+        # Inlet and outlet fluxes for every instance
+        if self.simulation_type == 'inlet' or self.simulation_type == 'inlet-train':
+            q_inlet, q_outlet = actions[:, 0], self.qs
+        elif self.simulation_type == 'both':
+            q_inlet, q_outlet = actions[:, 0], actions[:, 1]
+        else:
+            q_inlet, q_outlet = self.qs, actions[:, 0]
+
+        # The time index only changes between calls so an instance either runs all control_freq updates or none
+        active = stepping & (self.time_index < self.T)
+        substeps = np.zeros(self.num_envs, dtype=np.int64)
+        if np.all(active):
+            substeps[:] = self._substeps(self.r, self.y, q_inlet, q_outlet, self.workspace)
+        elif np.any(active):
+            # The active instances are gathered and advanced with views of the first rows of the workspace
+            r, y = self.r[active], self.y[active]
+            substeps[active] = self._substeps(r, y, q_inlet[active], q_outlet[active], self.workspace.rows(r.shape[0]))
+            self.r[active], self.y[active] = r, y
+
+        # Calculate Velocity
+        # v = y/r + Veq(r) evaluated in place
+        veq = self._veq
+        np.divide(self.r, self.rm, out=veq)
+        np.subtract(1, veq, out=veq)
+        np.multiply(self.vm, veq, out=veq)
+        np.divide(self.y, self.r, out=self.v)
+        np.add(self.v, veq, out=self.v)
+
+        rewards = np.zeros(self.num_envs)
+        terminations = np.zeros(self.num_envs, dtype=np.bool_)
+        truncations = np.zeros(self.num_envs, dtype=np.bool_)
+        for i in np.flatnonzero(stepping):
+            rewards[i] = self.reward_class.reward(self.vs[i], self.rs[i], self.v[i], self.r[i])
+        terminated = self.time_index >= self.T / self.dt
+        if self.simulation_type == 'outlet-train':
+            terminations[stepping] = terminated[stepping]
+        else:
+            terminations[stepping] = terminated[stepping] | (rewards[stepping] > -0.00023)
+        truncations[stepping] = self._truncate()[stepping]
+
+        if np.any(resetting):
+            self._reset_instances(resetting)
+
+        self._autoreset_envs = terminations | truncations
+        dt_effective = np.zeros(self.num_envs)
+        np.divide(self.control_freq * self.dt, substeps, out=dt_effective, where=substeps > 0)
+        info = {"substeps": substeps, "dt_effective": dt_effective}
+        return self._observations(), rewards, terminations, truncations, info
+
+    def _substeps(self, r, y, q_inlet, q_outlet, workspace):
+        # Advances the selected instances by one control period and returns the number of PDE timesteps
+        if self.cfl is not None:
+            return adaptive_substeps(r, y, q_inlet, q_outlet, self.control_freq * self.dt, self.cfl, self.dx, self.vm, self.rm, self.tau, workspace, self.scheme_step, np.inf if self.relaxation == "exponential" else self.tau)
+        for _ in range(self.control_freq):
+            self.scheme_step(r, y, q_inlet, q_outlet, self.dt, self.dx, self.vm, self.rm, self.tau, workspace)
+        return self.control_freq
+
+    def _truncate(self):
+        exceeded = np.any(self.v > self.vm, axis=1) | np.any(self.r > self.rm, axis=1)
+        steady = np.all(self.r - self.rs[:, None] == 0, axis=1) & np.all(self.v - self.vs[:, None] == 0, axis=1)
+        if self.limit_pde_state_size:
+            return exceeded | steady
+        return steady
+
+    def reset(self, seed: Optional[int]=None, options: Optional[dict]=None):
+        """
+        Resets all freeways, or only the freeways selected by ``options["reset_mask"]``, and returns the batched observations and info.
+
+        :param seed: Optional seed for reproducibility of the stochastic steady states of ``'outlet-train'``.
+        :param options: Optional dictionary. The key ``"reset_mask"`` accepts a boolean array of shape ``(num_envs,)`` selecting the instances to reset.
+        :return: A tuple of (observations, info).
+        """
+        super().reset(seed=seed)
+        mask = np.ones(self.num_envs, dtype=np.bool_)
+        if options is not None and "reset_mask" in options:
+            mask = np.asarray(options["reset_mask"], dtype=np.bool_)
+        self._reset_instances(mask)
+        self._autoreset_envs[mask] = False
+        return self._observations(), {}
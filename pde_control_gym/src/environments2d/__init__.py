@@ -1,3 +1,5 @@
 from pde_control_gym.src.environments2d.navier_stokes2D import NavierStokes2D
+from pde_control_gym.src.environments2d.navier_stokes2D_vector_env import NavierStokes2DVector
+from pde_control_gym.src.environments2d.reference_trajectory import ReferenceTrajectory
 
-__all__ = ["NavierStokes2D"]
+__all__ = ["NavierStokes2D", "NavierStokes2DVector", "ReferenceTrajectory"]
@@ -3,7 +3,7 @@ from gymnasium import spaces
 import numpy as np
 import matplotlib.pyplot as plt
 from abc import abstractmethod
-from typing import Type
+from typing import Optional, Type
 from pde_control_gym.src.rewards import BaseReward
 
 
@@ -20,8 +20,11 @@ class PDEEnv2D(gym.Env):
     :param action_dim: the dimension of the action space
     :param reward_class: An instance of the reward class to specify user reward for each simulation step. Must inherit BaseReward class. See `reward documentation <../../utils/rewards.html>`_ for detials.
     :param normalize: Chooses whether to take action inputs between -1 and 1 and normalize them to betwen (``-max_control_value``, ``max_control_value``) or to leave inputs unaltered. ``max_control_value`` is environment specific so please see the environment for details. 
+    :param history: Chooses how the solution is stored over an episode. ``"full"`` keeps every timestep, ``"rolling"`` keeps the last ``history_window`` timesteps, ``"decimated"`` keeps every ``history_stride``-th timestep and ``"none"`` only keeps the latest timestep. See :class:`StateHistory` for details.
+    :param history_window: Number of timesteps kept by the ``"rolling"`` history.
+    :param history_stride: Timesteps between two stored states of the ``"decimated"`` history.
     """
-    def __init__(self, T: float, dt: float, X: float, dx: float, Y: float, dy: float, action_dim: int, reward_class: Type[BaseReward], normalize: bool = False):
+    def __init__(self, T: float, dt: float, X: float, dx: float, Y: float, dy: float, action_dim: int, reward_class: Type[BaseReward], normalize: bool = False, history: str = "full", history_window: Optional[int] = None, history_stride: int = 1):
         super(PDEEnv2D, self).__init__()
         # Build parameters for number of time steps and number of spatial steps
         self.nt = int(round(T / dt))
@@ -46,8 +49,10 @@ class PDEEnv2D(gym.Env):
             self.normalize = lambda action, max_value : (action + 1)*max_value - max_value
         else:
             self.normalize = lambda action, max_value : action
-        # Holds entire system state. Modified with ghost points for parabolic PDE
-        self.U = np.zeros((self.nt, self.nx, self.ny, 2))
+        # Storage policy of the system state. The environments create the StateHistory since they know the shape of the state
+        self.history = history
+        self.history_window = history_window
+        self.history_stride = history_stride
         self.time_index = 0
 
         # Setup reward function. 
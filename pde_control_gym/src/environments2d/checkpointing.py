@@ -0,0 +1,56 @@
+import math
+from typing import Any, Callable
+
+
+def binomial_steps(snapshots: int, repetitions: int) -> int:
+    r"""
+    binomial_steps
+
+    Returns the largest number of steps :math:`\binom{s+t}{s}` that can be reversed with ``snapshots`` stored states when every step is advanced at most ``repetitions`` times, see Griewank and Walther, Algorithm 799: revolve, ACM TOMS 26 (2000).
+    """
+    return math.comb(snapshots + repetitions, snapshots)
+
+
+def reverse_with_checkpoints(state: Any, n_steps: int, snapshots: int, advance: Callable[[Any, int], Any], backward: Callable[[Any, int], None]) -> int:
+    r"""
+    reverse_with_checkpoints
+
+    Runs ``backward`` on the states of a trajectory in reverse order while only storing ``snapshots`` states besides ``state``. The other states are recomputed from the closest stored state with the binomial checkpointing schedule of revolve. With :math:`s` snapshots every step is advanced at most :math:`t` times, where :math:`t` is the smallest number with :math:`\binom{s+t}{s} \geq` ``n_steps``. Choosing :math:`s` of order :math:`\log` ``n_steps`` therefore bounds both the memory and the recomputation factor by :math:`O(\log` ``n_steps`` :math:`)`.
+
+    :param state: The state at step ``0``. It is not modified.
+    :param n_steps: The number of steps of the trajectory.
+    :param snapshots: The number of states that are stored at the same time besides ``state``.
+    :param advance: ``advance(state, k)`` returns the state at step ``k+1`` as a new object from the state at step ``k``.
+    :param backward: ``backward(state, k)`` is called with the state at step ``k`` for ``k = n_steps-1, ..., 0``.
+    :return: The number of calls of ``advance``.
+    """
+    calls = 0
+
+    def forward(current, start, stop):
+        nonlocal calls
+        for k in range(start, stop):
+            current = advance(current, k)
+            calls += 1
+        return current
+
+    # Ranges still to be reversed with their start state, the last one is reversed first
+    pending = [(state, 0, n_steps, snapshots)] if n_steps > 0 else []
+    while pending:
+        current, start, stop, free = pending.pop()
+        n = stop - start
+        if n == 1:
+            backward(current, start)
+            continue
+        if free == 0:
+            # Without a free snapshot every step is recomputed from the start of the range
+            for k in range(stop - 1, start - 1, -1):
+                backward(forward(current, start, k), k)
+            continue
+        repetitions = 1
+        while binomial_steps(free, repetitions) < n:
+            repetitions += 1
+        # The first part is reversed with one repetition less since it is advanced once to reach the checkpoint
+        split = start + min(binomial_steps(free, repetitions - 1), n - 1)
+        pending.append((current, start, split, free))
+        pending.append((forward(current, start, split), split, stop, free - 1))
+    return calls
@@ -1,26 +1,295 @@
+import math
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
 from typing import Callable, Optional, Union
 
+from pde_control_gym.src.environments1d.state_history import StateHistory
 from pde_control_gym.src.environments2d.base_env_2d import PDEEnv2D
+from pde_control_gym.src.environments2d.checkpointing import reverse_with_checkpoints
+from pde_control_gym.src.environments2d.pressure_solvers import PressureSolver, make_pressure_solver
+from pde_control_gym.src.environments2d.reference_trajectory import ReferenceTrajectory
 
 
-def central_difference(f, coordinate, step=0.01):
-    diff = np.zeros_like(f)
+def _zero_border(f):
+    f[..., 0, :] = 0
+    f[..., -1, :] = 0
+    f[..., :, 0] = 0
+    f[..., :, -1] = 0
+
+def central_difference(f, coordinate, step=0.01, out=None):
+    """
+    Central difference of ``f`` along ``coordinate`` on the interior points. The boundary of the result is zero. If ``out`` is given the result is written to it instead of a new array.
+    """
+    if out is None:
+        diff = np.zeros_like(f)
+    else:
+        diff = out
+        _zero_border(diff)
+    inner = diff[..., 1:-1, 1:-1]
     if coordinate == "x":
-        diff[1:-1, 1:-1] = (f[1:-1, 2:] - f[1:-1, 0:-2]) / (2 * step)
+        np.subtract(f[..., 1:-1, 2:], f[..., 1:-1, 0:-2], out=inner)
     elif coordinate == "y":
-        diff[1:-1, 1:-1] = (f[2:, 1:-1] - f[0:-2, 1:-1]) / (2 * step)
+        np.subtract(f[..., 2:, 1:-1], f[..., 0:-2, 1:-1], out=inner)
+    np.divide(inner, 2 * step, out=inner)
     return diff
 
-def laplace(f, dx=0.01, dy=0.01):
-    diff = np.zeros_like(f)
-    diff[1:-1, 1:-1] = (
-        f[1:-1, 0:-2] + f[0:-2, 1:-1] - 4 * f[1:-1, 1:-1] + f[1:-1, 2:] + f[2:, 1:-1]
-    ) / (dx * dy)
+def laplace(f, dx=0.01, dy=0.01, out=None, work=None):
+    """
+    Five point Laplacian of ``f`` on the interior points. The boundary of the result is zero. If ``out`` is given the result is written to it instead of a new array and ``work`` can pass a scratch array of the same shape to avoid a temporary.
+    """
+    if out is None:
+        diff = np.zeros_like(f)
+    else:
+        diff = out
+        _zero_border(diff)
+    inner = diff[..., 1:-1, 1:-1]
+    center = np.empty_like(inner) if work is None else work[..., 1:-1, 1:-1]
+    np.multiply(4, f[..., 1:-1, 1:-1], out=center)
+    np.add(f[..., 1:-1, 0:-2], f[..., 0:-2, 1:-1], out=inner)
+    np.subtract(inner, center, out=inner)
+    np.add(inner, f[..., 1:-1, 2:], out=inner)
+    np.add(inner, f[..., 2:, 1:-1], out=inner)
+    np.divide(inner, dx * dy, out=inner)
+    return diff
+
+def central_difference_adjoint(g, coordinate, step=0.01):
+    """
+    Transpose of :func:`central_difference`. Returns the gradient with respect to ``f`` of the inner product of ``g`` with the central difference of ``f``, where only the interior points of ``g`` contribute.
+    """
+    diff = np.zeros_like(g)
+    inner = g[..., 1:-1, 1:-1] / (2 * step)
+    if coordinate == "x":
+        diff[..., 1:-1, 2:] += inner
+        diff[..., 1:-1, 0:-2] -= inner
+    elif coordinate == "y":
+        diff[..., 2:, 1:-1] += inner
+        diff[..., 0:-2, 1:-1] -= inner
     return diff
 
+def laplace_adjoint(g, dx=0.01, dy=0.01):
+    """
+    Transpose of :func:`laplace`. Returns the gradient with respect to ``f`` of the inner product of ``g`` with the Laplacian of ``f``, where only the interior points of ``g`` contribute.
+    """
+    diff = np.zeros_like(g)
+    inner = g[..., 1:-1, 1:-1] / (dx * dy)
+    diff[..., 1:-1, 0:-2] += inner
+    diff[..., 0:-2, 1:-1] += inner
+    diff[..., 1:-1, 1:-1] -= 4 * inner
+    diff[..., 1:-1, 2:] += inner
+    diff[..., 2:, 1:-1] += inner
+    return diff
+
+class NavierStokesWorkspace:
+    """
+    NavierStokesWorkspace
+
+    Preallocated buffers for a step of :class:`NavierStokes2D`. A workspace is created once by the environment for the shape of its fields and reused on every step so that no temporaries are allocated inside the step.
+
+    :param shape: Shape of the velocity and pressure fields. The last two axes are the grid and any leading axes are batch axes.
+    :param dtype: Data type of the fields.
+    """
+    def __init__(self, shape, dtype=np.float64):
+        shape = tuple(shape)
+        self.shape = shape
+        # Two velocity buffers per component, alternating between the previous and the next step
+        self.u = (np.zeros(shape, dtype=dtype), np.zeros(shape, dtype=dtype))
+        self.v = (np.zeros(shape, dtype=dtype), np.zeros(shape, dtype=dtype))
+        self.p = np.zeros(shape, dtype=dtype)
+        self.current = 0
+        # Stencil results, their borders stay zero
+        self.dudx = np.zeros(shape, dtype=dtype)
+        self.dudy = np.zeros(shape, dtype=dtype)
+        self.dvdx = np.zeros(shape, dtype=dtype)
+        self.dvdy = np.zeros(shape, dtype=dtype)
+        self.laplace_u = np.zeros(shape, dtype=dtype)
+        self.laplace_v = np.zeros(shape, dtype=dtype)
+        self.rhs = np.zeros(shape, dtype=dtype)
+        self.work = np.zeros(shape, dtype=dtype)
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in vars(self).values() if isinstance(buffer, np.ndarray)) + sum(buffer.nbytes for buffer in self.u + self.v)
+
+class BoundaryPlan:
+    """
+    BoundaryPlan
+
+    The ``boundary_condition`` of :class:`NavierStokes2D` compiled once into a list of writes. Every side is written with a basic slice of the grid instead of index arrays, in the order lower, upper, left, right, so a corner takes the condition of the last side and a Neumann side copies corner values already written by an earlier side. Opposite Dirichlet sides of a component are merged into a single strided write. The plan applies to fields with leading batch axes as well.
+
+    :param boundary_condition: dictionary recording that the top/bottom/left/right is at what condition: Neumann/Dirchilet/Controllable
+    :param ny: Number of grid points along the second to last axis.
+    :param nx: Number of grid points along the last axis.
+    """
+    ZERO, COPY, ACTION = 0, 1, 2
+
+    def __init__(self, boundary_condition: dict, ny: int, nx: int):
+        self.shape = (ny, nx)
+        # Boundary points of a side and their Neumann neighbors
+        sides = {
+            'lower': ((Ellipsis, 0, slice(None)), (Ellipsis, 1, slice(None))),
+            'upper': ((Ellipsis, -1, slice(None)), (Ellipsis, -2, slice(None))),
+            'left': ((Ellipsis, slice(None), 0), (Ellipsis, slice(None), 1)),
+            'right': ((Ellipsis, slice(None), -1), (Ellipsis, slice(None), -2)),
+        }
+        opposite = {
+            ('lower', 'upper'): (Ellipsis, slice(None, None, ny - 1), slice(None)),
+            ('left', 'right'): (Ellipsis, slice(None), slice(None, None, nx - 1)),
+        }
+        control_sizes = set()
+        self.writes = []
+        for i in range(2):
+            writes = []
+            for pos in ['lower', 'upper', 'left', 'right']:
+                target, neighbor = sides[pos]
+                match boundary_condition[pos][i]:
+                    case "Neumann":
+                        writes.append((pos, self.COPY, target, neighbor))
+                    case "Dirchilet":
+                        if writes and writes[-1][1] == self.ZERO and (writes[-1][0], pos) in opposite:
+                            writes[-1] = (None, self.ZERO, opposite[(writes[-1][0], pos)], None)
+                        else:
+                            writes.append((pos, self.ZERO, target, None))
+                    case "Controllable":
+                        writes.append((pos, self.ACTION, target, None))
+                        control_sizes.add(nx if pos in ('lower', 'upper') else ny)
+                    case _:
+                        raise Exception(
+                            "Invalid boundary_condition parameter. Please use 'Neumann', 'Dirchilet', or 'Controllable' for each side. See documentation for details."
+                        )
+            self.writes.append([write[1:] for write in writes])
+        # Actions with one entry per point of a side need all controllable sides to have the same length
+        self.control_size = control_sizes.pop() if len(control_sizes) == 1 else None
+
+    def apply(self, u: np.ndarray, v: np.ndarray, action: Union[float, np.ndarray]):
+        """
+        apply
+
+        Applies the boundary conditions to ``u`` and ``v`` in place. The last two axes of the fields are the grid and any leading axes are batch axes. ``action`` has one entry, which is applied to every controllable point, or one entry per point of the controllable side, with the leading axes of the fields in the batched case.
+        """
+        action = np.asarray(action)
+        if action.ndim > 0 and action.shape[-1] not in (1, self.control_size):
+            raise Exception(
+                "Invalid action. Please use one value or one value per point of the controllable boundary. See documentation for details."
+            )
+        for f, writes in zip((u, v), self.writes):
+            for kind, target, source in writes:
+                if kind == self.ZERO:
+                    f[target] = 0
+                elif kind == self.ACTION:
+                    f[target] = action
+                else:
+                    f[target] = f[source]
+        return u, v
+
+    def adjoint(self, gu: np.ndarray, gv: np.ndarray, action: Union[float, np.ndarray]) -> np.ndarray:
+        """
+        adjoint
+
+        Transpose of :meth:`apply`. ``gu`` and ``gv`` hold the gradient with respect to the fields after the boundary conditions and are overwritten in place with the gradient with respect to the fields before them. Returns the gradient with respect to ``action``, which has the shape of ``action``.
+        """
+        action = np.asarray(action)
+        per_point = action.ndim > 0 and action.shape[-1] != 1
+        grad = np.zeros(action.shape)
+        for g, writes in zip((gu, gv), self.writes):
+            # The writes are undone in reverse order
+            for kind, target, source in reversed(writes):
+                if kind == self.ACTION:
+                    if per_point:
+                        grad += g[target]
+                    else:
+                        grad += np.sum(g[target], axis=-1, keepdims=True).reshape(action.shape)
+                elif kind == self.COPY:
+                    g[source] += g[target]
+                g[target] = 0
+        return grad
+
+def _advect_diffuse(f, u, v, dfdx, dfdy, laplace_f, dt, viscosity, out):
+    # out = f + dt * (- u * dfdx - v * dfdy + viscosity * laplace_f). The stencil buffers are overwritten
+    np.multiply(u, dfdx, out=dfdx)
+    np.negative(dfdx, out=dfdx)
+    np.multiply(v, dfdy, out=dfdy)
+    np.subtract(dfdx, dfdy, out=dfdx)
+    np.multiply(viscosity, laplace_f, out=laplace_f)
+    np.add(dfdx, laplace_f, out=dfdx)
+    np.multiply(dt, dfdx, out=dfdx)
+    np.add(f, dfdx, out=out)
+
+def predictor_step(u, v, dx, dy, dt, viscosity, workspace):
+    """
+    predictor_step
+
+    Advances the velocity ``u``, ``v`` by the advection and diffusion terms. ``u`` and ``v`` must be the current velocity buffers of ``workspace`` and the prediction is written to the other pair of buffers, which are returned.
+    """
+    ws = workspace
+    ws.current = 1 - ws.current
+    u_pred, v_pred = ws.u[ws.current], ws.v[ws.current]
+    dudx = central_difference(u, "x", dx, out=ws.dudx)
+    dudy = central_difference(u, "y", dy, out=ws.dudy)
+    dvdx = central_difference(v, "x", dx, out=ws.dvdx)
+    dvdy = central_difference(v, "y", dy, out=ws.dvdy)
+    laplace_u = laplace(u, dx, dy, out=ws.laplace_u, work=ws.work)
+    laplace_v = laplace(v, dx, dy, out=ws.laplace_v, work=ws.work)
+    _advect_diffuse(u, u, v, dudx, dudy, laplace_u, dt, viscosity, u_pred)
+    _advect_diffuse(v, u, v, dvdx, dvdy, laplace_v, dt, viscosity, v_pred)
+    return u_pred, v_pred
+
+def pressure_step(u, v, p_prev, dx, dy, dt, density, pressure_solver, workspace):
+    """
+    pressure_step
+
+    Solves the pressure Poisson equation for the predicted velocity ``u``, ``v`` with ``pressure_solver``. The pressure is written to the pressure buffer of ``workspace``.
+    """
+    ws = workspace
+    dudx = central_difference(u, "x", dx, out=ws.dudx)
+    dvdy = central_difference(v, "y", dy, out=ws.dvdy)
+    # rhs = density / dt * (dudx + dvdy)
+    rhs = np.add(dudx, dvdy, out=ws.rhs)
+    np.multiply(density / dt, rhs, out=rhs)
+    return pressure_solver.solve(rhs, p_prev, dx, dy, out=ws.p)
+
+def corrector_step(u, v, p, dx, dy, dt, density, workspace):
+    """
+    corrector_step
+
+    Subtracts the pressure gradient from the predicted velocity ``u``, ``v`` in place.
+    """
+    ws = workspace
+    dpdx, dpdy = central_difference(p, "x", dx, out=ws.dudx), central_difference(p, "y", dy, out=ws.dudy)
+    # u = u - dt / density * dpdx
+    np.multiply(dt / density, dpdx, out=dpdx)
+    np.subtract(u, dpdx, out=u)
+    np.multiply(dt / density, dpdy, out=dpdy)
+    np.subtract(v, dpdy, out=v)
+    return u, v
+
+def predictor_adjoint(u, v, gu, gv, dx, dy, dt, viscosity):
+    """
+    predictor_adjoint
+
+    Transpose of the linearization of :func:`predictor_step` at the velocity ``u``, ``v``. Maps the gradient ``gu``, ``gv`` with respect to the prediction to the gradient with respect to ``u``, ``v``.
+    """
+    dudx, dudy = central_difference(u, "x", dx), central_difference(u, "y", dy)
+    dvdx, dvdy = central_difference(v, "x", dx), central_difference(v, "y", dy)
+    gu_prev = gu + dt * (- dudx * gu - central_difference_adjoint(u * gu, "x", dx) - central_difference_adjoint(v * gu, "y", dy)
+                         + viscosity * laplace_adjoint(gu, dx, dy) - dvdx * gv)
+    gv_prev = gv + dt * (- dudy * gu - central_difference_adjoint(u * gv, "x", dx) - central_difference_adjoint(v * gv, "y", dy)
+                         + viscosity * laplace_adjoint(gv, dx, dy) - dvdy * gv)
+    return gu_prev, gv_prev
+
+def projection_adjoint(gu, gv, gp, dx, dy, dt, density, pressure_solver):
+    """
+    projection_adjoint
+
+    Transpose of :func:`pressure_step` followed by :func:`corrector_step`. ``gu``, ``gv`` are the gradient with respect to the corrected velocity and ``gp`` the gradient with respect to the new pressure from later steps. Returns the gradient with respect to the predicted velocity and to the pressure of the previous step.
+    """
+    gp = gp - dt / density * (central_difference_adjoint(gu, "x", dx) + central_difference_adjoint(gv, "y", dy))
+    grad_rhs, gp_prev = pressure_solver.adjoint(gp, dx, dy)
+    grad_rhs *= density / dt
+    gu_pred = gu + central_difference_adjoint(grad_rhs, "x", dx)
+    gv_pred = gv + central_difference_adjoint(grad_rhs, "y", dy)
+    return gu_pred, gv_pred, gp_prev
+
 class NavierStokes2D(PDEEnv2D):
     """
     NavierStokes equations 2D
@@ -28,21 +297,27 @@ class NavierStokes2D(PDEEnv2D):
 
     :param reset_init_condition_func: Takes in a function used during the reset method for setting the initial PDE condition :math:`U(x, y, 0)=[u(x,y,0), v(x,y,0)]`.
     :param boundary_condition: dictionary recording that the top/bottom/left/right is at what condition: Neumann/Dirchilet/Controllable
-    :param U_ref: reference trajectory of PDEs
+    :param U_ref: reference trajectory of PDEs. Either an array, a :class:`ReferenceTrajectory` which is read lazily and shared between processes, or the path of an uncompressed ``.npy`` file which is memory mapped as a :class:`ReferenceTrajectory`.
     :param action_ref: reference actions of PDEs
     :param viscosity: kinematic viscosity value for the NavierStokes PDE
     :param dentisty: density value for pressure field in the NavierStokes PDE
     :param maximum_pressure_iteration:  the maximum iterations to solve for the pressure field  
     :param stable_factor: the stability factor for the stability of NavierStokes
+    :param pressure_tolerance: the relative residual at which the ``"multigrid"`` pressure solver stops
+    :param dtype: the data type of the velocity, pressure and stored solution. ``"float32"`` halves the memory and bandwidth of a step compared to ``"float64"``.
+    :param pressure_solver: the solver of the pressure Poisson equation. ``"jacobi"`` runs ``maximum_pressure_iteration`` Jacobi sweeps and ``"dct"`` solves the equation directly with a cosine transform, which requires scipy and falls back to ``"jacobi"`` with a warning if it is not installed. ``"multigrid"`` runs multigrid V-cycles warm started from the previous pressure until the relative residual is below ``pressure_tolerance``. The number of iterations and the relative residual of each solve are reported in the ``info`` of a step as ``"pressure_iterations"`` and ``"pressure_residual"``. An instance of :class:`PressureSolver` can be passed for custom solvers.
     """
     def __init__(self, reset_init_condition_func: Callable[[int], np.ndarray],
                  boundary_condition: dict,
-                 U_ref: np.ndarray, 
+                 U_ref: Union[np.ndarray, ReferenceTrajectory, str], 
                  action_ref: np.ndarray,
                  viscosity: float = 0.1,
                  density: float = 1.0, 
                  maximum_pressure_iteration: float = 2000,
                  stable_factor: float = 0.5,
+                 pressure_solver: Union[str, PressureSolver] = "jacobi",
+                 pressure_tolerance: float = 1e-6,
+                 dtype: str = "float64",
                  **kwargs
                 ):
         super().__init__(**kwargs)
@@ -51,19 +326,32 @@ class NavierStokes2D(PDEEnv2D):
         self.DENSITY = density
         self.N_PRESSURE_POISSON_ITERATIONS = maximum_pressure_iteration
         STABILITY_SAFETY_FACTOR = stable_factor
-        self.U_ref = U_ref
+        self.U_ref = ReferenceTrajectory(U_ref) if isinstance(U_ref, str) else U_ref
         self.action_ref = action_ref
         max_t = (0.5 * min(self.dx, self.dy)**2 / self.KINEMATIC_VISCOSITY)
         if self.dt > STABILITY_SAFETY_FACTOR * max_t:
             raise RuntimeError("Stability is not guarenteed")
         self.BoundaryControlInit(boundary_condition)
+        self.pressure_tolerance = pressure_tolerance
+        self.pressure_solver = self.PressureSolverInit(pressure_solver)
+        if dtype not in ("float32", "float64", np.float32, np.float64):
+            raise Exception(
+                "Invalid dtype parameter. Please use 'float32' or 'float64'. See documentation for details."
+            )
+        self.dtype = np.dtype(dtype)
+        # Buffers reused by every step. The velocity and pressure of the environment are views into them
+        self.workspace = NavierStokesWorkspace(self.X.shape, self.dtype)
+        # Holds the system state over the episode according to the history policy
+        self.U = StateHistory(self.nt, (self.nx, self.ny, 2), self.history, self.history_window, self.history_stride, self.dtype)
+
+    def PressureSolverInit(self, pressure_solver: Union[str, PressureSolver]):
+        # Setup the solver of the pressure Poisson equation
+        return make_pressure_solver(pressure_solver, self.N_PRESSURE_POISSON_ITERATIONS, self.pressure_tolerance)
     
     def BoundaryControlInit(self, boundary_condition: dict):
         # Setup configurations of boundary conditions
         self.boundary_condition = boundary_condition
-        xx, yy = np.arange(0, self.nx), np.arange(0, self.ny)
-        self.pos_idx = {'lower': (0, xx), 'upper':(-1, xx), 'left': (yy, 0), 'right': (yy, -1)}
-        self.pos_idx_neuman = {'lower': (1, xx), 'upper':(-2, xx), 'left': (yy, 1), 'right': (yy, -2)}
+        self.boundary_plan = BoundaryPlan(boundary_condition, self.ny, self.nx)
 
     def apply_boundary(self, u: np.ndarray, v: np.ndarray, action: Union[float, np.ndarray]):
         """
@@ -73,47 +361,18 @@ class NavierStokes2D(PDEEnv2D):
         :param v: :math:`v(x,y)`
         :param action: action performed by reinforcement learning
         """
-        for pos in ['lower', 'upper', 'left', 'right']:
-            for i in range(2): 
-                condition = self.boundary_condition[pos][i]
-                xidx, yidx = self.pos_idx[pos]
-                match condition:
-                    case "Neumann":
-                        xidx2, yidx2 = self.pos_idx_neuman[pos]
-                        if i == 0: u[xidx, yidx] = u[xidx2, yidx2]
-                        else: v[xidx, yidx] = v[xidx2, yidx2]
-                    case "Dirchilet":
-                        if i == 0: u[xidx, yidx] = 0
-                        else: v[xidx, yidx] = 0
-                    case "Controllable":
-                        if i == 0: u[xidx, yidx] = action
-                        else: v[xidx, yidx] = action
-        return u, v 
+        return self.boundary_plan.apply(u, v, action)
     
 
     def solve_pressure(self, u: np.ndarray, v: np.ndarray, p_prev: np.ndarray):
         """
         Solving pressure
 
-        Usinf an iterative approach to solve pressure
+        Solves the pressure Poisson equation with the ``pressure_solver`` of the environment
         """
-        dx, dy, dt = self.dx, self.dy, self.dt
-        dudx = central_difference(u,"x", dx)
-        dvdy = central_difference(v,"y", dy)
-        rhs = self.DENSITY / dt * (dudx + dvdy)
-        for _ in range(self.N_PRESSURE_POISSON_ITERATIONS):
-            p_next = p_prev.copy()
-            p_next[1:-1, 1:-1] = 1/4 * (p_prev[1:-1, 0:-2] + p_prev[0:-2, 1:-1] + p_prev[1:-1, 2:  ] + p_prev[2:  , 1:-1]
-                - dx * dy * rhs[1:-1, 1:-1]
-            )
-            # Neuman Condition for pressure
-            p_next[:, -1] = p_next[:, -2]
-            p_next[0,  :] = p_next[1,  :] 
-            p_next[:,  0] = p_next[:,  1]
-            p_next[-1, :] = p_next[-2, :]
-            p_prev = p_next
-        self.p = p_prev
-        return p_prev
+        p_next = pressure_step(u, v, p_prev, self.dx, self.dy, self.dt, self.DENSITY, self.pressure_solver, self.workspace)
+        self.p = p_next
+        return p_next
 
     def step(self, action:Union[float, np.ndarray]):
         """
@@ -123,39 +382,97 @@ class NavierStokes2D(PDEEnv2D):
 
         :param action: the control action to apply to the PDE at the boundary.
         """
-        dx = self.dx
-        dy = self.dy
-        dt = self.dt
-        u_prev, v_prev, p_prev = self.u, self.v, self.p
-        dudx = central_difference(u_prev, "x", dx)
-        dudy = central_difference(u_prev, "y", dy)
-        dvdx = central_difference(v_prev, "x", dx)
-        dvdy = central_difference(v_prev, "y", dy)
-        laplace_u_prev = laplace(u_prev, dx, dy)
-        laplace_v_prev = laplace(v_prev, dx, dy)
         # predictor step
-        u_pred = u_prev + dt * (- u_prev * dudx - v_prev * dudy + self.KINEMATIC_VISCOSITY * laplace_u_prev)
-        v_pred = v_prev + dt * (- u_prev * dvdx - v_prev * dvdy + self.KINEMATIC_VISCOSITY * laplace_v_prev)
+        u_pred, v_pred = predictor_step(self.u, self.v, self.dx, self.dy, self.dt, self.KINEMATIC_VISCOSITY, self.workspace)
         # apply boundary conditions
         u_pred, v_pred = self.apply_boundary(u_pred, v_pred, action)
         # solve for pressure
-        pressure = self.solve_pressure(u_pred, v_pred, p_prev)
-        dpdx, dpdy = central_difference(pressure, "x", dx), central_difference(pressure, "y", dy)
-        u_next = u_pred - dt / self.DENSITY * dpdx
-        v_next = v_pred - dt / self.DENSITY * dpdy
+        pressure = self.solve_pressure(u_pred, v_pred, self.p)
+        # corrector step
+        u_next, v_next = corrector_step(u_pred, v_pred, pressure, self.dx, self.dy, self.dt, self.DENSITY, self.workspace)
         u_next, v_next = self.apply_boundary(u_next, v_next, action)
         self.time_index += 1
-        self.U[self.time_index, :, :, 0] = u_next
-        self.U[self.time_index, :, :, 1] = v_next
+        state = self.U.next_row()
+        state[..., 0] = u_next
+        state[..., 1] = v_next
         terminate = self.terminate()
         reward = self.reward_class.reward(self.U, self.time_index, self.U_ref, action, self.action_ref)
         #- 1/2 * np.linalg.norm(self.U[self.time_index]-self.desired_U[self.time_index])**2/21/21 - 0.1/2 * np.linalg.norm(action - 2.)**2
         self.u, self.v = u_next, v_next
         obs = self.U[self.time_index]
         truncated = False
-        info = {}
+        info = {"pressure_iterations": self.pressure_solver.iterations, "pressure_residual": self.pressure_solver.residual}
         return obs, reward, terminate, truncated, info
     
+    def action_gradient(self, actions: np.ndarray, checkpoints: Optional[int] = None):
+        """
+        action_gradient
+
+        Returns the total reward of applying ``actions`` from the current state and its gradient with respect to every action. The gradient is computed with the discrete adjoint of the step, so it is the exact gradient of the simulated rewards for the ``"jacobi"`` and ``"dct"`` pressure solvers and exact up to the tolerance for ``"multigrid"``. The reward class must provide a ``gradient`` method like :class:`NSReward`. The forward trajectory is not stored. Only ``checkpoints`` states are kept and the others are recomputed with binomial checkpointing, see :func:`reverse_with_checkpoints`. The state, the history and the time index of the environment are not changed, only the statistics of the pressure solver.
+
+        :param actions: The control actions of the following timesteps, of shape ``(n,)`` or ``(n, action_dim)``.
+        :param checkpoints: The number of states stored at the same time. Defaults to :math:`\lceil \log_2 n \rceil`, which recomputes every step at most about :math:`\log_2 n` times.
+        :return: A tuple of the total reward and its gradient, which has the shape of ``actions``.
+        """
+        if not hasattr(self.reward_class, "gradient"):
+            raise Exception(
+                "Invalid reward_class for action_gradient. Please use a reward with a gradient method such as NSReward. See documentation for details."
+            )
+        actions = np.asarray(actions, dtype=np.float64)
+        n_steps = len(actions)
+        t0 = self.time_index
+        if t0 + n_steps > self.nt - 1:
+            raise Exception(
+                "Invalid actions parameter. Please pass at most nt - 1 - time_index actions. See documentation for details."
+            )
+        if checkpoints is None:
+            checkpoints = max(1, math.ceil(math.log2(max(n_steps, 2))))
+        # Recomputed steps use their own buffers so the state of the environment is kept
+        ws = NavierStokesWorkspace(self.X.shape, self.dtype)
+
+        def advance(state, k):
+            u, v, p = state
+            ws.current = 0
+            ws.u[0][...], ws.v[0][...], ws.p[...] = u, v, p
+            u_pred, v_pred = predictor_step(ws.u[0], ws.v[0], self.dx, self.dy, self.dt, self.KINEMATIC_VISCOSITY, ws)
+            u_pred, v_pred = self.boundary_plan.apply(u_pred, v_pred, actions[k])
+            p_next = pressure_step(u_pred, v_pred, ws.p, self.dx, self.dy, self.dt, self.DENSITY, self.pressure_solver, ws)
+            u_next, v_next = corrector_step(u_pred, v_pred, p_next, self.dx, self.dy, self.dt, self.DENSITY, ws)
+            u_next, v_next = self.boundary_plan.apply(u_next, v_next, actions[k])
+            return u_next.copy(), v_next.copy(), p_next.copy()
+
+        total_reward = 0.0
+        gradient = np.zeros_like(actions)
+        # Gradient of the rewards of the later timesteps with respect to the state
+        gu, gv, gp = np.zeros(self.X.shape), np.zeros(self.X.shape), np.zeros(self.X.shape)
+
+        def add_reward(state, k):
+            # Reward of action k, which is evaluated at timestep t0 + k + 1
+            nonlocal total_reward
+            u, v, _ = state
+            t = t0 + k + 1
+            reward, grad_state, grad_action = self.reward_class.gradient(np.stack((u, v), axis=-1), self.U_ref[t], actions[k], self.action_ref[t])
+            total_reward += reward
+            gu[...] += grad_state[..., 0]
+            gv[...] += grad_state[..., 1]
+            gradient[k] += grad_action
+
+        def backward(state, k):
+            nonlocal gu, gv, gp
+            if k == n_steps - 1:
+                add_reward(advance(state, k), k)
+            gradient[k] += self.boundary_plan.adjoint(gu, gv, actions[k])
+            gu, gv, gp = projection_adjoint(gu, gv, gp, self.dx, self.dy, self.dt, self.DENSITY, self.pressure_solver)
+            gradient[k] += self.boundary_plan.adjoint(gu, gv, actions[k])
+            u, v, _ = state
+            gu, gv = predictor_adjoint(u, v, gu, gv, self.dx, self.dy, self.dt, self.KINEMATIC_VISCOSITY)
+            # The state of step k is the result of action k-1
+            if k > 0:
+                add_reward(state, k - 1)
+
+        reverse_with_checkpoints((self.u.copy(), self.v.copy(), self.p.copy()), n_steps, checkpoints, advance, backward)
+        return total_reward, gradient
+
     def terminate(self):
         """
         terminate
@@ -183,12 +500,13 @@ class NavierStokes2D(PDEEnv2D):
             raise Exception(
                 "Please pass both an initial condition and a recirculation function in the parameters dictionary. See documentation for more details"
                 )
-        self.U = np.zeros((self.nt, self.nx, self.ny,  2))
         self.time_index = 0
-        self.u = init_u
-        self.v = init_v # np.random.uniform(-5, 5) * np.ones_like(self.X) 
-        self.p = init_p
-        self.U[0,:,:,0] = init_u
-        self.U[0,:,:,1] = init_v
+        ws = self.workspace
+        ws.current = 0
+        self.u, self.v, self.p = ws.u[0], ws.v[0], ws.p
+        self.u[...] = init_u
+        self.v[...] = init_v
+        self.p[...] = init_p
+        self.U.reset(np.stack((init_u, init_v), axis=-1))
         obs = self.U[self.time_index]
         return obs, {}
@@ -0,0 +1,196 @@
+import numpy as np
+from gymnasium import spaces
+from gymnasium.vector import VectorEnv, AutoresetMode
+from gymnasium.vector.utils import batch_space
+from typing import Callable, Optional, Type, Union
+from pde_control_gym.src.environments1d.state_history import StateHistory
+from pde_control_gym.src.environments2d.navier_stokes2D import BoundaryPlan, NavierStokesWorkspace, predictor_step, pressure_step, corrector_step
+from pde_control_gym.src.environments2d.pressure_solvers import PressureSolver, make_pressure_solver
+from pde_control_gym.src.environments2d.reference_trajectory import ReferenceTrajectory
+from pde_control_gym.src.rewards import BaseReward
+
+class NavierStokes2DVector(VectorEnv):
+    r"""
+    Batched NavierStokes equations 2D
+
+    This class simulates ``num_envs`` independent instances of the :class:`NavierStokes2D` environment in a single process. The velocity and pressure fields of all instances are held as ``(num_envs, ny, nx)`` arrays, and the predictor step, the boundary conditions, the pressure solve and the corrector step are applied to every instance in one vectorized pass. Each sub-environment follows exactly the dynamics, rewards and termination rule of :class:`NavierStokes2D` with its own action. Sub-environments are reset automatically on the ``step`` call following the end of their episode (gymnasium's next-step autoreset).
+
+    The environment can be created with ``gym.make_vec("PDEControlGym-NavierStokes2D", num_envs=B, **Parameters)``. All arguments except ``num_envs`` are identical to :class:`NavierStokes2D`. The ``pressure_solver`` solves the pressure of all instances at once, so iterative solvers run until every instance has converged.
+
+    :param num_envs: Number of instances simulated in the batch.
+    :param T: The end time of the simulation.
+    :param dt: The temporal timestep of the simulation.
+    :param X: The first dimension of spatial length of the simulation.
+    :param dx: The first dimension of spatial timestep of the simulation.
+    :param Y: The second dimension of spatial length of the simulation.
+    :param dy: The second dimension of spatial timestep of the simulation.
+    :param action_dim: the dimension of the action space
+    :param reward_class: An instance of the reward class to specify user reward for each simulation step. Must inherit BaseReward class. The reward is evaluated separately for each instance.
+    :param reset_init_condition_func: Takes in a function used during the reset method for setting the initial PDE condition :math:`U(x, y, 0)=[u(x,y,0), v(x,y,0)]`. It is called once for every instance that is reset.
+    :param boundary_condition: dictionary recording that the top/bottom/left/right is at what condition: Neumann/Dirchilet/Controllable
+    :param U_ref: reference trajectory of PDEs, see :class:`NavierStokes2D`.
+    :param action_ref: reference actions of PDEs
+    :param viscosity: kinematic viscosity value for the NavierStokes PDE
+    :param density: density value for pressure field in the NavierStokes PDE
+    :param maximum_pressure_iteration:  the maximum iterations to solve for the pressure field
+    :param stable_factor: the stability factor for the stability of NavierStokes
+    :param pressure_solver: the solver of the pressure Poisson equation, see :class:`NavierStokes2D`.
+    :param pressure_tolerance: the relative residual at which the ``"multigrid"`` pressure solver stops
+    :param dtype: the data type of the velocity, pressure and stored solution, see :class:`NavierStokes2D`.
+    :param history: Chooses how the solution of every instance is stored over an episode, see :class:`PDEEnv2D`.
+    :param history_window: Number of timesteps kept by the ``"rolling"`` history.
+    :param history_stride: Timesteps between two stored states of the ``"decimated"`` history.
+    """
+    metadata = {"autoreset_mode": AutoresetMode.NEXT_STEP}
+
+    def __init__(self,
+                 num_envs: int,
+                 T: float,
+                 dt: float,
+                 X: float,
+                 dx: float,
+                 Y: float,
+                 dy: float,
+                 action_dim: int,
+                 reward_class: Type[BaseReward],
+                 reset_init_condition_func: Callable[[int], np.ndarray],
+                 boundary_condition: dict,
+                 U_ref: Union[np.ndarray, ReferenceTrajectory, str],
+                 action_ref: np.ndarray,
+                 normalize: bool = False,
+                 viscosity: float = 0.1,
+                 density: float = 1.0,
+                 maximum_pressure_iteration: float = 2000,
+                 stable_factor: float = 0.5,
+                 pressure_solver: Union[str, PressureSolver] = "jacobi",
+                 pressure_tolerance: float = 1e-6,
+                 dtype: str = "float64",
+                 history: str = "full",
+                 history_window: Optional[int] = None,
+                 history_stride: int = 1):
+        super().__init__()
+        self.num_envs = num_envs
+        self.nt = int(round(T / dt))
+        self.nx = int(round(X / dx + 1))
+        self.ny = int(round(Y / dy + 1))
+        self.dx = dx
+        self.dy = dy
+        self.dt = dt
+        self.x = np.linspace(0, X, self.nx)
+        self.y = np.linspace(0, Y, self.ny)
+        self.X, self.Y = np.meshgrid(self.x, self.y)
+        self.reward_class = reward_class
+        self.reset_init_condition_func = reset_init_condition_func
+        self.KINEMATIC_VISCOSITY = viscosity
+        self.DENSITY = density
+        self.N_PRESSURE_POISSON_ITERATIONS = maximum_pressure_iteration
+        self.U_ref = ReferenceTrajectory(U_ref) if isinstance(U_ref, str) else U_ref
+        self.action_ref = action_ref
+        max_t = (0.5 * min(self.dx, self.dy)**2 / self.KINEMATIC_VISCOSITY)
+        if self.dt > stable_factor * max_t:
+            raise RuntimeError("Stability is not guarenteed")
+        self.boundary_condition = boundary_condition
+        self.boundary_plan = BoundaryPlan(boundary_condition, self.ny, self.nx)
+        self.pressure_tolerance = pressure_tolerance
+        self.pressure_solver = make_pressure_solver(pressure_solver, self.N_PRESSURE_POISSON_ITERATIONS, self.pressure_tolerance)
+
+        # Spaces of a single instance follow NavierStokes2D
+        self.single_observation_space = spaces.Box(
+                    np.full((self.nx, self.ny, 2), -np.inf, dtype="float32"),
+                    np.full((self.nx, self.ny, 2), np.inf,  dtype="float32"),
+                )
+        self.single_action_space = spaces.Box(low=-1.0, high=1.0, shape=(action_dim, ), dtype=np.float32)
+        self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+        self.action_space = batch_space(self.single_action_space, self.num_envs)
+
+        if dtype not in ("float32", "float64", np.float32, np.float64):
+            raise Exception(
+                "Invalid dtype parameter. Please use 'float32' or 'float64'. See documentation for details."
+            )
+        self.dtype = np.dtype(dtype)
+        # Holds the solution of every instance according to the history policy
+        self.U = [StateHistory(self.nt, (self.nx, self.ny, 2), history, history_window, history_stride, self.dtype) for _ in range(self.num_envs)]
+        self.time_index = np.zeros(self.num_envs, dtype=np.int64)
+        # Buffers reused by every step. The batched velocity and pressure are views into them
+        self.workspace = NavierStokesWorkspace((self.num_envs,) + self.X.shape, self.dtype)
+        self.u, self.v, self.p = self.workspace.u[0], self.workspace.v[0], self.workspace.p
+
+        self._autoreset_envs = np.zeros(self.num_envs, dtype=np.bool_)
+        self._reset_instances(np.ones(self.num_envs, dtype=np.bool_))
+
+    def _reset_instances(self, mask: np.ndarray):
+        """
+        _reset_instances
+
+        Resets the instances selected by the boolean ``mask`` to the initial condition of :class:`NavierStokes2D`.
+        """
+        for i in np.flatnonzero(mask):
+            try:
+                init_u, init_v, init_p = self.reset_init_condition_func(self.X)
+            except:
+                raise Exception(
+                    "Please pass both an initial condition and a recirculation function in the parameters dictionary. See documentation for more details"
+                    )
+            self.u[i] = init_u
+            self.v[i] = init_v
+            self.p[i] = init_p
+            self.U[i].reset(np.stack((init_u, init_v), axis=-1))
+        self.time_index[mask] = 0
+
+    def _observations(self):
+        return np.stack([history[t] for history, t in zip(self.U, self.time_index)])
+
+    def step(self, actions):
+        """
+        step
+
+        Moves every instance that did not end its episode on the previous call forward ``dt``. Instances whose episode ended on the previous call are reset instead and return their initial observation with zero reward.
+
+        :param actions: The control actions of shape ``(num_envs, action_dim)``.
+        :return: A tuple of batched observations, rewards, terminations, truncations and an info dict. The info holds the ``"pressure_iterations"`` and ``"pressure_residual"`` of the batched pressure solve.
+        """
+        actions = np.asarray(actions, dtype=np.float64).reshape(self.num_envs, -1)
+        resetting = self._autoreset_envs
+        stepping = ~resetting
+
+        # All instances are advanced together. The instances being reset are overwritten afterwards
+        ws = self.workspace
+        u_pred, v_pred = predictor_step(self.u, self.v, self.dx, self.dy, self.dt, self.KINEMATIC_VISCOSITY, ws)
+        u_pred, v_pred = self.boundary_plan.apply(u_pred, v_pred, actions)
+        self.p = pressure_step(u_pred, v_pred, self.p, self.dx, self.dy, self.dt, self.DENSITY, self.pressure_solver, ws)
+        u_next, v_next = corrector_step(u_pred, v_pred, self.p, self.dx, self.dy, self.dt, self.DENSITY, ws)
+        self.u, self.v = self.boundary_plan.apply(u_next, v_next, actions)
+
+        self.time_index[stepping] += 1
+        rewards = np.zeros(self.num_envs)
+        terminations = np.zeros(self.num_envs, dtype=np.bool_)
+        truncations = np.zeros(self.num_envs, dtype=np.bool_)
+        for i in np.flatnonzero(stepping):
+            state = self.U[i].next_row()
+            state[..., 0] = self.u[i]
+            state[..., 1] = self.v[i]
+            rewards[i] = self.reward_class.reward(self.U[i], self.time_index[i], self.U_ref, actions[i], self.action_ref)
+        terminations[stepping] = self.time_index[stepping] >= self.nt - 1
+
+        if np.any(resetting):
+            self._reset_instances(resetting)
+
+        self._autoreset_envs = terminations | truncations
+        info = {"pressure_iterations": self.pressure_solver.iterations, "pressure_residual": self.pressure_solver.residual}
+        return self._observations(), rewards, terminations, truncations, info
+
+    def reset(self, seed: Optional[int]=None, options: Optional[dict]=None):
+        """
+        Resets all instances, or only the instances selected by ``options["reset_mask"]``, and returns the batched observations and info.
+
+        :param seed: Optional seed for the random number generator of the environment.
+        :param options: Optional dictionary. The key ``"reset_mask"`` accepts a boolean array of shape ``(num_envs,)`` selecting the instances to reset.
+        :return: A tuple of (observations, info).
+        """
+        super().reset(seed=seed)
+        mask = np.ones(self.num_envs, dtype=np.bool_)
+        if options is not None and "reset_mask" in options:
+            mask = np.asarray(options["reset_mask"], dtype=np.bool_)
+        self._reset_instances(mask)
+        self._autoreset_envs[mask] = False
+        return self._observations(), {}
@@ -0,0 +1,350 @@
+import numpy as np
+import warnings
+from abc import abstractmethod
+from typing import Optional
+
+# Scipy is an optional dependency only needed for the cosine transform solver
+try:
+    import scipy.fft
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+
+def apply_pressure_boundary(p: np.ndarray):
+    """
+    apply_pressure_boundary
+
+    Enforces the homogeneous Neumann condition of the pressure by copying the first interior row or column onto each side, in the order used by :class:`NavierStokes2D`. The last two axes of ``p`` are the grid and any leading axes are batch axes.
+    """
+    p[..., :, -1] = p[..., :, -2]
+    p[..., 0, :] = p[..., 1, :]
+    p[..., :, 0] = p[..., :, 1]
+    p[..., -1, :] = p[..., -2, :]
+
+
+def apply_pressure_boundary_adjoint(g: np.ndarray):
+    """
+    apply_pressure_boundary_adjoint
+
+    Transpose of :func:`apply_pressure_boundary`. Adds the gradient ``g`` on each side to the interior row or column it was copied from, in reverse order, and zeroes the sides in place.
+    """
+    g[..., -2, :] += g[..., -1, :]
+    g[..., -1, :] = 0
+    g[..., :, 1] += g[..., :, 0]
+    g[..., :, 0] = 0
+    g[..., 1, :] += g[..., 0, :]
+    g[..., 0, :] = 0
+    g[..., :, -2] += g[..., :, -1]
+    g[..., :, -1] = 0
+
+
+class PressureSolver:
+    r"""
+    PressureSolver
+
+    Base class of the pressure Poisson solvers of :class:`NavierStokes2D`. A solver returns the pressure :math:`p` satisfying the five point discretization
+
+    .. math::
+        p_{i-1,j} + p_{i+1,j} + p_{i,j-1} + p_{i,j+1} - 4p_{i,j} = dx\, dy\, b_{i,j}
+
+    on the interior points with homogeneous Neumann boundaries as enforced by :func:`apply_pressure_boundary`. Solvers work on arrays whose last two axes are the grid so that a batch of pressure fields is solved at once.
+    """
+    def __init__(self):
+        # Statistics of the last solve, reported in the info of a step
+        self.iterations = 0
+        self.residual = None
+
+    @staticmethod
+    def relative_residual(p: np.ndarray, rhs: np.ndarray, dx: float, dy: float, work: Optional[tuple] = None) -> float:
+        r"""
+        relative_residual
+
+        Returns the largest relative residual :math:`\|dx\,dy\,b - \Delta_h p\| / \|dx\,dy\,b\|` of the interior equations over a batch. ``work`` can pass two scratch arrays of the interior shape to avoid temporaries.
+        """
+        if work is None:
+            work = (np.empty_like(p[..., 1:-1, 1:-1]), np.empty_like(p[..., 1:-1, 1:-1]))
+        b, laplacian = work
+        np.multiply(dx * dy, rhs[..., 1:-1, 1:-1], out=b)
+        # The constant mode of the right hand side can not be matched with Neumann boundaries
+        b -= b.mean(axis=(-2, -1), keepdims=True)
+        np.multiply(-4, p[..., 1:-1, 1:-1], out=laplacian)
+        laplacian += p[..., 1:-1, 0:-2]
+        laplacian += p[..., 0:-2, 1:-1]
+        laplacian += p[..., 1:-1, 2:]
+        laplacian += p[..., 2:, 1:-1]
+        norm = np.maximum(np.sqrt(np.einsum("...ij,...ij->...", b, b)), np.finfo(float).tiny)
+        error = np.subtract(b, laplacian, out=laplacian)
+        return float(np.max(np.sqrt(np.einsum("...ij,...ij->...", error, error)) / norm))
+
+    @abstractmethod
+    def solve(self, rhs: np.ndarray, p_prev: np.ndarray, dx: float, dy: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        solve
+
+        Returns the pressure for the right hand side ``rhs``.
+
+        :param rhs: The right hand side :math:`b` of the Poisson equation.
+        :param p_prev: The pressure of the previous step. Iterative solvers start from it.
+        :param dx: The spatial step along the last axis.
+        :param dy: The spatial step along the second to last axis.
+        :param out: Array the pressure is written to. It may be ``p_prev`` to update the pressure in place. A new array is returned if it is not given.
+        """
+        pass
+
+    def adjoint(self, grad_p: np.ndarray, dx: float, dy: float):
+        """
+        adjoint
+
+        Transpose of :meth:`solve`, which is linear in the right hand side and the previous pressure. Returns the gradients with respect to ``rhs`` and ``p_prev`` for the gradient ``grad_p`` with respect to the pressure. The default assumes an exact solve whose constant mode is the mean of ``p_prev``, as in the ``"dct"`` solver. The Laplacian is symmetric, so the transpose is a solve of the interior gradient. For the ``"multigrid"`` solver this holds up to its tolerance.
+
+        :param grad_p: The gradient with respect to the pressure.
+        :param dx: The spatial step along the last axis.
+        :param dy: The spatial step along the second to last axis.
+        """
+        g = np.array(grad_p, dtype=np.float64)
+        apply_pressure_boundary_adjoint(g)
+        grad_rhs = self.solve(g, np.zeros_like(g), dx, dy)
+        grad_rhs[..., 0, :] = 0
+        grad_rhs[..., -1, :] = 0
+        grad_rhs[..., :, 0] = 0
+        grad_rhs[..., :, -1] = 0
+        grad_p_prev = np.zeros_like(g)
+        grad_p_prev[..., 1:-1, 1:-1] = g[..., 1:-1, 1:-1].mean(axis=(-2, -1), keepdims=True)
+        return grad_rhs, grad_p_prev
+
+
+class JacobiPressureSolver(PressureSolver):
+    """
+    JacobiPressureSolver
+
+    Runs a fixed number of Jacobi sweeps starting from the previous pressure. This is the reference solver of :class:`NavierStokes2D`.
+
+    :param iterations: Number of Jacobi sweeps per solve.
+    """
+    def __init__(self, iterations: int = 2000):
+        super().__init__()
+        self.iterations = iterations
+        self._buffers = None
+
+    def solve(self, rhs, p_prev, dx, dy, out=None):
+        # Two buffers are swapped between sweeps instead of copying the pressure every sweep and each sweep runs in place
+        if self._buffers is None or self._buffers[0].shape != p_prev.shape or self._buffers[0].dtype != p_prev.dtype:
+            self._buffers = (np.empty_like(p_prev), np.empty_like(p_prev), np.empty_like(p_prev[..., 1:-1, 1:-1]))
+        p_next, start, source = self._buffers
+        np.copyto(start, p_prev)
+        np.copyto(p_next, p_prev)
+        p_prev = start
+        np.multiply(dx * dy, rhs[..., 1:-1, 1:-1], out=source)
+        for _ in range(self.iterations):
+            # p_next = 1/4 * (p_W + p_S + p_E + p_N - dx*dy*rhs)
+            inner = p_next[..., 1:-1, 1:-1]
+            np.add(p_prev[..., 1:-1, 0:-2], p_prev[..., 0:-2, 1:-1], out=inner)
+            np.add(inner, p_prev[..., 1:-1, 2:], out=inner)
+            np.add(inner, p_prev[..., 2:, 1:-1], out=inner)
+            np.subtract(inner, source, out=inner)
+            np.multiply(1/4, inner, out=inner)
+            apply_pressure_boundary(p_next)
+            p_prev, p_next = p_next, p_prev
+        # The buffer of the next sweep and the source are free once the sweeps are done
+        self.residual = self.relative_residual(p_prev, rhs, dx, dy, work=(source, p_next[..., 1:-1, 1:-1]))
+        if out is None:
+            return p_prev.copy()
+        np.copyto(out, p_prev)
+        return out
+
+    def adjoint(self, grad_p, dx, dy):
+        # The sweeps are transposed in reverse order. Each sweep scatters a quarter of the interior gradient to the four neighbors
+        g = np.array(grad_p, dtype=np.float64)
+        grad_rhs = np.zeros_like(g)
+        for _ in range(self.iterations):
+            apply_pressure_boundary_adjoint(g)
+            inner = g[..., 1:-1, 1:-1] / 4
+            grad_rhs[..., 1:-1, 1:-1] -= dx * dy * inner
+            g.fill(0)
+            g[..., 1:-1, 0:-2] += inner
+            g[..., 0:-2, 1:-1] += inner
+            g[..., 1:-1, 2:] += inner
+            g[..., 2:, 1:-1] += inner
+        return grad_rhs, g
+
+
+class DCTPressureSolver(PressureSolver):
+    r"""
+    DCTPressureSolver
+
+    Solves the pressure equation directly with a type II discrete cosine transform of the interior points, which diagonalizes the five point Laplacian with the Neumann boundaries of :func:`apply_pressure_boundary`. The cost per solve is :math:`O(N \log N)` for :math:`N` grid points. The pressure is only defined up to a constant which is taken from ``p_prev`` so that the pressure level does not jump between steps. Requires `scipy <https://scipy.org>`_.
+    """
+    def __init__(self):
+        super().__init__()
+        if not SCIPY_AVAILABLE:
+            raise ImportError("The dct pressure solver requires scipy. Please install scipy or use the jacobi pressure solver.")
+        self.iterations = 1
+        self._shape = None
+
+    def _eigenvalues(self, shape, dx, dy):
+        # Eigenvalues of the interior Laplacian times dx*dy, cached for the grid
+        if self._shape != (shape, dx, dy):
+            my, mx = shape
+            ly = -4 * np.sin(np.pi * np.arange(my) / (2 * my))**2
+            lx = -4 * np.sin(np.pi * np.arange(mx) / (2 * mx))**2
+            eigenvalues = ly[:, None] + lx[None, :]
+            # The constant mode is fixed separately
+            eigenvalues[0, 0] = 1
+            self._inverse = 1 / eigenvalues
+            self._shape = (shape, dx, dy)
+        return self._inverse
+
+    def solve(self, rhs, p_prev, dx, dy, out=None):
+        interior = rhs[..., 1:-1, 1:-1]
+        inverse = self._eigenvalues(interior.shape[-2:], dx, dy)
+        coefficients = scipy.fft.dctn(interior, type=2, axes=(-2, -1))
+        coefficients *= dx * dy * inverse
+        # The constant mode keeps the mean of the previous pressure
+        coefficients[..., 0, 0] = p_prev[..., 1:-1, 1:-1].mean(axis=(-2, -1)) * 4 * interior.shape[-2] * interior.shape[-1]
+        p = np.empty_like(p_prev) if out is None else out
+        p[..., 1:-1, 1:-1] = scipy.fft.idctn(coefficients, type=2, axes=(-2, -1))
+        apply_pressure_boundary(p)
+        self.residual = self.relative_residual(p, rhs, dx, dy)
+        return p
+
+
+class _MultigridLevel:
+    # Weighted graph Laplacian of one grid level. wx couples horizontal and wy vertical neighbors
+    def __init__(self, wx, wy):
+        self.wx, self.wy = wx, wy
+        self.shape = (wy.shape[0] + 1, wx.shape[1] + 1)
+        self.diag = np.zeros(self.shape)
+        self.diag[:, :-1] += wx
+        self.diag[:, 1:] += wx
+        self.diag[:-1, :] += wy
+        self.diag[1:, :] += wy
+        ii, jj = np.indices(self.shape)
+        self.colors = ((ii + jj) % 2 == 0, (ii + jj) % 2 == 1)
+
+    def neighbor_sum(self, p):
+        s = np.zeros_like(p)
+        s[..., :, :-1] += self.wx * p[..., :, 1:]
+        s[..., :, 1:] += self.wx * p[..., :, :-1]
+        s[..., :-1, :] += self.wy * p[..., 1:, :]
+        s[..., 1:, :] += self.wy * p[..., :-1, :]
+        return s
+
+    def residual(self, p, b):
+        return b - self.diag * p + self.neighbor_sum(p)
+
+    def smooth(self, p, b, sweeps):
+        # Red-black Gauss-Seidel
+        for _ in range(sweeps):
+            for color in self.colors:
+                update = (b + self.neighbor_sum(p)) / self.diag
+                np.copyto(p, update, where=color)
+        return p
+
+    def coarsen(self):
+        # Cells are aggregated in 2x2 blocks. Edges between aggregates are summed and halved, which matches rediscretizing on the coarse grid
+        my, mx = self.shape
+        cy, cx = (my + 1) // 2, (mx + 1) // 2
+        wx = np.add.reduceat(self.wx[:, 1::2][:, : cx - 1], np.arange(0, my, 2), axis=0)
+        wy = np.add.reduceat(self.wy[1::2, :][: cy - 1, :], np.arange(0, mx, 2), axis=1)
+        return _MultigridLevel(0.5 * wx, 0.5 * wy)
+
+    def matrix(self):
+        n = self.shape[0] * self.shape[1]
+        identity = np.eye(n).reshape((n,) + self.shape)
+        return (self.diag * identity - self.neighbor_sum(identity)).reshape(n, n)
+
+
+class MultigridPressureSolver(PressureSolver):
+    r"""
+    MultigridPressureSolver
+
+    Solves the pressure equation with geometric multigrid V-cycles, warm started from the previous pressure, until the relative residual drops below ``tolerance``. The grid is coarsened by aggregating 2x2 blocks of cells, which works for any grid size, and the coarsest grid is solved directly. Each V-cycle costs :math:`O(N)` for :math:`N` grid points and the number of cycles is independent of the grid size. Unlike the cosine transform solver it only relies on the stencil of each level, so it keeps working for boundaries which are not diagonalized by a transform.
+
+    :param tolerance: Relative residual :math:`\|dx\,dy\,b - \Delta_h p\| / \|dx\,dy\,b\|` at which the cycles stop.
+    :param max_cycles: Maximum number of V-cycles per solve.
+    :param smoothing_steps: Red-black Gauss-Seidel sweeps before and after each coarse grid correction.
+    :param coarsest_size: Grids with at most this many points along a side are solved directly.
+    """
+    def __init__(self, tolerance: float = 1e-6, max_cycles: int = 50, smoothing_steps: int = 2, coarsest_size: int = 4):
+        super().__init__()
+        self.tolerance = tolerance
+        self.max_cycles = max_cycles
+        self.smoothing_steps = smoothing_steps
+        self.coarsest_size = coarsest_size
+        self._shape = None
+
+    def _hierarchy(self, shape):
+        if self._shape != shape:
+            my, mx = shape
+            self.levels = [_MultigridLevel(np.ones((my, mx - 1)), np.ones((my - 1, mx)))]
+            while min(self.levels[-1].shape) > self.coarsest_size:
+                self.levels.append(self.levels[-1].coarsen())
+            # The Neumann problem is singular so the coarsest grid uses the pseudo inverse
+            self.coarse_inverse = np.linalg.pinv(self.levels[-1].matrix())
+            self._shape = shape
+        return self.levels
+
+    def _vcycle(self, k, p, b):
+        level = self.levels[k]
+        if k == len(self.levels) - 1:
+            return (b.reshape(b.shape[:-2] + (-1,)) @ self.coarse_inverse.T).reshape(b.shape)
+        p = level.smooth(p, b, self.smoothing_steps)
+        r = level.residual(p, b)
+        # Restriction sums the residual of each 2x2 block
+        my, mx = level.shape
+        r = np.pad(r, [(0, 0)] * (r.ndim - 2) + [(0, my % 2), (0, mx % 2)])
+        rc = r.reshape(r.shape[:-2] + (r.shape[-2] // 2, 2, r.shape[-1] // 2, 2)).sum(axis=(-3, -1))
+        ec = self._vcycle(k + 1, np.zeros_like(rc), rc)
+        # Prolongation injects the coarse correction into each cell of the block
+        p += np.repeat(np.repeat(ec, 2, axis=-2), 2, axis=-1)[..., :my, :mx]
+        return level.smooth(p, b, self.smoothing_steps)
+
+    def solve(self, rhs, p_prev, dx, dy, out=None):
+        self._hierarchy(rhs[..., 1:-1, 1:-1].shape[-2:])
+        # In graph Laplacian form A p = b with b = -dx*dy*rhs. Only the compatible part of b can be matched
+        b = -dx * dy * rhs[..., 1:-1, 1:-1]
+        b = b - b.mean(axis=(-2, -1), keepdims=True)
+        norm = np.maximum(np.linalg.norm(b, axis=(-2, -1)), np.finfo(float).tiny)
+        level = self.levels[0]
+        p = np.array(p_prev[..., 1:-1, 1:-1], dtype=np.float64)
+        mean = p.mean(axis=(-2, -1), keepdims=True)
+        self.iterations = 0
+        self.residual = float(np.max(np.linalg.norm(level.residual(p, b), axis=(-2, -1)) / norm))
+        while self.residual > self.tolerance and self.iterations < self.max_cycles:
+            p = self._vcycle(0, p, b)
+            self.iterations += 1
+            self.residual = float(np.max(np.linalg.norm(level.residual(p, b), axis=(-2, -1)) / norm))
+        out = np.empty_like(p_prev) if out is None else out
+        # The constant mode keeps the mean of the previous pressure
+        out[..., 1:-1, 1:-1] = p - p.mean(axis=(-2, -1), keepdims=True) + mean
+        apply_pressure_boundary(out)
+        return out
+
+
+def make_pressure_solver(pressure_solver, maximum_iteration: int = 2000, tolerance: float = 1e-6) -> PressureSolver:
+    """
+    make_pressure_solver
+
+    Returns the pressure solver for the ``pressure_solver`` parameter of :class:`NavierStokes2D`. ``"dct"`` falls back to ``"jacobi"`` with a warning if scipy is not installed.
+
+    :param pressure_solver: ``"jacobi"``, ``"dct"``, ``"multigrid"`` or a :class:`PressureSolver` instance which is returned unchanged.
+    :param maximum_iteration: Number of sweeps of the Jacobi solver.
+    :param tolerance: Relative residual at which the multigrid solver stops.
+    """
+    if isinstance(pressure_solver, PressureSolver):
+        return pressure_solver
+    if pressure_solver == "dct" and not SCIPY_AVAILABLE:
+        warnings.warn("Scipy is not installed. Falling back to the jacobi pressure solver.")
+        pressure_solver = "jacobi"
+    match pressure_solver:
+        case "jacobi":
+            return JacobiPressureSolver(maximum_iteration)
+        case "dct":
+            return DCTPressureSolver()
+        case "multigrid":
+            return MultigridPressureSolver(tolerance)
+        case _:
+            raise Exception(
+                "Invalid pressure_solver parameter. Please use 'jacobi', 'dct', 'multigrid', or a PressureSolver instance. See documentation for details."
+            )
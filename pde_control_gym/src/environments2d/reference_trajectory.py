@@ -0,0 +1,118 @@
+import os
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Optional, Sequence
+
+
+class ReferenceTrajectory:
+    r"""
+    ReferenceTrajectory
+
+    A reference trajectory ``U_ref`` of shape ``(nt, nx, ny, 2)`` for :class:`NavierStokes2D` and :class:`NSReward` that is not held in memory by every environment. It is read like the array it replaces, so ``U_ref[t]`` returns the reference state at timestep ``t`` as a read only view and only the frames that are read are loaded. The trajectory is backed either by an uncompressed ``.npy`` file which is memory mapped, or by a shared memory block created with :meth:`shared`. Pickling a trajectory only records the file name or the name of the shared memory block, so the subprocess workers of a vector environment map the same pages instead of receiving a copy.
+
+    :param path: Uncompressed ``.npy`` file holding the trajectory.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._shm = None
+        self._owner = False
+        self.data = np.load(path, mmap_mode="r")
+
+    @classmethod
+    def from_npz(cls, path: str, keys: Sequence[str] = ("u", "v"), out: Optional[str] = None):
+        """
+        from_npz
+
+        Stacks the arrays ``keys`` of an ``.npz`` archive along a new last axis, e.g. the ``u`` and ``v`` components of ``target.npz`` of shape ``(nt, nx, ny)``, and memory maps the result. The stacked trajectory is written to the uncompressed ``.npy`` file ``out`` on the first call and reused afterwards as long as it is newer than the archive.
+
+        :param path: The ``.npz`` archive.
+        :param keys: The arrays of the archive stacked into the trajectory.
+        :param out: The ``.npy`` file of the trajectory. Defaults to ``path`` with the suffix ``.npy``.
+        """
+        out = os.path.splitext(path)[0] + ".npy" if out is None else out
+        if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(path):
+            with np.load(path) as archive:
+                first = archive[keys[0]]
+                # Written to a temporary file first so that concurrent readers never see a partial trajectory
+                partial = f"{out}.{os.getpid()}.tmp"
+                data = np.lib.format.open_memmap(partial, mode="w+", dtype=first.dtype, shape=first.shape + (len(keys),))
+                for i, key in enumerate(keys):
+                    data[..., i] = archive[key]
+                data.flush()
+                del data
+            os.replace(partial, out)
+        return cls(out)
+
+    @classmethod
+    def shared(cls, array: np.ndarray):
+        """
+        shared
+
+        Copies ``array`` into a new shared memory block. The trajectory that is returned owns the block, which is released by :meth:`close` or when the trajectory is garbage collected. Copies received by other processes attach to the block without copying it.
+
+        :param array: The reference trajectory.
+        """
+        array = np.asarray(array)
+        trajectory = cls.__new__(cls)
+        trajectory.path = None
+        trajectory._shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        trajectory._owner = True
+        trajectory.data = np.ndarray(array.shape, dtype=array.dtype, buffer=trajectory._shm.buf)
+        trajectory.data[...] = array
+        trajectory.data.flags.writeable = False
+        return trajectory
+
+    def close(self):
+        """
+        close
+
+        Releases the memory map or the shared memory block. The shared memory block is removed if this trajectory created it.
+        """
+        self.data = None
+        if self._shm is not None:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+            self._shm = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __getstate__(self):
+        if self._shm is not None:
+            return {"shared": self._shm.name, "shape": self.data.shape, "dtype": self.data.dtype.str}
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self._owner = False
+        if "shared" in state:
+            self.path = None
+            self._shm = shared_memory.SharedMemory(name=state["shared"])
+            self.data = np.ndarray(state["shape"], dtype=np.dtype(state["dtype"]), buffer=self._shm.buf)
+            self.data.flags.writeable = False
+        else:
+            self.__init__(state["path"])
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def ndim(self):
+        return self.data.ndim
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.data, dtype=dtype)
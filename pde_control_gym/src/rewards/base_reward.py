@@ -23,6 +23,14 @@ class BaseReward(ABC):
 
         """
 
+    def history_lookback(self) -> Optional[int]:
+        r"""
+        history_lookback
+
+        Returns the number of timesteps before ``time_index`` whose state the reward reads from the solution vector, or ``None`` if it reads every timestep of the episode. The 1D environments check at construction that their history policy stores these timesteps. For the base reward it returns 0, but it must be overridden by custom rewards reading past timesteps.
+        """
+        return 0
+
     def reset(self):
         r"""
         reset function
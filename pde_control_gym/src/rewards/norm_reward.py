@@ -71,3 +71,17 @@ class NormReward(BaseReward):
                         result += np.linalg.norm(uVec[time_index-1 * i], ord=self.norm)
                     result /= time_index
                 return -result / norm_coeff
+
+    def history_lookback(self) -> Optional[int]:
+        r"""
+        history_lookback
+
+        The ``"differential"`` horizon reads the previous timestep and the ``"t-horizon"`` horizon the last ``t_horizon_length`` timesteps.
+        """
+        match self.horizon:
+            case "differential":
+                return 1
+            case "t-horizon":
+                return self.t_hoizon_length - 1
+            case _:
+                return 0
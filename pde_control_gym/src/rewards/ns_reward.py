@@ -14,6 +14,8 @@ class NSReward(BaseReward):
     
     def __init__(self, gamma: float=0.1):
         self.gamma = gamma
+        # Reused for the tracking error so a reward does not allocate a new state sized array
+        self._error = None
 
     def reward(self, uVec: np.ndarray = None, time_index: int = None, U_ref: Union[float, np.ndarray]=None, action: Union[float, np.ndarray] = None, action_ref:  Union[float, np.ndarray] = None):
         """ 
@@ -22,7 +24,29 @@ class NSReward(BaseReward):
         :param uVec: (required) This is the difference of the vector of PDE and tracking trajectory. 
         :param action: (required) control actions
         :param time_index: (required) time index of the simulation
-        :param U_ref: (required) reference trajectory
+        :param U_ref: (required) reference trajectory, an array or a :class:`ReferenceTrajectory`
         :param action_ref: (required) reference action or action sequences
         """
-        return - 1/2 * np.linalg.norm(uVec[time_index]-U_ref[time_index])**2/uVec.shape[1]/uVec.shape[2] - self.gamma/2 * np.linalg.norm(action - action_ref[time_index])**2
\ No newline at end of file
+        state, reference = uVec[time_index], U_ref[time_index]
+        shape = np.broadcast_shapes(np.shape(state), np.shape(reference))
+        if self._error is None or self._error.shape != shape:
+            self._error = np.empty(shape, dtype=np.result_type(state, reference))
+        error = np.subtract(state, reference, out=self._error)
+        return - 1/2 * np.linalg.norm(error)**2/uVec.shape[1]/uVec.shape[2] - self.gamma/2 * np.linalg.norm(action - action_ref[time_index])**2
+
+    def gradient(self, state: np.ndarray, reference: np.ndarray, action: Union[float, np.ndarray], action_ref: Union[float, np.ndarray]):
+        """
+        gradient
+
+        Returns the reward of a single timestep together with its gradients with respect to the state and the action. Used by :meth:`NavierStokes2D.action_gradient`.
+
+        :param state: (required) state of the timestep of shape ``(nx, ny, 2)``
+        :param reference: (required) reference state of the timestep
+        :param action: (required) control action
+        :param action_ref: (required) reference action of the timestep
+        """
+        scale = 1 / state.shape[0] / state.shape[1]
+        error = np.subtract(state, reference, dtype=np.float64)
+        action_error = np.subtract(action, action_ref, dtype=np.float64)
+        reward = - 1/2 * np.linalg.norm(error)**2 * scale - self.gamma/2 * np.linalg.norm(action_error)**2
+        return reward, -scale * error, -self.gamma * action_error
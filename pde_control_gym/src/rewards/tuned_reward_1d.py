@@ -34,7 +34,17 @@ class TunedReward1D(BaseReward):
         """
 
         if terminate and np.linalg.norm(uVec[time_index]) < 20:
-            return (self.terminate_reward - np.sum(abs(uVec[:, -1]))/1000 - np.linalg.norm(uVec[time_index]))
+            # The bounded histories of the 1D environments do not store every boundary value but keep their sum
+            boundary = uVec.boundary_sum() if hasattr(uVec, "boundary_sum") else np.sum(abs(uVec[:, -1]))
+            return (self.terminate_reward - boundary/1000 - np.linalg.norm(uVec[time_index]))
         if truncate:
             return self.truncate_penalty*(self.nt-time_index)
         return np.linalg.norm(uVec[time_index-int(1/control_sample_rate)])-np.linalg.norm(uVec[time_index])
+
+    def history_lookback(self) -> Optional[int]:
+        r"""
+        history_lookback
+
+        The reward compares the state with the state ``int(1/control_sample_rate)`` timesteps before, which is 100 timesteps for the default ``control_sample_rate`` the environments call the reward with. The terminal reward reads the sum of the boundary value over the episode from :meth:`StateHistory.boundary_sum`, which every history policy keeps.
+        """
+        return int(1/0.01)
@@ -5,4 +5,5 @@ setup(name="pdecontrolgym",
         install_requires=["gymnasium", 
             "numpy", 
             "matplotlib"], 
+        extras_require={"numba": ["numba"], "scipy": ["scipy"]},
         )